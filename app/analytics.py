@@ -0,0 +1,194 @@
+"""
+OR utilization analytics from actual surgery times
+
+Completed surgeries' actual_start_time / actual_end_time are loaded once for a
+date range into NumPy arrays (minutes since the first day's midnight), sorted
+by room and start, and every metric is computed with array operations:
+
+- utilization: in-room minutes inside the day window over rooms x days x
+  window minutes, overall and per room, per day and per hour of the day;
+- turnover: idle minutes between consecutive cases in the same room on the
+  same day (gaps over MAX_TURNOVER_GAP_MINUTES count as idle time, not turnover);
+- overruns: actual duration against the planned duration_minutes;
+- first-case on-time starts: the first case of each room-day started no later
+  than its scheduled time plus a grace period.
+
+Intervals are clipped to the day window of the day they start on, so time
+after the window (overtime) is not counted as utilization.
+"""
+from datetime import date, datetime, time, timedelta
+from typing import Any, Dict, Optional
+
+import numpy as np
+
+from app.scheduling import DEFAULT_DAY_START, DEFAULT_DAY_END, minutes_of
+
+MINUTES_PER_DAY = 24 * 60
+MAX_TURNOVER_GAP_MINUTES = 180
+FIRST_CASE_GRACE_MINUTES = 5
+
+# Every column is a number so the rows convert to one float array in a single call:
+# rooms come back as their position in the rooms list passed in, times as epoch
+# minutes cast to float8 (psycopg2 turns EXTRACT's numeric into Decimal, which is
+# slow to build and to convert). The partial index in or_analytics_indexes.sql
+# covers every surgeries column used, so the range is an index-only scan.
+OR_CASES_QUERY = """
+    SELECT r.position - 1,
+           (EXTRACT(EPOCH FROM s.actual_start_time) / 60)::float8,
+           (EXTRACT(EPOCH FROM s.actual_end_time) / 60)::float8,
+           (EXTRACT(EPOCH FROM s.scheduled_date + s.scheduled_time) / 60)::float8,
+           s.duration_minutes
+    FROM surgeries s
+    JOIN unnest(%s::uuid[]) WITH ORDINALITY AS r(id, position) ON r.id = s.operating_room_id
+    WHERE s.actual_start_time >= %s AND s.actual_start_time < %s
+      AND s.actual_end_time > s.actual_start_time
+"""
+
+
+def _epoch_minutes(day: date) -> float:
+    return (datetime.combine(day, time()) - datetime(1970, 1, 1)).total_seconds() / 60
+
+
+def _percentage(part, whole) -> float:
+    return round(float(part) * 100 / whole, 2) if whole else 0.0
+
+
+def _stat(values: np.ndarray, fn) -> Optional[float]:
+    return round(float(fn(values)), 1) if values.size else None
+
+
+def load_or_cases(cur, start: date, end: date) -> Dict[str, Any]:
+    """
+    Rooms and the surgeries that actually started in [start, end) as arrays:
+    room (index into rooms), start / end / scheduled (minutes since start's
+    midnight; scheduled is NaN when unknown) and planned (minutes, 0 if unknown)
+    """
+    cur.execute("SELECT id, room_number FROM operating_rooms ORDER BY room_number")
+    room_rows = cur.fetchall()
+
+    cur.execute(OR_CASES_QUERY, ([str(row[0]) for row in room_rows], start, end))
+    # None (no scheduled time / duration) becomes NaN
+    values = np.array(cur.fetchall(), dtype=np.float64).reshape(-1, 5)
+
+    base = _epoch_minutes(start)
+    return {
+        "start": start,
+        "end": end,
+        "rooms": [row[1] for row in room_rows],
+        "room": values[:, 0].astype(np.int64),
+        "actual_start": values[:, 1] - base,
+        "actual_end": values[:, 2] - base,
+        "scheduled": values[:, 3] - base,
+        "planned": np.nan_to_num(values[:, 4])
+    }
+
+
+def or_utilization(
+    cases: Dict[str, Any],
+    day_start: time = DEFAULT_DAY_START,
+    day_end: time = DEFAULT_DAY_END,
+    grace_minutes: int = FIRST_CASE_GRACE_MINUTES
+) -> Dict[str, Any]:
+    """Utilization, turnover, overrun and first-case-start metrics for load_or_cases() arrays"""
+    start, end, rooms = cases["start"], cases["end"], cases["rooms"]
+    day_count = (end - start).days
+    room_count = len(rooms)
+    window_open, window_close = minutes_of(day_start), minutes_of(day_end)
+    window = window_close - window_open
+
+    order = np.lexsort((cases["actual_start"], cases["room"]))
+    room = cases["room"][order]
+    begin = cases["actual_start"][order]
+    finish = cases["actual_end"][order]
+    scheduled = cases["scheduled"][order]
+    planned = cases["planned"][order]
+    day = np.floor_divide(begin, MINUTES_PER_DAY).astype(np.int64)
+
+    # In-window minutes of each case, on the day it started
+    midnight = day * MINUTES_PER_DAY
+    clip_begin = np.maximum(begin, midnight + window_open)
+    clip_finish = np.minimum(finish, midnight + window_close)
+    in_window = np.clip(clip_finish - clip_begin, 0, None)
+
+    room_minutes = np.bincount(room, weights=in_window, minlength=room_count)
+    room_cases = np.bincount(room, minlength=room_count)
+    day_minutes = np.bincount(day, weights=in_window, minlength=day_count)[:day_count]
+    day_cases = np.bincount(day, minlength=day_count)[:day_count]
+
+    # Hour-of-day profile: overlap of every case with every hour of the window
+    hour_edges = np.arange(window_open, window_close, 60)
+    hour_ends = np.minimum(hour_edges + 60, window_close)
+    of_day_begin = (clip_begin - midnight)[:, None]
+    of_day_finish = (clip_finish - midnight)[:, None]
+    hour_minutes = np.clip(
+        np.minimum(of_day_finish, hour_ends) - np.maximum(of_day_begin, hour_edges), 0, None
+    ).sum(axis=0)
+
+    # Consecutive cases in the same room-day
+    same_room_day = (room[1:] == room[:-1]) & (day[1:] == day[:-1])
+    gaps = begin[1:] - finish[:-1]
+    turnover = same_room_day & (gaps >= 0) & (gaps <= MAX_TURNOVER_GAP_MINUTES)
+    turnover_gaps = gaps[turnover]
+    room_turnover_count = np.bincount(room[1:][turnover], minlength=room_count)
+    room_turnover_minutes = np.bincount(room[1:][turnover], weights=turnover_gaps, minlength=room_count)
+
+    has_plan = planned > 0
+    overrun = (finish - begin) - planned
+    overran = has_plan & (overrun > 0)
+    room_overruns = np.bincount(room[overran], minlength=room_count)
+
+    first_case = np.ones(len(room), dtype=bool)
+    first_case[1:] = ~same_room_day
+    first_case &= ~np.isnan(scheduled)
+    delays = (begin - scheduled)[first_case]
+    on_time = int(np.count_nonzero(delays <= grace_minutes))
+
+    return {
+        "start": start,
+        "end": end,
+        "day_start": day_start.strftime("%H:%M"),
+        "day_end": day_end.strftime("%H:%M"),
+        "rooms": room_count,
+        "days": day_count,
+        "cases": int(len(room)),
+        "utilization_percentage": _percentage(room_minutes.sum(), room_count * day_count * window),
+        "in_room_minutes": round(float(room_minutes.sum())),
+        "by_room": [{
+            "room_number": rooms[position],
+            "cases": int(room_cases[position]),
+            "in_room_minutes": round(float(room_minutes[position])),
+            "utilization_percentage": _percentage(room_minutes[position], day_count * window),
+            "mean_turnover_minutes": round(float(room_turnover_minutes[position] / room_turnover_count[position]), 1)
+            if room_turnover_count[position] else None,
+            "overrun_cases": int(room_overruns[position])
+        } for position in range(room_count)],
+        "by_day": [{
+            "date": start + timedelta(days=offset),
+            "cases": int(day_cases[offset]),
+            "utilization_percentage": _percentage(day_minutes[offset], room_count * window)
+        } for offset in range(day_count)],
+        "by_hour": [{
+            "hour": f"{edge // 60:02d}:{edge % 60:02d}",
+            "utilization_percentage": _percentage(minutes, room_count * day_count * (hour_end - edge))
+        } for edge, hour_end, minutes in zip(hour_edges.tolist(), hour_ends.tolist(), hour_minutes)],
+        "turnover": {
+            "count": int(turnover_gaps.size),
+            "mean_minutes": _stat(turnover_gaps, np.mean),
+            "median_minutes": _stat(turnover_gaps, np.median),
+            "p90_minutes": _stat(turnover_gaps, lambda values: np.percentile(values, 90))
+        },
+        "overruns": {
+            "cases_with_planned_duration": int(np.count_nonzero(has_plan)),
+            "overrun_cases": int(np.count_nonzero(overran)),
+            "overrun_percentage": _percentage(np.count_nonzero(overran), np.count_nonzero(has_plan)),
+            "mean_overrun_minutes": _stat(overrun[overran], np.mean),
+            "total_overrun_minutes": round(float(overrun[overran].sum()))
+        },
+        "first_case_starts": {
+            "grace_minutes": grace_minutes,
+            "first_cases": int(delays.size),
+            "on_time": on_time,
+            "on_time_percentage": _percentage(on_time, delays.size),
+            "median_delay_minutes": _stat(delays, np.median)
+        }
+    }
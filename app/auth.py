@@ -5,7 +5,14 @@ from datetime import datetime, timedelta
 from typing import Optional
 from jose import JWTError, jwt
 from passlib.context import CryptContext
+from app.cache import ExpiringMap, TTLCache
+from concurrent.futures import ProcessPoolExecutor
+import asyncio
+import hashlib
 import os
+import threading
+import time
+import uuid
 from dotenv import load_dotenv
 
 load_dotenv()
@@ -16,8 +23,43 @@ ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 1440  # 24 hours
 REFRESH_TOKEN_EXPIRE_DAYS = 7
 
-# Password hashing
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+# Refresh tokens are stored as sha256 digests. Each doctor keeps at most this many
+# active tokens (one per device/session); older ones are dropped on login.
+MAX_REFRESH_TOKENS_PER_DOCTOR = int(os.getenv("MAX_REFRESH_TOKENS_PER_DOCTOR", "10"))
+
+# Verified-token cache: sha256(token) -> decoded payload, kept until the token's exp.
+# Revocations are not a cache and are never evicted early: revoked digests are kept
+# until the token's exp, and a doctor's "not before" (every token issued before
+# their logout is refused) until the longest-lived token issued before it expires.
+TOKEN_CACHE_MAX_SIZE = int(os.getenv("TOKEN_CACHE_MAX_SIZE", "50000"))
+_token_cache = TTLCache(maxsize=TOKEN_CACHE_MAX_SIZE, ttl=ACCESS_TOKEN_EXPIRE_MINUTES * 60)
+_revoked_tokens = ExpiringMap()
+_subject_not_before = ExpiringMap()
+
+# Password hashing. Hashes with a different cost than BCRYPT_ROUNDS are flagged by
+# needs_update, so raising the cost re-hashes each password on its next login.
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", "12"))
+pwd_context = CryptContext(
+    schemes=["bcrypt"],
+    deprecated="auto",
+    bcrypt__default_rounds=BCRYPT_ROUNDS,
+    bcrypt__min_rounds=BCRYPT_ROUNDS,
+    bcrypt__max_rounds=BCRYPT_ROUNDS
+)
+
+# bcrypt runs in a dedicated process pool so a login storm cannot starve the
+# request threads or the event loop. Jobs beyond the queue limit are refused
+# right away (PasswordHasherBusy -> 503) instead of queueing behind the storm.
+PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", str(max(1, (os.cpu_count() or 2) // 2))))
+PASSWORD_HASH_MAX_PENDING = int(os.getenv("PASSWORD_HASH_MAX_PENDING", str(PASSWORD_HASH_WORKERS * 8)))
+
+class PasswordHasherBusy(Exception):
+    """Raised when the password hashing queue is full"""
+
+_hash_executor = None
+_hash_lock = threading.Lock()
+_hash_pending = 0
+_hash_rejected = 0
 
 def verify_password(plain_password: str, hashed_password: str) -> bool:
     """Verify a password against a hash"""
@@ -27,6 +69,56 @@ def get_password_hash(password: str) -> str:
     """Hash a password"""
     return pwd_context.hash(password)
 
+def verify_and_update_password(plain_password: str, hashed_password: str) -> tuple:
+    """Verify a password; also returns a new hash if the stored one uses outdated settings"""
+    return pwd_context.verify_and_update(plain_password, hashed_password)
+
+def _get_hash_executor() -> ProcessPoolExecutor:
+    global _hash_executor
+    with _hash_lock:
+        if _hash_executor is None:
+            _hash_executor = ProcessPoolExecutor(max_workers=PASSWORD_HASH_WORKERS)
+        return _hash_executor
+
+async def _run_hash_job(func, *args):
+    global _hash_pending, _hash_rejected
+    with _hash_lock:
+        if _hash_pending >= PASSWORD_HASH_MAX_PENDING:
+            _hash_rejected += 1
+            raise PasswordHasherBusy("Password hashing queue is full")
+        _hash_pending += 1
+    try:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(_get_hash_executor(), func, *args)
+    finally:
+        with _hash_lock:
+            _hash_pending -= 1
+
+async def verify_and_update_password_async(plain_password: str, hashed_password: str) -> tuple:
+    """verify_and_update_password on the password hashing pool; raises PasswordHasherBusy when saturated"""
+    return await _run_hash_job(verify_and_update_password, plain_password, hashed_password)
+
+async def get_password_hash_async(password: str) -> str:
+    """get_password_hash on the password hashing pool; raises PasswordHasherBusy when saturated"""
+    return await _run_hash_job(get_password_hash, password)
+
+def shutdown_password_hasher() -> None:
+    global _hash_executor
+    with _hash_lock:
+        executor, _hash_executor = _hash_executor, None
+    if executor is not None:
+        executor.shutdown(wait=False, cancel_futures=True)
+
+def password_hasher_stats() -> dict:
+    with _hash_lock:
+        return {
+            "workers": PASSWORD_HASH_WORKERS,
+            "max_pending": PASSWORD_HASH_MAX_PENDING,
+            "pending": _hash_pending,
+            "rejected": _hash_rejected,
+            "bcrypt_rounds": BCRYPT_ROUNDS
+        }
+
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -> str:
     """Create a JWT access token"""
     to_encode = data.copy()
@@ -36,7 +128,7 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -
     else:
         expire = datetime.utcnow() + timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
     
-    to_encode.update({"exp": expire})
+    to_encode.update({"exp": expire, "iat": int(time.time())})
     encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
 
@@ -44,14 +136,70 @@ def create_refresh_token(data: dict) -> str:
     """Create a JWT refresh token"""
     to_encode = data.copy()
     expire = datetime.utcnow() + timedelta(days=REFRESH_TOKEN_EXPIRE_DAYS)
-    to_encode.update({"exp": expire})
+    # jti keeps two tokens issued in the same second distinct (the digest is unique)
+    to_encode.update({"exp": expire, "iat": int(time.time()), "jti": uuid.uuid4().hex})
     encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
 
+def _token_digest(token: str) -> bytes:
+    return hashlib.sha256(token.encode()).digest()
+
+def refresh_token_digest(token: str) -> bytes:
+    """Digest stored in refresh_tokens.token_hash for a refresh token"""
+    return _token_digest(token)
+
+def _issued_before_revocation(payload: dict) -> bool:
+    not_before = _subject_not_before.get(str(payload.get("sub")))
+    return not_before is not None and payload.get("iat", 0) < not_before
+
 def verify_token(token: str) -> Optional[dict]:
-    """Verify and decode a JWT token"""
+    """Verify and decode a JWT token (decoded payloads are cached until exp)"""
+    digest = _token_digest(token)
+    if _revoked_tokens.get(digest) is not None:
+        return None
+
+    payload = _token_cache.get(digest)
+    if payload is None:
+        try:
+            payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+        except JWTError:
+            return None
+
+        exp = payload.get("exp")
+        if exp is not None:
+            ttl = exp - time.time()
+            if ttl > 0:
+                _token_cache.set(digest, payload, ttl=ttl)
+
+    if _issued_before_revocation(payload):
+        return None
+    return dict(payload)
+
+def revoke_token(token: str) -> None:
+    """Reject this token from now on, even if its signature and exp are still valid"""
+    digest = _token_digest(token)
+    _token_cache.invalidate(digest)
     try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        return payload
+        exp = jwt.get_unverified_claims(token).get("exp")
     except JWTError:
-        return None
+        return
+    if exp is None:
+        exp = time.time() + REFRESH_TOKEN_EXPIRE_DAYS * 86400  # no exp: outlive every token that has one
+    _revoked_tokens.set(digest, True, expires_at=exp)
+
+def revoke_subject_tokens(doctor_id: str) -> int:
+    """
+    Reject every token issued to a doctor until now (iat is in whole seconds, so
+    tokens issued later in the same second still pass). Returns how many cached
+    tokens were dropped.
+    """
+    now = time.time()
+    _subject_not_before.set(str(doctor_id), int(now), expires_at=now + REFRESH_TOKEN_EXPIRE_DAYS * 86400)
+    return _token_cache.invalidate_where(lambda _, payload: payload.get("sub") == str(doctor_id))
+
+def token_cache_stats() -> dict:
+    return {
+        "verified": _token_cache.stats(),
+        "revoked": _revoked_tokens.stats(),
+        "revoked_subjects": _subject_not_before.stats()
+    }
@@ -0,0 +1,246 @@
+"""
+Batch OR auto-scheduler: pack a backlog of cases into operating rooms
+
+Greedy construction followed by local search, within a time limit:
+
+1. Greedy: cases in order of urgency (emergency, urgent, routine), longest
+   first within each level, each placed at its earliest feasible start over
+   its allowed rooms. Feasible means the same thing as for a booking: the room
+   is free for duration + turnover, the surgeon is free for the duration, and
+   the surgery ends by the day's end.
+2. Local search, repeated while it improves and time remains:
+   - compaction: move every placed case to its earliest feasible start, which
+     closes gaps and opens longer free runs later in the day;
+   - insertion: for each unplaced case, try to place it directly, or make
+     room by taking out one placed case that is no more urgent and whose
+     removal leaves a long enough gap in an allowed room, placing the unplaced
+     case and then re-placing the removed one elsewhere. If the removed case
+     no longer fits, the exchange is kept only when the unplaced case is more
+     urgent or longer (more scheduled minutes).
+
+The objective is scheduled minutes (utilization), with urgency first: a case
+is never displaced by a less urgent one. Pure Python over IntervalIndex, no
+database access; the route reads the busy intervals and writes the result.
+"""
+import time as _time
+from bisect import bisect_left
+from datetime import date, datetime, time, timedelta
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from app.scheduling import IntervalIndex, room_free_slots
+
+URGENCY_RANK = {"emergency": 0, "urgent": 1, "routine": 2}
+
+# Placed cases tried as exchange partners per unplaced case and round
+MAX_EXCHANGE_CANDIDATES = 25
+
+
+class AutoScheduler:
+    """
+    rooms: room_id -> turnover minutes. room_busy / surgeon_busy: existing
+    intervals per room / surgeon (they stay fixed). cases: dicts with
+    duration_minutes, urgency_level, doctor_id and room_ids (None = any room).
+    """
+
+    def __init__(
+        self,
+        cases: List[Dict[str, Any]],
+        rooms: Dict[str, int],
+        room_busy: Dict[str, Iterable[Tuple[datetime, datetime]]],
+        surgeon_busy: Dict[str, Iterable[Tuple[datetime, datetime]]],
+        days: List[date],
+        day_start: time,
+        day_end: time,
+        step_minutes: int = 15,
+        not_before: Optional[datetime] = None
+    ):
+        self.cases = cases
+        self.rooms = rooms
+        self.days = days
+        self.day_start = day_start
+        self.day_end = day_end
+        self.step_minutes = step_minutes
+        self.not_before = not_before
+        self.room_index = {room: IntervalIndex(room_busy.get(room, ())) for room in rooms}
+        self.surgeon_index = {
+            case["doctor_id"]: IntervalIndex(surgeon_busy.get(case["doctor_id"], ())) for case in cases
+        }
+        self.placement: Dict[int, Tuple[str, datetime]] = {}  # case index -> (room_id, start)
+        self.moves = 0
+
+    # ---- placement primitives ----
+
+    def _allowed_rooms(self, case: Dict[str, Any]) -> List[str]:
+        allowed = case.get("room_ids")
+        return [room for room in self.rooms if room in allowed] if allowed else list(self.rooms)
+
+    def earliest_slot(self, index: int) -> Optional[Tuple[datetime, str]]:
+        case = self.cases[index]
+        best = None
+        for room in self._allowed_rooms(case):
+            slot = next(room_free_slots(
+                self.room_index[room], self.surgeon_index[case["doctor_id"]], self.days,
+                case["duration_minutes"], self.rooms[room], self.day_start, self.day_end,
+                self.step_minutes, self.not_before
+            ), None)
+            if slot and (best is None or (slot[0], room) < best):
+                best = (slot[0], room)
+        return best
+
+    def place(self, index: int, room: str, start: datetime) -> None:
+        case = self.cases[index]
+        duration = timedelta(minutes=case["duration_minutes"])
+        self.room_index[room].add(start, start + duration + timedelta(minutes=self.rooms[room]))
+        self.surgeon_index[case["doctor_id"]].add(start, start + duration)
+        self.placement[index] = (room, start)
+
+    def unplace(self, index: int) -> Tuple[str, datetime]:
+        room, start = self.placement.pop(index)
+        case = self.cases[index]
+        duration = timedelta(minutes=case["duration_minutes"])
+        self.room_index[room].remove(start, start + duration + timedelta(minutes=self.rooms[room]))
+        self.surgeon_index[case["doctor_id"]].remove(start, start + duration)
+        return room, start
+
+    def try_place(self, index: int) -> bool:
+        slot = self.earliest_slot(index)
+        if slot is None:
+            return False
+        self.place(index, slot[1], slot[0])
+        return True
+
+    # ---- search ----
+
+    def _rank(self, index: int) -> int:
+        return URGENCY_RANK.get(self.cases[index].get("urgency_level"), URGENCY_RANK["routine"])
+
+    def _minutes(self, index: int) -> int:
+        return self.cases[index]["duration_minutes"]
+
+    def _better(self, index: int, other: int) -> bool:
+        """Scheduling `index` instead of `other` improves the objective (urgency, then minutes)"""
+        return (self._rank(index), -self._minutes(index)) < (self._rank(other), -self._minutes(other))
+
+    def _gap_around(self, room: str, start: datetime) -> Tuple[datetime, datetime]:
+        """The free run the placed case starting at `start` would leave in its room-day"""
+        index = self.room_index[room]
+        position = bisect_left(index.starts, start)
+        open_at = datetime.combine(start.date(), self.day_start)
+        close = datetime.combine(start.date(), self.day_end)
+        if self.not_before and self.not_before > open_at:
+            open_at = self.not_before
+        gap_start = max(index.ends[position - 1], open_at) if position else open_at
+        gap_end = min(index.starts[position + 1], close) if position + 1 < len(index) else close
+        return gap_start, gap_end
+
+    def _fits_after_removal(self, index: int, victim: int) -> bool:
+        """Cheap necessary condition for `index` to fit where `victim` is: room gap and surgeon time"""
+        room, start = self.placement[victim]
+        gap_start, gap_end = self._gap_around(room, start)
+        duration = timedelta(minutes=self._minutes(index))
+        room_need = duration + timedelta(minutes=self.rooms[room])
+        if gap_end - gap_start < room_need:
+            return False
+        surgeon = self.cases[index]["doctor_id"]
+        if surgeon == self.cases[victim]["doctor_id"]:
+            return True  # the victim's own surgeon time is freed too
+        return self.surgeon_index[surgeon].next_free(gap_start, duration) + room_need <= gap_end
+
+    def greedy(self) -> None:
+        for index in sorted(range(len(self.cases)), key=lambda i: (self._rank(i), -self._minutes(i), i)):
+            self.try_place(index)
+
+    def compact(self) -> bool:
+        """Move each placed case to its earliest feasible start; True if any moved"""
+        moved = False
+        for index in sorted(self.placement, key=lambda i: (self.placement[i][1], self.placement[i][0])):
+            old_room, old_start = self.unplace(index)
+            slot = self.earliest_slot(index)  # never later: the old slot is feasible again
+            self.place(index, slot[1], slot[0])
+            if (slot[0], slot[1]) != (old_start, old_room):
+                moved = True
+                self.moves += 1
+        return moved
+
+    def insert_unplaced(self, deadline: float) -> bool:
+        """Place unplaced cases directly or by displacing one less-or-equally urgent case"""
+        improved = False
+        unplaced = sorted(
+            (i for i in range(len(self.cases)) if i not in self.placement),
+            key=lambda i: (self._rank(i), -self._minutes(i), i)
+        )
+        for index in unplaced:
+            if _time.monotonic() > deadline:
+                break
+            if self.try_place(index):
+                improved = True
+                self.moves += 1
+                continue
+            allowed = set(self._allowed_rooms(self.cases[index]))
+            # Exchanges that pay off even if the victim cannot be re-placed come first
+            victims = sorted(
+                (v for v, (room, _) in self.placement.items()
+                 if room in allowed and self._rank(v) >= self._rank(index) and self._fits_after_removal(index, v)),
+                key=lambda v: (not self._better(index, v), -self._rank(v), self._minutes(v), self.placement[v][1])
+            )
+            for victim in victims[:MAX_EXCHANGE_CANDIDATES]:
+                if _time.monotonic() > deadline:
+                    break
+                old_room, old_start = self.placement[victim]
+                gap_start, _ = self._gap_around(old_room, old_start)
+                self.unplace(victim)
+                # Only the victim's room-day can have changed for this case
+                slot = next(room_free_slots(
+                    self.room_index[old_room], self.surgeon_index[self.cases[index]["doctor_id"]],
+                    [old_start.date()], self._minutes(index), self.rooms[old_room],
+                    self.day_start, self.day_end, self.step_minutes, gap_start
+                ), None)
+                if slot is None:
+                    self.place(victim, old_room, old_start)
+                    continue
+                self.place(index, old_room, slot[0])
+                if self.try_place(victim):
+                    improved = True
+                    self.moves += 2
+                    break
+                if self._better(index, victim):
+                    improved = True
+                    self.moves += 1
+                    break
+                # Exchange does not pay off: undo it
+                self.unplace(index)
+                self.place(victim, old_room, old_start)
+        return improved
+
+    def solve(self, time_limit_seconds: float = 2.0) -> Dict[str, Any]:
+        started = _time.monotonic()
+        deadline = started + time_limit_seconds
+        capacity = len(self.rooms) * len(self.days) * (
+            (datetime.combine(date.min, self.day_end) - datetime.combine(date.min, self.day_start)).total_seconds() / 60
+        )
+        busy_before = sum(index.busy_minutes(self.days, self.day_start, self.day_end)
+                          for index in self.room_index.values())
+
+        self.greedy()
+        greedy_placed = len(self.placement)
+        rounds = 0
+        while _time.monotonic() < deadline and len(self.placement) < len(self.cases):
+            rounds += 1
+            compacted = self.compact()
+            inserted = self.insert_unplaced(deadline)
+            if not (compacted or inserted):
+                break
+
+        busy_after = sum(index.busy_minutes(self.days, self.day_start, self.day_end)
+                         for index in self.room_index.values())
+        return {
+            "cases": len(self.cases),
+            "placed": len(self.placement),
+            "placed_by_greedy": greedy_placed,
+            "scheduled_minutes": sum(self._minutes(i) for i in self.placement),
+            "utilization_before": round(busy_before / capacity, 4) if capacity else 0.0,
+            "utilization_after": round(busy_after / capacity, 4) if capacity else 0.0,
+            "local_search_rounds": rounds,
+            "moves": self.moves,
+            "solve_ms": round((_time.monotonic() - started) * 1000, 1)
+        }
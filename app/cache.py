@@ -0,0 +1,315 @@
+"""
+In-process caches
+"""
+import logging
+import threading
+import time
+import heapq
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, Dict, Hashable, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+_MISSING = object()
+
+
+class TTLCache:
+    """
+    Thread-safe LRU cache whose entries also expire after a TTL.
+
+    - at most `maxsize` entries; the least recently used one is evicted first
+    - every entry expires `ttl` seconds after it was set (per-entry override via set(..., ttl=))
+    - hit/miss/eviction counters are reported by stats()
+    """
+
+    def __init__(self, maxsize: int = 1024, ttl: float = 60.0):
+        if maxsize < 1:
+            raise ValueError("maxsize must be at least 1")
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = OrderedDict()  # key -> (expires_at, value)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        now = time.monotonic()
+        with self._lock:
+            entry = self._data.get(key, _MISSING)
+            if entry is _MISSING:
+                self.misses += 1
+                return default
+            expires_at, value = entry
+            if expires_at <= now:
+                del self._data[key]
+                self.misses += 1
+                return default
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None) -> None:
+        expires_at = time.monotonic() + (self.ttl if ttl is None else ttl)
+        with self._lock:
+            self._data[key] = (expires_at, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, key: Hashable) -> bool:
+        """Drop one entry; returns True if it was cached"""
+        with self._lock:
+            return self._data.pop(key, _MISSING) is not _MISSING
+
+    def invalidate_where(self, predicate) -> int:
+        """Drop every entry whose (key, value) matches predicate; O(n), for rare bulk invalidation"""
+        with self._lock:
+            doomed = [key for key, (_, value) in self._data.items() if predicate(key, value)]
+            for key in doomed:
+                del self._data[key]
+            return len(doomed)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._data),
+                "maxsize": self.maxsize,
+                "ttl_seconds": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0
+            }
+
+
+class PatchableCache(TTLCache):
+    """
+    TTLCache whose entries writers patch (or drop) when the data changes,
+    instead of readers waiting out the TTL.
+
+    A reader that misses calls begin_fill() before querying and stores the
+    result with fill(); any patch or invalidation in between makes that fill a
+    no-op, so a result read before a concurrent write cannot overwrite the
+    write's patch. The TTL still bounds staleness from writes this process
+    does not see (other workers, manual SQL).
+    """
+
+    def __init__(self, maxsize: int = 1024, ttl: float = 60.0):
+        super().__init__(maxsize=maxsize, ttl=ttl)
+        self._writes = 0
+        self.patches = 0
+
+    def begin_fill(self) -> int:
+        with self._lock:
+            return self._writes
+
+    def fill(self, key: Hashable, token: int, value: Any) -> bool:
+        """Store a value computed after begin_fill() returned token; False if a write raced it"""
+        expires_at = time.monotonic() + self.ttl
+        with self._lock:
+            if token != self._writes:
+                return False
+            self._data[key] = (expires_at, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+            return True
+
+    def patch(self, key: Hashable, update: Callable[[Any], Any]) -> bool:
+        """
+        Replace a cached entry with update(entry) (which must return a new value,
+        not mutate the old one - readers may still hold it). Returns False if the
+        key was not cached; either way in-flight fills are discarded.
+        """
+        now = time.monotonic()
+        with self._lock:
+            self._writes += 1
+            entry = self._data.get(key, _MISSING)
+            if entry is _MISSING or entry[0] <= now:
+                return False
+            self._data[key] = (entry[0], update(entry[1]))
+            self.patches += 1
+            return True
+
+    def invalidate(self, key: Hashable) -> bool:
+        with self._lock:
+            self._writes += 1
+            return self._data.pop(key, _MISSING) is not _MISSING
+
+    def stats(self) -> dict:
+        stats = super().stats()
+        stats["patches"] = self.patches
+        return stats
+
+
+class ExpiringMap:
+    """
+    Thread-safe map whose entries are kept until a wall-clock expiry, never evicted early.
+
+    For entries that must not be lost while they matter (revocations): there is
+    no size limit, so the size is bounded only by how many entries are set per
+    expiry period. Expired entries are purged on every set(), oldest first.
+    """
+
+    def __init__(self):
+        self._data: Dict[Hashable, Tuple[float, Any]] = {}  # key -> (expires_at, value)
+        self._expiries = []  # heap of (expires_at, key); stale pairs are skipped on purge
+        self._lock = threading.Lock()
+        self.purged = 0
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        entry = self._data.get(key)
+        if entry is None or entry[0] <= time.time():
+            return default
+        return entry[1]
+
+    def set(self, key: Hashable, value: Any, expires_at: float) -> None:
+        now = time.time()
+        with self._lock:
+            while self._expiries and self._expiries[0][0] <= now:
+                expired_at, expired = heapq.heappop(self._expiries)
+                entry = self._data.get(expired)
+                if entry is not None and entry[0] == expired_at:
+                    del self._data[expired]
+                    self.purged += 1
+            if expires_at <= now:
+                return
+            entry = self._data.get(key)
+            if entry is not None and entry[0] >= expires_at:
+                expires_at = entry[0]  # never shorten a live entry
+            self._data[key] = (expires_at, value)
+            heapq.heappush(self._expiries, (expires_at, key))
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"size": len(self._data), "purged": self.purged}
+
+
+class SWRCache:
+    """
+    Cache for expensive computed values with stale-while-revalidate and single-flight.
+
+    - for `ttl` seconds after it was computed an entry is served as is (HIT)
+    - for `stale_ttl` seconds after that it is still served immediately (STALE)
+      while one background refresh recomputes it
+    - past that, or when missing, the first caller computes it (MISS) and
+      concurrent callers for the same key wait for that one result
+    """
+
+    def __init__(self, ttl: float, stale_ttl: float, maxsize: int = 1024, refresh_workers: int = 2):
+        if maxsize < 1:
+            raise ValueError("maxsize must be at least 1")
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self.maxsize = maxsize
+        self._data = OrderedDict()  # key -> (computed_at, value)
+        self._inflight = {}  # key -> Future of the running computation
+        self._lock = threading.Lock()
+        self._refresh_workers = refresh_workers
+        self._executor = None
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.refreshes = 0
+        self.errors = 0
+
+    def get(self, key: Hashable, compute: Callable[[], Any], refresh: Optional[Callable[[], Any]] = None) -> Tuple[Any, float, str]:
+        """
+        Return (value, age_seconds, "HIT" | "STALE" | "MISS").
+        compute runs in the calling thread on a miss; refresh (default: compute)
+        runs in a background thread, so it must not use request-scoped resources.
+        """
+        with self._lock:
+            entry = self._data.get(key, _MISSING)
+            if entry is not _MISSING:
+                computed_at, value = entry
+                age = time.monotonic() - computed_at
+                if age < self.ttl:
+                    self._data.move_to_end(key)
+                    self.hits += 1
+                    return value, age, "HIT"
+                if age < self.ttl + self.stale_ttl:
+                    self.stale_hits += 1
+                    if key not in self._inflight:
+                        future = self._inflight[key] = Future()
+                        self.refreshes += 1
+                        self._get_executor().submit(self._compute, key, refresh or compute, future)
+                    return value, age, "STALE"
+            future = self._inflight.get(key)
+            leader = future is None
+            if leader:
+                future = self._inflight[key] = Future()
+                self.misses += 1
+            else:
+                self.coalesced += 1
+
+        if leader:
+            self._compute(key, compute, future)
+        return future.result(), 0.0, "MISS"
+
+    def _compute(self, key, fn, future: Future) -> None:
+        try:
+            value = fn()
+        except BaseException as e:
+            with self._lock:
+                self._inflight.pop(key, None)
+                self.errors += 1
+            logger.warning("Cache computation for %r failed: %s", key, e)
+            future.set_exception(e)
+            return
+        with self._lock:
+            self._data[key] = (time.monotonic(), value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+            self._inflight.pop(key, None)
+        future.set_result(value)
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self._refresh_workers, thread_name_prefix="swr-refresh")
+        return self._executor
+
+    def invalidate(self, key: Hashable) -> bool:
+        with self._lock:
+            return self._data.pop(key, _MISSING) is not _MISSING
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.stale_hits + self.misses + self.coalesced
+            return {
+                "size": len(self._data),
+                "maxsize": self.maxsize,
+                "ttl_seconds": self.ttl,
+                "stale_ttl_seconds": self.stale_ttl,
+                "hits": self.hits,
+                "stale_hits": self.stale_hits,
+                "misses": self.misses,
+                "coalesced": self.coalesced,
+                "refreshes": self.refreshes,
+                "errors": self.errors,
+                "hit_rate": round((self.hits + self.stale_hits) / lookups, 4) if lookups else 0.0
+            }
@@ -1,30 +1,309 @@
 import os
+import asyncio
+import threading
+import time
+import weakref
+from collections import deque
+from contextlib import contextmanager, asynccontextmanager
 from dotenv import load_dotenv
 import psycopg2
 from psycopg2 import OperationalError
+from psycopg2.extensions import TRANSACTION_STATUS_IDLE
+from psycopg_pool import AsyncConnectionPool
 
 # Load environment variables from .env file
 load_dotenv()
 
+# Pool configuration
+DB_POOL_MIN_SIZE = int(os.getenv("DB_POOL_MIN_SIZE", "2"))
+DB_POOL_MAX_SIZE = int(os.getenv("DB_POOL_MAX_SIZE", "20"))
+DB_POOL_TIMEOUT_SECONDS = float(os.getenv("DB_POOL_TIMEOUT_SECONDS", "10"))
+DB_POOL_MAX_LIFETIME_SECONDS = float(os.getenv("DB_POOL_MAX_LIFETIME_SECONDS", "1800"))
+DB_POOL_MAX_IDLE_SECONDS = float(os.getenv("DB_POOL_MAX_IDLE_SECONDS", "300"))
+DB_POOL_HEALTH_CHECK_SECONDS = float(os.getenv("DB_POOL_HEALTH_CHECK_SECONDS", "30"))
+
+# The async pool (psycopg 3, below) is sized separately: each worker process can
+# hold DB_POOL_MAX_SIZE + ASYNC_DB_POOL_MAX_SIZE connections, so keep
+# workers x that sum under the server's max_connections.
+ASYNC_DB_POOL_MIN_SIZE = int(os.getenv("ASYNC_DB_POOL_MIN_SIZE", "2"))
+ASYNC_DB_POOL_MAX_SIZE = int(os.getenv("ASYNC_DB_POOL_MAX_SIZE", "10"))
+
+
+class PoolTimeoutError(OperationalError):
+    """Raised when no pooled connection becomes available in time"""
+
+
+def _get_db_url():
+    db_url = os.getenv("DB_URL")
+
+    if not db_url:
+        raise ValueError("DB_URL environment variable is not set. Check your .env file.")
+
+    return db_url
+
+
+def _connect():
+    """Open a new physical PostgreSQL connection"""
+    db_url = _get_db_url()
+
+    print(f"Attempting to connect to database...")
+
+    # Create connection with timeout
+    conn = psycopg2.connect(db_url, connect_timeout=10)
+
+    print("✓ Database connection successful!")
+    return conn
+
+
+class PooledConnection:
+    """
+    Proxy around a pooled psycopg2 connection.
+    Behaves like the raw connection, except close() returns it to the pool.
+    As a context manager it commits (or rolls back on error) and returns it;
+    a proxy dropped without close() returns it when garbage collected.
+    """
+
+    def __init__(self, pool, conn):
+        self._pool = pool
+        self._conn = conn
+        self._release = weakref.finalize(self, pool.release, conn)
+
+    def __getattr__(self, name):
+        if self._conn is None:
+            raise psycopg2.InterfaceError("connection already returned to pool")
+        return getattr(self._conn, name)
+
+    @property
+    def closed(self):
+        return self._conn is None or self._conn.closed
+
+    def close(self):
+        """Return the connection to the pool (safe to call more than once)"""
+        self._conn = None
+        self._release()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        try:
+            if not self.closed:
+                if exc_type is None:
+                    self._conn.commit()
+                else:
+                    self._conn.rollback()
+        finally:
+            self.close()
+
+
+class ConnectionPool:
+    """
+    Thread-safe psycopg2 connection pool.
+
+    - keeps at least min_size connections open and never more than max_size
+    - blocks up to `timeout` seconds when exhausted, then raises PoolTimeoutError
+    - recycles connections older than max_lifetime or idle longer than max_idle
+    - runs `SELECT 1` on connections that sat idle longer than health_check_interval
+    - rolls back any transaction left open when a connection is returned
+    """
+
+    def __init__(self, min_size=DB_POOL_MIN_SIZE, max_size=DB_POOL_MAX_SIZE,
+                 timeout=DB_POOL_TIMEOUT_SECONDS, max_lifetime=DB_POOL_MAX_LIFETIME_SECONDS,
+                 max_idle=DB_POOL_MAX_IDLE_SECONDS, health_check_interval=DB_POOL_HEALTH_CHECK_SECONDS,
+                 connect=_connect):
+        if min_size < 0 or max_size < 1 or min_size > max_size:
+            raise ValueError("Invalid pool size: require 0 <= min_size <= max_size and max_size >= 1")
+        self.min_size = min_size
+        self.max_size = max_size
+        self.timeout = timeout
+        self.max_lifetime = max_lifetime
+        self.max_idle = max_idle
+        self.health_check_interval = health_check_interval
+        self._connect = connect
+        self._idle = deque()  # (conn, created_at, returned_at), most recently used last
+        self._created = {}  # id(conn) -> created_at for every open or reserved connection
+        self._cond = threading.Condition()
+        self._closed = False
+
+    def stats(self):
+        with self._cond:
+            return {
+                "size": len(self._created),
+                "idle": len(self._idle),
+                "in_use": len(self._created) - len(self._idle),
+                "min_size": self.min_size,
+                "max_size": self.max_size
+            }
+
+    def _discard(self, conn):
+        self._created.pop(id(conn), None)
+        try:
+            conn.close()
+        except Exception:
+            pass
+
+    def _is_usable(self, conn, created_at, returned_at):
+        now = time.monotonic()
+        if conn.closed:
+            return False
+        if self.max_lifetime and now - created_at > self.max_lifetime:
+            return False
+        if self.max_idle and now - returned_at > self.max_idle:
+            return False
+        if now - returned_at > self.health_check_interval:
+            try:
+                cur = conn.cursor()
+                cur.execute("SELECT 1")
+                cur.close()
+                conn.rollback()
+            except Exception:
+                return False
+        return True
+
+    def _new_connection(self, slot):
+        """Connect outside the lock, then swap the reserved slot for the real connection"""
+        try:
+            conn = self._connect()
+        except Exception:
+            with self._cond:
+                self._created.pop(id(slot), None)
+                self._cond.notify()
+            raise
+        with self._cond:
+            self._created.pop(id(slot), None)
+            self._created[id(conn)] = time.monotonic()
+        return conn
+
+    def acquire(self):
+        """Check a raw connection out of the pool"""
+        deadline = time.monotonic() + self.timeout
+        while True:
+            candidate = slot = None
+            with self._cond:
+                if self._closed:
+                    raise psycopg2.InterfaceError("connection pool is closed")
+                if self._idle:
+                    candidate = self._idle.pop()
+                elif len(self._created) < self.max_size:
+                    slot = object()
+                    self._created[id(slot)] = None
+                else:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        raise PoolTimeoutError(
+                            f"Timed out after {self.timeout}s waiting for a database connection "
+                            f"(pool max_size={self.max_size})"
+                        )
+                    self._cond.wait(remaining)
+                    continue
+
+            if slot is not None:
+                return self._new_connection(slot)
+
+            # Health check runs outside the lock so other threads are not blocked on it
+            conn, created_at, returned_at = candidate
+            if self._is_usable(conn, created_at, returned_at):
+                return conn
+            with self._cond:
+                self._discard(conn)
+                self._cond.notify()
+
+    def release(self, conn):
+        """Return a raw connection to the pool"""
+        with self._cond:
+            try:
+                if self._closed or conn.closed or id(conn) not in self._created:
+                    self._discard(conn)
+                    return
+
+                # Never hand out a connection with a transaction still open
+                if conn.get_transaction_status() != TRANSACTION_STATUS_IDLE:
+                    conn.rollback()
+
+                created_at = self._created[id(conn)]
+                if self.max_lifetime and time.monotonic() - created_at > self.max_lifetime:
+                    self._discard(conn)
+                    return
+
+                self._idle.append((conn, created_at, time.monotonic()))
+            except Exception:
+                self._discard(conn)
+            finally:
+                self._cond.notify()
+
+    def get_connection(self):
+        """Check out a connection whose close() returns it to the pool"""
+        return PooledConnection(self, self.acquire())
+
+    @contextmanager
+    def connection(self):
+        """
+        Context manager yielding a pooled connection.
+        Commits on success, rolls back on error, always returns the connection.
+        """
+        conn = self.get_connection()
+        try:
+            yield conn
+            conn.commit()
+        except Exception:
+            if not conn.closed:
+                conn.rollback()
+            raise
+        finally:
+            conn.close()
+
+    def fill(self):
+        """Open connections until min_size is reached"""
+        while True:
+            with self._cond:
+                if self._closed or len(self._created) >= self.min_size:
+                    return
+                slot = object()
+                self._created[id(slot)] = None
+            self.release(self._new_connection(slot))
+
+    def close(self):
+        """Close every idle connection; in-use ones are closed when released"""
+        with self._cond:
+            self._closed = True
+            while self._idle:
+                conn, _, _ = self._idle.pop()
+                self._discard(conn)
+            self._cond.notify_all()
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_pool():
+    """Return the process-wide connection pool, creating it on first use"""
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = ConnectionPool()
+    return _pool
+
+
+def close_pool():
+    """Close the process-wide connection pool (used on shutdown)"""
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.close()
+            _pool = None
+
+
 def get_connection():
     """
-    Create and return a PostgreSQL database connection.
+    Return a pooled PostgreSQL database connection.
+    Calling close() on it hands it back to the pool instead of disconnecting.
     Raises an exception if connection fails.
     """
     try:
-        db_url = os.getenv("DB_URL")
-        
-        if not db_url:
-            raise ValueError("DB_URL environment variable is not set. Check your .env file.")
-        
-        print(f"Attempting to connect to database...")
-        
-        # Create connection with timeout
-        conn = psycopg2.connect(db_url, connect_timeout=10)
-        
-        print("✓ Database connection successful!")
-        return conn
-        
+        return get_pool().get_connection()
+
     except OperationalError as e:
         print(f"✗ Database connection failed: {e}")
         raise
@@ -32,19 +311,92 @@ def get_connection():
         print(f"✗ Unexpected error: {e}")
         raise
 
+
+def connection():
+    """
+    Context manager around a pooled connection:
+
+        with connection() as conn:
+            cur = conn.cursor()
+            ...
+
+    Commits on success, rolls back on error and always returns the connection to the pool.
+    """
+    return get_pool().connection()
+
+
+# ============================================
+# ASYNC ENGINE (psycopg 3)
+# ============================================
+# Used by the `async def` route handlers so a request waiting on Postgres does
+# not hold one of Starlette's threadpool workers. Sized by ASYNC_DB_POOL_MIN_SIZE /
+# ASYNC_DB_POOL_MAX_SIZE; timeouts and recycling follow the DB_POOL_* settings.
+
+_async_pool = None
+_async_pool_lock = None
+
+
+async def get_async_pool():
+    """Return the process-wide async connection pool, opening it on first use"""
+    global _async_pool, _async_pool_lock
+    if _async_pool is not None:
+        return _async_pool
+    if _async_pool_lock is None:
+        _async_pool_lock = asyncio.Lock()
+    async with _async_pool_lock:
+        if _async_pool is None:
+            pool = AsyncConnectionPool(
+                _get_db_url(),
+                min_size=ASYNC_DB_POOL_MIN_SIZE,
+                max_size=ASYNC_DB_POOL_MAX_SIZE,
+                timeout=DB_POOL_TIMEOUT_SECONDS,
+                max_lifetime=DB_POOL_MAX_LIFETIME_SECONDS,
+                max_idle=DB_POOL_MAX_IDLE_SECONDS,
+                check=AsyncConnectionPool.check_connection,
+                kwargs={"connect_timeout": 10},
+                open=False
+            )
+            await pool.open()
+            _async_pool = pool
+    return _async_pool
+
+
+async def close_async_pool():
+    """Close the process-wide async connection pool (used on shutdown)"""
+    global _async_pool
+    if _async_pool is not None:
+        pool, _async_pool = _async_pool, None
+        await pool.close()
+
+
+@asynccontextmanager
+async def async_connection():
+    """
+    Async context manager around a pooled psycopg 3 connection:
+
+        async with async_connection() as conn:
+            cur = conn.cursor()
+            await cur.execute(...)
+
+    Commits on success, rolls back on error and always returns the connection to the pool.
+    """
+    pool = await get_async_pool()
+    async with pool.connection() as conn:
+        yield conn
+
+
 def test_connection():
     """
     Test the database connection by executing a simple query.
     Returns True if successful, False otherwise.
     """
     try:
-        conn = get_connection()
-        cur = conn.cursor()
-        cur.execute("SELECT version();")
-        db_version = cur.fetchone()
-        print(f"Database version: {db_version[0]}")
-        cur.close()
-        conn.close()
+        with connection() as conn:
+            cur = conn.cursor()
+            cur.execute("SELECT version();")
+            db_version = cur.fetchone()
+            print(f"Database version: {db_version[0]}")
+            cur.close()
         return True
     except Exception as e:
         print(f"Connection test failed: {e}")
@@ -1,16 +1,60 @@
 """
-FastAPI dependencies for authentication
+FastAPI dependencies for authentication and database access
 """
-from fastapi import Depends, HTTPException, status
+from fastapi import Depends, HTTPException, Query, WebSocket, WebSocketException, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from app.auth import verify_token
-from app.db import get_connection
+from app.cache import TTLCache
+from app.db import get_connection, async_connection
 from typing import Optional
+import os
 
 security = HTTPBearer()
+stream_security = HTTPBearer(auto_error=False)
 
-def get_current_doctor(credentials: HTTPAuthorizationCredentials = Depends(security)) -> dict:
-    token = credentials.credentials
+# Authenticated doctors keyed by id. Entries are dropped explicitly on profile
+# update, status change and logout; the TTL bounds staleness for changes made
+# outside this process (another worker, or SQL run by hand).
+PRINCIPAL_CACHE_TTL_SECONDS = float(os.getenv("PRINCIPAL_CACHE_TTL_SECONDS", "60"))
+PRINCIPAL_CACHE_MAX_SIZE = int(os.getenv("PRINCIPAL_CACHE_MAX_SIZE", "10000"))
+principal_cache = TTLCache(maxsize=PRINCIPAL_CACHE_MAX_SIZE, ttl=PRINCIPAL_CACHE_TTL_SECONDS)
+
+def invalidate_principal(doctor_id: str) -> None:
+    """Forget the cached principal for a doctor (call after changing their row)"""
+    principal_cache.invalidate(str(doctor_id))
+
+PRINCIPAL_QUERY = """
+    SELECT id, first_name, last_name, email, specialization, status
+    FROM doctors
+    WHERE id = %s AND status = 'active'
+"""
+
+def get_db():
+    """
+    Request-scoped database connection.
+    FastAPI caches dependencies per request, so get_current_doctor and the route
+    handler share this one pooled connection and transaction. The transaction is
+    committed when the request finishes and rolled back if it raised.
+    """
+    conn = get_connection()
+    try:
+        yield conn
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
+
+async def get_async_db():
+    """Async counterpart of get_db for `async def` handlers (psycopg 3 connection)"""
+    async with async_connection() as conn:
+        yield conn
+
+def _doctor_id_from_credentials(credentials: HTTPAuthorizationCredentials) -> str:
+    return _doctor_id_from_token(credentials.credentials)
+
+def _doctor_id_from_token(token: str) -> str:
     payload = verify_token(token)
     if payload is None:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid or expired token")
@@ -18,39 +62,116 @@ def get_current_doctor(credentials: HTTPAuthorizationCredentials = Depends(secur
     doctor_id = payload.get("sub")
     if doctor_id is None:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid token payload")
+    return doctor_id
+
+def _principal_from_row(result) -> dict:
+    if not result:
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Doctor not found or inactive")
+    principal = {
+        "id": str(result[0]),
+        "first_name": result[1],
+        "last_name": result[2],
+        "email": result[3],
+        "specialization": result[4],
+        "status": result[5]
+    }
+    principal_cache.set(principal["id"], principal)
+    return dict(principal)
+
+def _cached_principal(doctor_id: str) -> Optional[dict]:
+    principal = principal_cache.get(str(doctor_id))
+    # Hand out a copy so a handler mutating it cannot poison the cache
+    return dict(principal) if principal is not None else None
+
+def get_current_doctor(credentials: HTTPAuthorizationCredentials = Depends(security), conn=Depends(get_db)) -> dict:
+    doctor_id = _doctor_id_from_credentials(credentials)
+    principal = _cached_principal(doctor_id)
+    if principal is not None:
+        return principal
 
-    conn = cur = None
+    cur = None
     try:
-        conn = get_connection()
         cur = conn.cursor()
-        cur.execute("""
-            SELECT id, first_name, last_name, email, specialization, status
-            FROM doctors
-            WHERE id = %s AND status = 'active'
-        """, (doctor_id,))
-        result = cur.fetchone()
-        if not result:
-            raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Doctor not found or inactive")
-        return {
-            "id": str(result[0]),
-            "first_name": result[1],
-            "last_name": result[2],
-            "email": result[3],
-            "specialization": result[4],
-            "status": result[5]
-        }
+        cur.execute(PRINCIPAL_QUERY, (doctor_id,))
+        return _principal_from_row(cur.fetchone())
     except HTTPException:
         raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
     finally:
         if cur: cur.close()
-        if conn: conn.close()
 
-def get_current_doctor_optional(credentials: Optional[HTTPAuthorizationCredentials] = Depends(security)) -> Optional[dict]:
+async def get_current_doctor_async(credentials: HTTPAuthorizationCredentials = Depends(security), conn=Depends(get_async_db)) -> dict:
+    doctor_id = _doctor_id_from_credentials(credentials)
+    principal = _cached_principal(doctor_id)
+    if principal is not None:
+        return principal
+
+    cur = None
+    try:
+        cur = conn.cursor()
+        await cur.execute(PRINCIPAL_QUERY, (doctor_id,))
+        return _principal_from_row(await cur.fetchone())
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+    finally:
+        if cur: await cur.close()
+
+def get_current_doctor_optional(credentials: Optional[HTTPAuthorizationCredentials] = Depends(security), conn=Depends(get_db)) -> Optional[dict]:
     if not credentials:
         return None
     try:
-        return get_current_doctor(credentials)
+        return get_current_doctor(credentials, conn)
     except HTTPException:
         return None
+
+async def _principal_from_token(token: Optional[str]) -> dict:
+    if not token:
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Not authenticated")
+    doctor_id = _doctor_id_from_token(token)
+    principal = _cached_principal(doctor_id)
+    if principal is not None:
+        return principal
+
+    try:
+        async with async_connection() as conn:
+            async with conn.cursor() as cur:
+                await cur.execute(PRINCIPAL_QUERY, (doctor_id,))
+                return _principal_from_row(await cur.fetchone())
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+async def get_current_doctor_lazy(credentials: HTTPAuthorizationCredentials = Depends(security)) -> dict:
+    """
+    Auth for routes that usually answer from memory (cached metrics). Unlike
+    get_current_doctor it does not depend on get_db, so a pooled connection is
+    borrowed only for a principal cache miss.
+    """
+    return await _principal_from_token(credentials.credentials)
+
+async def get_current_doctor_stream(
+    credentials: Optional[HTTPAuthorizationCredentials] = Depends(stream_security),
+    access_token: Optional[str] = Query(None, description="Bearer token, for clients that cannot set headers (EventSource)")
+) -> dict:
+    """
+    Auth for long-lived responses (server-sent events). Yield dependencies are
+    torn down only when the response ends, so this does not depend on
+    get_async_db: a pooled connection is borrowed just for a principal cache
+    miss instead of being held for the life of the stream.
+    """
+    return await _principal_from_token(credentials.credentials if credentials else access_token)
+
+async def get_current_doctor_websocket(
+    websocket: WebSocket,
+    access_token: Optional[str] = Query(None, description="Bearer token, for browsers (WebSocket cannot set headers)")
+) -> dict:
+    """Auth for WebSocket endpoints; a failure refuses the handshake (policy violation)"""
+    scheme, _, token = websocket.headers.get("authorization", "").partition(" ")
+    try:
+        return await _principal_from_token(token if scheme.lower() == "bearer" and token else access_token)
+    except HTTPException as e:
+        raise WebSocketException(code=status.WS_1008_POLICY_VIOLATION, reason=str(e.detail))
@@ -0,0 +1,216 @@
+"""
+In-process push of OR board changes
+
+One Board per (date, slot_minutes, day_start, day_end) that has at least one
+subscriber holds the current grid and a version. When a surgery on that date
+changes, publish_schedule_change() (callable from any thread) schedules one
+reload of the grid on the event loop; the diff against the previous grid is
+computed once and fanned out to every subscriber's queue. Reloads that are
+requested while one is running are coalesced into a single follow-up reload.
+
+Each worker process only sees its own writes, so a board also reloads every
+BOARD_RESYNC_SECONDS while it has subscribers to pick up changes made by other
+workers (or by hand). Boards are dropped with their last subscriber.
+"""
+import asyncio
+import logging
+import os
+import time
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Set, Tuple
+
+logger = logging.getLogger(__name__)
+
+BOARD_RESYNC_SECONDS = float(os.getenv("BOARD_RESYNC_SECONDS", "30"))
+BOARD_MAX_SUBSCRIBERS = int(os.getenv("BOARD_MAX_SUBSCRIBERS", "2000"))
+BOARD_QUEUE_SIZE = 100
+
+Loader = Callable[[], Awaitable[List[Dict[str, Any]]]]
+
+
+class BoardFull(Exception):
+    """Raised by subscribe() when the process already serves BOARD_MAX_SUBSCRIBERS streams"""
+
+
+def diff_grids(old: List[Dict[str, Any]], new: List[Dict[str, Any]]) -> Optional[List[Dict[str, Any]]]:
+    """
+    Changed cells between two grids of the same layout as
+    [{"time", "room", "cell"}], or None if the slots or rooms differ (the
+    subscriber then needs a new snapshot).
+    """
+    if len(old) != len(new):
+        return None
+    changes = []
+    for old_slot, new_slot in zip(old, new):
+        if old_slot["time"] != new_slot["time"] or old_slot["or_rooms"].keys() != new_slot["or_rooms"].keys():
+            return None
+        for room, cell in new_slot["or_rooms"].items():
+            if old_slot["or_rooms"][room] != cell:
+                changes.append({"time": new_slot["time"], "room": room, "cell": cell})
+    return changes
+
+
+class Board:
+    def __init__(self, key: Tuple, loader: Loader):
+        self.key = key
+        self.loader = loader
+        self.grid: List[Dict[str, Any]] = []
+        self.version = 0
+        self.subscribers: Set[asyncio.Queue] = set()
+        self.ready = asyncio.Event()
+        self.failed = False
+        self.reloading = False
+        self.dirty = False
+        self.resync_task: Optional[asyncio.Task] = None
+
+    def snapshot_event(self) -> Tuple[str, int, Dict[str, Any]]:
+        return "snapshot", self.version, {"version": self.version, "time_slots": self.grid}
+
+    def send(self, event: Tuple[str, int, Dict[str, Any]]) -> None:
+        for queue in self.subscribers:
+            try:
+                queue.put_nowait(event)
+            except asyncio.QueueFull:
+                # Too far behind for diffs to be useful: replace its backlog with a snapshot
+                while not queue.empty():
+                    queue.get_nowait()
+                queue.put_nowait(self.snapshot_event())
+
+
+class BoardBroker:
+    def __init__(self):
+        self._boards: Dict[Tuple, Board] = {}
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self.published = 0
+        self.reloads = 0
+        self.diffs_sent = 0
+
+    def subscriber_count(self) -> int:
+        return sum(len(board.subscribers) for board in self._boards.values())
+
+    async def subscribe(self, key: Tuple, loader: Loader) -> Tuple[Board, asyncio.Queue]:
+        """
+        Join (or open) the board for key. The queue receives (event, version,
+        data) tuples: a "snapshot" first, then "diff"s. Call unsubscribe() when done.
+        """
+        if self.subscriber_count() >= BOARD_MAX_SUBSCRIBERS:
+            raise BoardFull()
+        self._loop = asyncio.get_running_loop()
+        while True:
+            board = self._boards.get(key)
+            if board is None:
+                board = await self._open(key, loader)
+                break
+            await board.ready.wait()
+            if board.failed:
+                raise RuntimeError("OR board could not be loaded")
+            if self._boards.get(key) is board:
+                break
+            # Its last subscriber left (closing it) while we waited: open or join the current one
+        queue = asyncio.Queue(maxsize=BOARD_QUEUE_SIZE)
+        queue.put_nowait(board.snapshot_event())
+        board.subscribers.add(queue)
+        return board, queue
+
+    async def _open(self, key: Tuple, loader: Loader) -> Board:
+        board = self._boards[key] = Board(key, loader)
+        board.resync_task = asyncio.create_task(self._resync(board))
+        try:
+            board.grid = await loader()
+        except BaseException:
+            # Including cancellation (the client went away): waiters must not hang on ready
+            board.failed = True
+            board.ready.set()
+            self._close(board)
+            raise
+        # Versions start from the clock so a Last-Event-ID from an earlier board never matches
+        board.version = time.time_ns() // 1_000_000
+        board.ready.set()
+        if board.dirty:
+            self._request_reload(board)
+        return board
+
+    def unsubscribe(self, board: Board, queue: asyncio.Queue) -> None:
+        board.subscribers.discard(queue)
+        if not board.subscribers and self._boards.get(board.key) is board:
+            self._close(board)
+
+    def _close(self, board: Board) -> None:
+        self._boards.pop(board.key, None)
+        if board.resync_task:
+            board.resync_task.cancel()
+
+    def publish(self, day) -> None:
+        """A surgery on `day` changed; safe to call from any thread, after the commit"""
+        loop = self._loop
+        if loop is None or loop.is_closed():
+            return
+        self.published += 1
+        try:
+            loop.call_soon_threadsafe(self._reload_day, day)
+        except RuntimeError:
+            pass  # loop shutting down
+
+    def _reload_day(self, day) -> None:
+        for board in list(self._boards.values()):
+            if board.key[0] != day:
+                continue
+            if board.ready.is_set():
+                self._request_reload(board)
+            else:
+                board.dirty = True  # the initial load may have read the old rows
+
+    def _request_reload(self, board: Board) -> None:
+        if board.reloading:
+            board.dirty = True
+            return
+        board.reloading = True
+        asyncio.get_running_loop().create_task(self._reload(board))
+
+    async def _reload(self, board: Board) -> None:
+        try:
+            while True:
+                board.dirty = False
+                try:
+                    grid = await board.loader()
+                except Exception:
+                    logger.exception("Reloading OR board %s failed", board.key)
+                    return
+                self.reloads += 1
+                changes = diff_grids(board.grid, grid)
+                if changes is None:
+                    board.grid = grid
+                    board.version += 1
+                    board.send(board.snapshot_event())
+                elif changes:
+                    board.grid = grid
+                    board.version += 1
+                    self.diffs_sent += len(board.subscribers)
+                    board.send(("diff", board.version, {"version": board.version, "changes": changes}))
+                if not board.dirty:
+                    return
+        finally:
+            board.reloading = False
+
+    async def _resync(self, board: Board) -> None:
+        while True:
+            await asyncio.sleep(BOARD_RESYNC_SECONDS)
+            if board.ready.is_set():
+                self._request_reload(board)
+
+    def stats(self) -> dict:
+        return {
+            "boards": len(self._boards),
+            "subscribers": self.subscriber_count(),
+            "published": self.published,
+            "reloads": self.reloads,
+            "diffs_sent": self.diffs_sent
+        }
+
+
+board_broker = BoardBroker()
+
+
+def publish_schedule_change(*days) -> None:
+    """Tell open OR boards that surgeries on these dates changed (call after commit)"""
+    for day in {day for day in days if day is not None}:
+        board_broker.publish(day)
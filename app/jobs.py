@@ -0,0 +1,119 @@
+"""
+Periodic background jobs
+
+Jobs are registered with register_job() and run on the event loop from
+start_jobs() (app startup) until stop_jobs() (app shutdown). Sync job functions
+run in a worker thread. A failing run is logged and retried on the next tick.
+Every worker process runs its own scheduler, so jobs must be idempotent.
+"""
+import asyncio
+import logging
+import os
+import time
+from typing import Callable, Dict
+
+from app.db import async_connection
+
+logger = logging.getLogger(__name__)
+
+REFRESH_TOKEN_PURGE_INTERVAL_SECONDS = float(os.getenv("REFRESH_TOKEN_PURGE_INTERVAL_SECONDS", "3600"))
+REFRESH_TOKEN_PURGE_BATCH_SIZE = int(os.getenv("REFRESH_TOKEN_PURGE_BATCH_SIZE", "5000"))
+
+_jobs: Dict[str, dict] = {}
+_tasks: Dict[str, asyncio.Task] = {}
+
+
+def register_job(name: str, interval_seconds: float, func: Callable, run_at_startup: bool = True) -> None:
+    """Register func to run every interval_seconds (replaces a job with the same name)"""
+    _jobs[name] = {
+        "func": func,
+        "interval_seconds": interval_seconds,
+        "run_at_startup": run_at_startup,
+        "runs": 0,
+        "failures": 0,
+        "last_run_at": None,
+        "last_duration_ms": None,
+        "last_result": None,
+        "last_error": None
+    }
+
+
+async def run_job(name: str):
+    """Run one job now and record the outcome"""
+    job = _jobs[name]
+    started = time.perf_counter()
+    try:
+        if asyncio.iscoroutinefunction(job["func"]):
+            result = await job["func"]()
+        else:
+            result = await asyncio.to_thread(job["func"])
+        job["last_result"] = result
+        job["last_error"] = None
+        return result
+    except Exception as e:
+        job["failures"] += 1
+        job["last_error"] = str(e)
+        logger.exception("Background job %s failed", name)
+    finally:
+        job["runs"] += 1
+        job["last_run_at"] = time.time()
+        job["last_duration_ms"] = round((time.perf_counter() - started) * 1000, 1)
+
+
+async def _job_loop(name: str):
+    job = _jobs[name]
+    if not job["run_at_startup"]:
+        await asyncio.sleep(job["interval_seconds"])
+    while True:
+        await run_job(name)
+        await asyncio.sleep(job["interval_seconds"])
+
+
+async def start_jobs():
+    """Start a loop per registered job (no-op for jobs already running)"""
+    for name in _jobs:
+        if name not in _tasks or _tasks[name].done():
+            _tasks[name] = asyncio.create_task(_job_loop(name), name=f"job:{name}")
+
+
+async def stop_jobs():
+    """Cancel all job loops and wait for them to finish"""
+    tasks = list(_tasks.values())
+    _tasks.clear()
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+
+
+def job_stats() -> dict:
+    return {
+        name: {key: value for key, value in job.items() if key != "func"} | {"running": name in _tasks}
+        for name, job in _jobs.items()
+    }
+
+
+# ============================================
+# JOBS
+# ============================================
+
+async def purge_expired_refresh_tokens() -> int:
+    """
+    Delete expired refresh tokens in batches (short transactions, no long table lock).
+    Returns the number of rows deleted.
+    """
+    deleted = 0
+    while True:
+        async with async_connection() as conn:
+            async with conn.cursor() as cur:
+                await cur.execute("""
+                    DELETE FROM refresh_tokens
+                    WHERE id IN (
+                        SELECT id FROM refresh_tokens
+                        WHERE expires_at <= NOW()
+                        LIMIT %s
+                    )
+                """, (REFRESH_TOKEN_PURGE_BATCH_SIZE,))
+                batch = cur.rowcount
+        deleted += batch
+        if batch < REFRESH_TOKEN_PURGE_BATCH_SIZE:
+            return deleted
@@ -0,0 +1,202 @@
+"""
+Live transcription over WebSocket
+
+A client streams raw 16-bit mono PCM frames for a transcription that is still
+'recording'. Each frame goes through an incremental recognizer, and the
+recognizer's events are pushed back as JSON:
+
+    {"type": "partial", "text": ..., "start": s, "end": s}   words heard so far, may change
+    {"type": "final", "index": n, "text": ..., "start": s, "end": s}   settled segment
+    {"type": "done", "segments": n, "duration_seconds": s}   after {"type": "stop"}
+
+Every final segment is appended to transcriptions.transcription_text as soon as
+it is produced, so by the time /stop is called the text is already stored and
+the transcription completes without a background job. When the socket drops,
+the words heard so far are finalized and stored as well.
+
+LIVE_RECOGNIZER names the recognizer class as "module:Class"; it is built with
+the sample rate and must provide accept_audio(frame) -> events and finish() ->
+events, where events are dicts with type ("partial"/"final"), text, start and
+end. Calls run in a worker thread so a real decoder does not block the event
+loop. The default StubRecognizer is deterministic: it reveals a fixed text at
+STUB_WORDS_PER_SECOND of audio received, finalizing at sentence ends.
+"""
+import asyncio
+import importlib
+import json
+import os
+from typing import Any, Dict, List, Optional, Set
+
+from fastapi import WebSocket, WebSocketDisconnect, status
+
+from app.db import async_connection
+from app.transcription import STUB_TEXT
+
+LIVE_RECOGNIZER = os.getenv("LIVE_RECOGNIZER", "app.live_transcription:StubRecognizer")
+LIVE_MAX_FRAME_BYTES = int(os.getenv("LIVE_MAX_FRAME_BYTES", str(64 * 1024)))
+LIVE_MAX_SESSIONS = int(os.getenv("LIVE_MAX_SESSIONS", "200"))
+STUB_WORDS_PER_SECOND = 2.5
+BYTES_PER_SAMPLE = 2
+
+# CONCAT_WS skips the NULL of an empty transcript. Nothing is written once the
+# transcription has left 'recording' (stopped or discarded).
+APPEND_SEGMENT = """
+    UPDATE transcriptions
+    SET transcription_text = CONCAT_WS(' ', transcription_text, %s::text),
+        recording_duration_seconds = %s
+    WHERE id = %s AND doctor_id = %s AND transcription_status = 'recording'
+    RETURNING id
+"""
+
+
+class LiveSessionBusy(Exception):
+    pass
+
+
+class StubRecognizer:
+    """Deterministic offline recognizer: the words of STUB_TEXT, paced by audio length"""
+
+    def __init__(self, sample_rate: int):
+        self.bytes_per_second = sample_rate * BYTES_PER_SAMPLE
+        self.words = STUB_TEXT.split()
+        self.received = 0
+        self.finalized = 0  # words already sent in final segments (counts past the text: it repeats)
+        self.last_partial: Optional[str] = None
+
+    def _word(self, index: int) -> str:
+        return self.words[index % len(self.words)]
+
+    def _segment(self, kind: str, first: int, last: int) -> Dict[str, Any]:
+        return {
+            "type": kind,
+            "text": " ".join(self._word(i) for i in range(first, last)),
+            "start": round(first / STUB_WORDS_PER_SECOND, 2),
+            "end": round(last / STUB_WORDS_PER_SECOND, 2)
+        }
+
+    def _events(self, finish: bool) -> List[Dict[str, Any]]:
+        heard = int(self.received / self.bytes_per_second * STUB_WORDS_PER_SECOND)
+        events = []
+        sentence_start = self.finalized
+        for index in range(self.finalized, heard):
+            if self._word(index).endswith("."):
+                events.append(self._segment("final", sentence_start, index + 1))
+                sentence_start = index + 1
+        if finish and heard > sentence_start:
+            events.append(self._segment("final", sentence_start, heard))
+            sentence_start = heard
+        self.finalized = sentence_start
+        if heard > sentence_start:
+            partial = self._segment("partial", sentence_start, heard)
+            if partial["text"] != self.last_partial:
+                self.last_partial = partial["text"]
+                events.append(partial)
+        return events
+
+    def accept_audio(self, frame: bytes) -> List[Dict[str, Any]]:
+        self.received += len(frame)
+        return self._events(finish=False)
+
+    def finish(self) -> List[Dict[str, Any]]:
+        return self._events(finish=True)
+
+
+def load_recognizer(sample_rate: int, name: str = LIVE_RECOGNIZER):
+    module, _, cls = name.partition(":")
+    return getattr(importlib.import_module(module), cls)(sample_rate)
+
+
+class LiveSession:
+    """One WebSocket dictation: frames in, partial/final segments out, finals persisted"""
+
+    def __init__(self, websocket: WebSocket, transcription_id: str, doctor_id: str, sample_rate: int):
+        self.websocket = websocket
+        self.transcription_id = transcription_id
+        self.doctor_id = doctor_id
+        self.recognizer = load_recognizer(sample_rate)
+        self.bytes_per_second = sample_rate * BYTES_PER_SAMPLE
+        self.received = 0
+        self.segments = 0
+
+    @property
+    def duration_seconds(self) -> int:
+        return round(self.received / self.bytes_per_second)
+
+    async def _persist(self, text: str) -> bool:
+        async with async_connection() as conn:
+            async with conn.cursor() as cur:
+                await cur.execute(APPEND_SEGMENT, (text, self.duration_seconds, self.transcription_id, self.doctor_id))
+                return await cur.fetchone() is not None
+
+    async def _deliver(self, events: List[Dict[str, Any]], send: bool = True) -> bool:
+        """Persist finals, then push every event; False once the transcription no longer records"""
+        for event in events:
+            if event["type"] == "final":
+                if not await self._persist(event["text"]):
+                    return False
+                event = {**event, "index": self.segments}
+                self.segments += 1
+            if send:
+                await self.websocket.send_json(event)
+        return True
+
+    async def run(self) -> None:
+        websocket = self.websocket
+        try:
+            while True:
+                message = await websocket.receive()
+                if message["type"] == "websocket.disconnect":
+                    raise WebSocketDisconnect(message.get("code", status.WS_1000_NORMAL_CLOSURE))
+                frame, text = message.get("bytes"), message.get("text")
+                if frame is not None:
+                    if len(frame) > LIVE_MAX_FRAME_BYTES:
+                        await websocket.close(code=status.WS_1009_MESSAGE_TOO_BIG,
+                                              reason=f"Frames cannot exceed {LIVE_MAX_FRAME_BYTES} bytes")
+                        return
+                    self.received += len(frame)
+                    events = await asyncio.to_thread(self.recognizer.accept_audio, frame)
+                    if not await self._deliver(events):
+                        await websocket.close(code=status.WS_1008_POLICY_VIOLATION, reason="Recording is no longer active")
+                        return
+                elif text is not None:
+                    try:
+                        control = json.loads(text)
+                    except ValueError:
+                        control = None
+                    if not isinstance(control, dict) or control.get("type") != "stop":
+                        await websocket.send_json({"type": "error", "detail": 'Expected audio frames or {"type": "stop"}'})
+                        continue
+                    await self._deliver(await asyncio.to_thread(self.recognizer.finish))
+                    await websocket.send_json({
+                        "type": "done", "segments": self.segments, "duration_seconds": self.duration_seconds
+                    })
+                    await websocket.close()
+                    return
+        except WebSocketDisconnect:
+            # Dropped mid-dictation: keep what was heard
+            await self._deliver(await asyncio.to_thread(self.recognizer.finish), send=False)
+
+
+class LiveSessions:
+    """Live sessions in this process: one per transcription, at most LIVE_MAX_SESSIONS"""
+
+    def __init__(self):
+        self._active: Set[str] = set()
+        self.started = 0
+
+    def open(self, transcription_id: str) -> None:
+        if transcription_id in self._active:
+            raise LiveSessionBusy("This transcription is already streaming")
+        if len(self._active) >= LIVE_MAX_SESSIONS:
+            raise LiveSessionBusy("Too many live transcriptions")
+        self._active.add(transcription_id)
+        self.started += 1
+
+    def close(self, transcription_id: str) -> None:
+        self._active.discard(transcription_id)
+
+    def stats(self) -> dict:
+        return {"active": len(self._active), "max_sessions": LIVE_MAX_SESSIONS, "started": self.started}
+
+
+live_sessions = LiveSessions()
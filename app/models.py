@@ -26,6 +26,7 @@ class RefreshRequest(BaseModel):
 
 class TokenResponse(BaseModel):
     access_token: str
+    refresh_token: Optional[str] = None
     token_type: str = "bearer"
 
 # ============================================
@@ -111,6 +112,11 @@ class PatientResponse(PatientBase):
     class Config:
         from_attributes = True
 
+class PatientSearchResult(PatientResponse):
+    # Only set by ranked search; left unset (and omitted) otherwise
+    score: Optional[float] = None
+    matched_fields: Optional[List[str]] = None
+
 # ============================================
 # OPERATING ROOM MODELS
 # ============================================
@@ -224,6 +230,11 @@ class TranscriptionStop(BaseModel):
 class StartRecordingRequest(BaseModel):
     patient_id: Optional[str] = None
 
+class AudioUploadComplete(BaseModel):
+    audio_format: str = Field("wav", pattern="^(wav|webm|ogg|m4a|mp3)$")
+    sha256: Optional[str] = Field(None, pattern="^[0-9a-fA-F]{64}$")  # of the whole recording
+    duration_seconds: Optional[int] = Field(None, ge=0)
+
 class TranscriptionResponse(BaseModel):
     id: str
     transcription_status: str
@@ -311,6 +322,25 @@ class ORBookingRequest(BaseModel):
     urgency_level: Optional[str] = "routine"
     participants: Optional[List[str]] = None
 
+class AutoScheduleCase(BaseModel):
+    patient_id: str
+    surgery_type: str = Field(..., max_length=100)
+    procedure_name: str = Field(..., max_length=200)
+    duration_minutes: int = Field(..., ge=5, le=24 * 60)
+    urgency_level: str = Field("routine", pattern="^(routine|urgent|emergency)$")
+    doctor_id: Optional[str] = None  # surgeon; defaults to the requesting doctor
+    room_ids: Optional[List[str]] = None  # allowed operating rooms; any room when omitted
+
+class AutoScheduleRequest(BaseModel):
+    cases: List[AutoScheduleCase] = Field(..., min_length=1, max_length=1000)
+    start: date
+    end: date  # exclusive
+    day_start: time = time(7, 0)
+    day_end: time = time(20, 0)
+    step_minutes: int = 15
+    time_limit_seconds: float = Field(2.0, gt=0, le=30)
+    dry_run: bool = False
+
 class TimeSlotStatus(BaseModel):
     time: str
     or_rooms: Dict[str, Dict[str, Any]]  # or_id: {status, patient_name, etc}
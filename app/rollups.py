@@ -0,0 +1,98 @@
+"""
+Rollup tables: refresh and reconciliation jobs
+
+doctor_stats is kept current by triggers (migrations/doctor_stats_rollup.sql);
+rebuild_doctor_stats repairs drift from bulk loads done with triggers disabled,
+manual SQL, or a bug in the triggers. dashboard_metrics has no triggers: its
+current day is recomputed on a short interval by refresh_dashboard_metrics.
+"""
+import os
+from datetime import date, datetime, time, timedelta
+
+from app.db import async_connection
+
+DOCTOR_STATS_REBUILD_INTERVAL_SECONDS = float(os.getenv("DOCTOR_STATS_REBUILD_INTERVAL_SECONDS", "86400"))
+
+
+async def rebuild_doctor_stats() -> bool:
+    """
+    Rebuild doctor_stats and doctor_patients from scratch (one transaction).
+    Returns False if another worker was already rebuilding.
+    """
+    async with async_connection() as conn:
+        async with conn.cursor() as cur:
+            await cur.execute("SELECT rebuild_doctor_stats()")
+            return (await cur.fetchone())[0]
+
+
+# ============================================
+# DASHBOARD METRICS
+# ============================================
+
+DASHBOARD_METRICS_REFRESH_INTERVAL_SECONDS = float(os.getenv("DASHBOARD_METRICS_REFRESH_INTERVAL_SECONDS", "60"))
+
+# Recompute one day's dashboard_metrics row and upsert it. Every aggregate is an
+# indexed range over that day only. OR utilization is a live snapshot of room
+# status, so it is only taken for today; a past day keeps the value it had.
+# Wait time = minutes between the scheduled and actual start of the day's
+# surgeries that started (early starts count as zero).
+DASHBOARD_METRICS_UPSERT = """
+    INSERT INTO dashboard_metrics (
+        metric_date, or_utilization_percentage, total_patients_count, total_surgeries_count,
+        completed_surgeries_count, cancelled_surgeries_count, notes_taken_count,
+        avg_wait_time_minutes, updated_at
+    )
+    SELECT %(day)s::date,
+           CASE WHEN %(is_today)s THEN (
+               SELECT ROUND(COUNT(*) FILTER (WHERE status = 'in_use') * 100.0 / NULLIF(COUNT(*), 0), 2)
+               FROM operating_rooms
+           ) END,
+           (SELECT COUNT(*) FROM patients WHERE status = 'active'),
+           s.total, s.completed, s.cancelled,
+           (SELECT COUNT(*) FROM notes WHERE created_at >= %(day)s::date AND created_at < %(day)s::date + 1),
+           s.avg_wait,
+           CURRENT_TIMESTAMP
+    FROM (
+        SELECT COUNT(*) AS total,
+               COUNT(*) FILTER (WHERE status = 'completed') AS completed,
+               COUNT(*) FILTER (WHERE status = 'cancelled') AS cancelled,
+               ROUND(AVG(GREATEST(
+                   EXTRACT(EPOCH FROM actual_start_time - (scheduled_date + scheduled_time)) / 60, 0
+               )))::INTEGER AS avg_wait
+        FROM surgeries
+        WHERE scheduled_date = %(day)s::date
+    ) s
+    ON CONFLICT (metric_date) DO UPDATE SET
+        or_utilization_percentage = COALESCE(EXCLUDED.or_utilization_percentage, dashboard_metrics.or_utilization_percentage),
+        total_patients_count = EXCLUDED.total_patients_count,
+        total_surgeries_count = EXCLUDED.total_surgeries_count,
+        completed_surgeries_count = EXCLUDED.completed_surgeries_count,
+        cancelled_surgeries_count = EXCLUDED.cancelled_surgeries_count,
+        notes_taken_count = EXCLUDED.notes_taken_count,
+        avg_wait_time_minutes = EXCLUDED.avg_wait_time_minutes,
+        updated_at = EXCLUDED.updated_at
+    RETURNING or_utilization_percentage, total_patients_count, total_surgeries_count,
+              completed_surgeries_count, avg_wait_time_minutes, cancelled_surgeries_count
+"""
+
+
+async def refresh_dashboard_metrics() -> list:
+    """
+    Upsert today's dashboard_metrics row, and yesterday's once more if it was
+    last refreshed before midnight (so late updates to yesterday are captured).
+    Returns the dates refreshed.
+    """
+    today = date.today()
+    yesterday = today - timedelta(days=1)
+    days = [today]
+    async with async_connection() as conn:
+        async with conn.cursor() as cur:
+            await cur.execute("""
+                SELECT 1 FROM dashboard_metrics
+                WHERE metric_date = %s AND updated_at >= %s
+            """, (yesterday, datetime.combine(today, time.min)))
+            if not await cur.fetchone():
+                days.insert(0, yesterday)
+            for day in days:
+                await cur.execute(DASHBOARD_METRICS_UPSERT, {"day": day, "is_today": day == today})
+    return [day.isoformat() for day in days]
@@ -1,18 +1,15 @@
 """Analysis routes - AI analysis of transcriptions"""
 from fastapi import APIRouter, HTTPException, Depends
-from app.dependencies import get_current_doctor
-from app.db import get_connection
+from app.dependencies import get_current_doctor, get_db
 
 router = APIRouter()
 
 @router.get("/{transcription_id}")
-def get_transcription_analysis(transcription_id: str, current_doctor: dict = Depends(get_current_doctor)):
+def get_transcription_analysis(transcription_id: str, current_doctor: dict = Depends(get_current_doctor), conn=Depends(get_db)):
     """Get AI analysis for a transcription (mock implementation)"""
-    conn = None
     cur = None
     
     try:
-        conn = get_connection()
         cur = conn.cursor()
         
         # Check if analysis exists
@@ -75,5 +72,3 @@ def get_transcription_analysis(transcription_id: str, current_doctor: dict = Dep
     finally:
         if cur:
             cur.close()
-        if conn:
-            conn.close()
@@ -2,42 +2,73 @@
 Authentication routes - Login, refresh, profile
 """
 from fastapi import APIRouter, HTTPException, Depends, status
+from fastapi.security import HTTPAuthorizationCredentials
 from app.models import LoginRequest, LoginResponse, RefreshRequest, TokenResponse, DoctorUpdate
-from app.auth import verify_password, create_access_token, create_refresh_token, verify_token, get_password_hash
-from app.dependencies import get_current_doctor
-from app.db import get_connection
+from app.auth import (
+    create_access_token, create_refresh_token, verify_token, verify_and_update_password_async,
+    get_password_hash_async, PasswordHasherBusy, revoke_token, revoke_subject_tokens,
+    refresh_token_digest, REFRESH_TOKEN_EXPIRE_DAYS, MAX_REFRESH_TOKENS_PER_DOCTOR
+)
+from app.db import async_connection
+from app.dependencies import get_current_doctor_async, get_async_db, invalidate_principal, security
 from datetime import datetime, timedelta
 
 router = APIRouter()
 
+async def _issue_refresh_token(cur, doctor_id: str) -> str:
+    """Create a refresh token, store its digest and trim the doctor's oldest tokens past the cap"""
+    refresh_token = create_refresh_token(data={"sub": doctor_id})
+    expires_at = datetime.utcnow() + timedelta(days=REFRESH_TOKEN_EXPIRE_DAYS)
+    await cur.execute("""
+        INSERT INTO refresh_tokens (doctor_id, token_hash, expires_at)
+        VALUES (%s, %s, %s)
+    """, (doctor_id, refresh_token_digest(refresh_token), expires_at))
+    await cur.execute("""
+        DELETE FROM refresh_tokens
+        WHERE id IN (
+            SELECT id FROM refresh_tokens
+            WHERE doctor_id = %s
+            ORDER BY created_at DESC, id DESC
+            OFFSET %s
+        )
+    """, (doctor_id, MAX_REFRESH_TOKENS_PER_DOCTOR))
+    return refresh_token
+
 @router.post("/login", response_model=LoginResponse)
-def login(credentials: LoginRequest):
+async def login(credentials: LoginRequest):
     """Login with email and password"""
-    conn = cur = None
+    # Not on get_async_db: the connection is released while bcrypt runs, so a
+    # login storm cannot hold the whole pool waiting on the password hasher.
     try:
-        conn = get_connection()
-        cur = conn.cursor()
-        cur.execute("""
-            SELECT id, first_name, last_name, email, password_hash, specialization, status
-            FROM doctors
-            WHERE email = %s
-        """, (credentials.email,))
-        result = cur.fetchone()
+        async with async_connection() as conn:
+            async with conn.cursor() as cur:
+                await cur.execute("""
+                    SELECT id, first_name, last_name, email, password_hash, specialization, status
+                    FROM doctors
+                    WHERE email = %s
+                """, (credentials.email,))
+                result = await cur.fetchone()
         if not result:
             raise HTTPException(status_code=401, detail="Invalid email or password")
         doctor_id, first_name, last_name, email, password_hash, specialization, status_val = result
         if status_val != 'active':
             raise HTTPException(status_code=403, detail="Account is inactive")
-        if not password_hash or not verify_password(credentials.password, password_hash):
+        if not password_hash:
+            raise HTTPException(status_code=401, detail="Invalid email or password")
+        try:
+            verified, new_hash = await verify_and_update_password_async(credentials.password, password_hash)
+        except PasswordHasherBusy:
+            raise HTTPException(status_code=503, detail="Too many concurrent logins, please retry",
+                                headers={"Retry-After": "1"})
+        if not verified:
             raise HTTPException(status_code=401, detail="Invalid email or password")
         access_token = create_access_token(data={"sub": str(doctor_id), "email": email})
-        refresh_token = create_refresh_token(data={"sub": str(doctor_id)})
-        expires_at = datetime.utcnow() + timedelta(days=7)
-        cur.execute("""
-            INSERT INTO refresh_tokens (doctor_id, token, expires_at)
-            VALUES (%s, %s, %s)
-        """, (str(doctor_id), refresh_token, expires_at))
-        conn.commit()
+        async with async_connection() as conn:
+            async with conn.cursor() as cur:
+                if new_hash:
+                    # Stored hash used an outdated cost factor; upgrade it transparently
+                    await cur.execute("UPDATE doctors SET password_hash = %s WHERE id = %s", (new_hash, doctor_id))
+                refresh_token = await _issue_refresh_token(cur, str(doctor_id))
         return {
             "access_token": access_token,
             "refresh_token": refresh_token,
@@ -54,68 +85,72 @@ def login(credentials: LoginRequest):
         raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
-    finally:
-        if cur: cur.close()
-        if conn: conn.close()
 
 @router.post("/refresh", response_model=TokenResponse)
-def refresh_token(request: RefreshRequest):
-    """Refresh access token using refresh token"""
-    conn = cur = None
+async def refresh_token(request: RefreshRequest, conn=Depends(get_async_db)):
+    """Refresh access token using refresh token (the refresh token is rotated)"""
+    cur = None
     try:
         payload = verify_token(request.refresh_token)
         if not payload:
             raise HTTPException(status_code=401, detail="Invalid refresh token")
         doctor_id = payload.get("sub")
-        conn = get_connection()
         cur = conn.cursor()
-        cur.execute("""
-            SELECT expires_at FROM refresh_tokens
-            WHERE doctor_id = %s AND token = %s AND expires_at > NOW()
-        """, (doctor_id, request.refresh_token))
-        if not cur.fetchone():
+        # Consuming the stored digest makes every refresh token single-use
+        await cur.execute("""
+            DELETE FROM refresh_tokens
+            WHERE token_hash = %s AND doctor_id = %s AND expires_at > NOW()
+            RETURNING id
+        """, (refresh_token_digest(request.refresh_token), doctor_id))
+        if not await cur.fetchone():
             raise HTTPException(status_code=401, detail="Refresh token expired or invalid")
-        cur.execute("SELECT email FROM doctors WHERE id = %s", (doctor_id,))
-        result = cur.fetchone()
+        await cur.execute("SELECT email FROM doctors WHERE id = %s", (doctor_id,))
+        result = await cur.fetchone()
         if not result:
             raise HTTPException(status_code=404, detail="Doctor not found")
         access_token = create_access_token(data={"sub": doctor_id, "email": result[0]})
-        return {"access_token": access_token, "token_type": "bearer"}
+        new_refresh_token = await _issue_refresh_token(cur, doctor_id)
+        await conn.commit()
+        revoke_token(request.refresh_token)  # also drops its cached payload
+        return {"access_token": access_token, "refresh_token": new_refresh_token, "token_type": "bearer"}
     except HTTPException:
         raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
     finally:
-        if cur: cur.close()
-        if conn: conn.close()
+        if cur: await cur.close()
 
 @router.post("/logout")
-def logout(current_doctor: dict = Depends(get_current_doctor)):
-    """Logout - invalidate refresh tokens"""
-    conn = cur = None
+async def logout(
+    current_doctor: dict = Depends(get_current_doctor_async),
+    credentials: HTTPAuthorizationCredentials = Depends(security),
+    conn=Depends(get_async_db)
+):
+    """Logout - invalidate refresh tokens and every access token issued so far"""
+    cur = None
     try:
-        conn = get_connection()
         cur = conn.cursor()
-        cur.execute("DELETE FROM refresh_tokens WHERE doctor_id = %s", (current_doctor["id"],))
-        conn.commit()
+        await cur.execute("DELETE FROM refresh_tokens WHERE doctor_id = %s", (current_doctor["id"],))
+        await conn.commit()
+        revoke_token(credentials.credentials)
+        revoke_subject_tokens(current_doctor["id"])
+        invalidate_principal(current_doctor["id"])
         return {"message": "Logged out successfully"}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
     finally:
-        if cur: cur.close()
-        if conn: conn.close()
+        if cur: await cur.close()
 
 @router.get("/me")
-def get_current_user(current_doctor: dict = Depends(get_current_doctor)):
+async def get_current_user(current_doctor: dict = Depends(get_current_doctor_async)):
     """Get current logged-in doctor info"""
     return current_doctor
 
 @router.put("/profile")
-def update_profile(updates: DoctorUpdate, current_doctor: dict = Depends(get_current_doctor)):
+async def update_profile(updates: DoctorUpdate, current_doctor: dict = Depends(get_current_doctor_async), conn=Depends(get_async_db)):
     """Update current doctor's profile"""
-    conn = cur = None
+    cur = None
     try:
-        conn = get_connection()
         cur = conn.cursor()
         update_fields, params = [], []
         if updates.first_name:
@@ -138,7 +173,11 @@ def update_profile(updates: DoctorUpdate, current_doctor: dict = Depends(get_cur
             params.append(updates.profile_image_url)
         if updates.password:
             update_fields.append("password_hash = %s")
-            params.append(get_password_hash(updates.password))
+            try:
+                params.append(await get_password_hash_async(updates.password))
+            except PasswordHasherBusy:
+                raise HTTPException(status_code=503, detail="Password service busy, please retry",
+                                    headers={"Retry-After": "1"})
         if not update_fields:
             raise HTTPException(status_code=400, detail="No fields to update")
         params.append(current_doctor["id"])
@@ -148,9 +187,10 @@ def update_profile(updates: DoctorUpdate, current_doctor: dict = Depends(get_cur
             WHERE id = %s
             RETURNING id, first_name, last_name, email, phone, specialization, profile_image_url
         """
-        cur.execute(query, params)
-        result = cur.fetchone()
-        conn.commit()
+        await cur.execute(query, params)
+        result = await cur.fetchone()
+        await conn.commit()
+        invalidate_principal(current_doctor["id"])
         return {
             "id": str(result[0]),
             "first_name": result[1],
@@ -163,9 +203,7 @@ def update_profile(updates: DoctorUpdate, current_doctor: dict = Depends(get_cur
     except HTTPException:
         raise
     except Exception as e:
-        if conn:
-            conn.rollback()
+        await conn.rollback()
         raise HTTPException(status_code=500, detail=str(e))
     finally:
-        if cur: cur.close()
-        if conn: conn.close()
+        if cur: await cur.close()
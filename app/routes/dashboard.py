@@ -1,141 +1,163 @@
 """Dashboard routes - Hospital and doctor metrics"""
-from fastapi import APIRouter, Depends, HTTPException
-from app.dependencies import get_current_doctor
-from app.db import get_connection
-from datetime import date, datetime, timedelta
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
+from app.analytics import load_or_cases, or_utilization, FIRST_CASE_GRACE_MINUTES
+from app.cache import SWRCache
+from app.db import connection
+from app.dependencies import get_current_doctor, get_current_doctor_lazy, get_db
+from app.rollups import DASHBOARD_METRICS_UPSERT
+from app.scheduling import DEFAULT_DAY_START, DEFAULT_DAY_END, minutes_of
+from datetime import date, datetime, time, timedelta
+import os
 
 router = APIRouter()
 
-@router.get("/hospital-metrics")
-def get_hospital_metrics():
-    """Get hospital-wide metrics for dashboard"""
-    conn = None
-    cur = None
+# Wall displays poll these every few seconds. Responses are served from memory for
+# DASHBOARD_CACHE_TTL_SECONDS, then served stale for up to DASHBOARD_CACHE_STALE_SECONDS
+# more while one background refresh runs; concurrent misses share one computation.
+DASHBOARD_CACHE_TTL_SECONDS = float(os.getenv("DASHBOARD_CACHE_TTL_SECONDS", "5"))
+DASHBOARD_CACHE_STALE_SECONDS = float(os.getenv("DASHBOARD_CACHE_STALE_SECONDS", "30"))
+hospital_metrics_cache = SWRCache(ttl=DASHBOARD_CACHE_TTL_SECONDS, stale_ttl=DASHBOARD_CACHE_STALE_SECONDS, maxsize=1)
+doctor_metrics_cache = SWRCache(ttl=DASHBOARD_CACHE_TTL_SECONDS, stale_ttl=DASHBOARD_CACHE_STALE_SECONDS, maxsize=10000)
+
+MAX_ANALYTICS_RANGE_DAYS = 366
+
+def _set_cache_headers(response: Response, age: float, state: str) -> None:
+    response.headers["Age"] = str(int(age))
+    response.headers["X-Cache"] = state
+
+# One pass over the doctor's last week of notes via idx_notes_doctor_created, with
+# half-open timestamp ranges instead of DATE(created_at) so the index applies.
+# Upcoming is an indexed count; recordings come from the doctor_stats rollup.
+DOCTOR_METRICS_QUERY = """
+    SELECT COUNT(*) FILTER (WHERE n.created_at >= %(today)s),
+           COUNT(*),
+           COUNT(DISTINCT n.patient_id) FILTER (WHERE n.created_at >= %(today)s),
+           (SELECT COUNT(*) FROM surgeries s
+            WHERE s.doctor_id = %(doctor_id)s AND s.status = 'scheduled' AND s.scheduled_date >= %(today_date)s),
+           COALESCE((SELECT recordings_total FROM doctor_stats WHERE doctor_id = %(doctor_id)s), 0)
+    FROM notes n
+    WHERE n.doctor_id = %(doctor_id)s
+      AND n.created_at >= %(week_ago)s AND n.created_at < %(tomorrow)s
+"""
+
+def doctor_metrics_params(doctor_id: str, today: date) -> dict:
+    return {
+        "doctor_id": doctor_id,
+        "today_date": today,
+        "today": datetime.combine(today, datetime.min.time()),
+        "week_ago": datetime.combine(today - timedelta(days=7), datetime.min.time()),
+        "tomorrow": datetime.combine(today + timedelta(days=1), datetime.min.time())
+    }
+
+def _load_hospital_metrics() -> dict:
+    """Today's dashboard_metrics row (runs without a request, so it takes its own pooled connection)"""
+    today = date.today()
+    with connection() as conn:
+        cur = conn.cursor()
+        try:
+            # Primary-key read of the row kept current by the refresh_dashboard_metrics job
+            cur.execute("""
+                SELECT or_utilization_percentage, total_patients_count, total_surgeries_count,
+                       completed_surgeries_count, avg_wait_time_minutes, cancelled_surgeries_count
+                FROM dashboard_metrics
+                WHERE metric_date = %s
+            """, (today,))
+            
+            result = cur.fetchone()
+            
+            if not result:
+                # Job has not run yet today: compute and store the row now
+                cur.execute(DASHBOARD_METRICS_UPSERT, {"day": today, "is_today": True})
+                result = cur.fetchone()
+        finally:
+            cur.close()
     
+    return {
+        "or_utilization_percentage": float(result[0]) if result[0] else 0,
+        "total_patients_today": result[1],
+        "total_surgeries_today": result[2],
+        "completed_surgeries": result[3],
+        "cancelled_surgeries": result[5],
+        "avg_wait_time_minutes": result[4],
+        "date": today
+    }
+
+@router.get("/hospital-metrics")
+def get_hospital_metrics(response: Response):
+    """Get hospital-wide metrics for dashboard (cached; see the Age and X-Cache headers)"""
     try:
-        conn = get_connection()
-        cur = conn.cursor()
-        
-        today = date.today()
-        
-        # Get or create today's metrics
-        cur.execute("""
-            SELECT or_utilization_percentage, total_patients_count, total_surgeries_count,
-                   completed_surgeries_count, avg_wait_time_minutes
-            FROM dashboard_metrics
-            WHERE metric_date = %s
-        """, (today,))
-        
-        result = cur.fetchone()
-        
-        if result:
-            return {
-                "or_utilization_percentage": float(result[0]) if result[0] else 0,
-                "total_patients_today": result[1],
-                "total_surgeries_today": result[2],
-                "completed_surgeries": result[3],
-                "avg_wait_time_minutes": result[4],
-                "date": today
-            }
-        
-        # Calculate metrics if not exists
-        cur.execute("SELECT COUNT(*) FROM patients WHERE status = 'active'")
-        total_patients = cur.fetchone()[0]
-        
-        cur.execute("SELECT COUNT(*) FROM surgeries WHERE scheduled_date = %s", (today,))
-        total_surgeries = cur.fetchone()[0]
-        
-        cur.execute("SELECT COUNT(*) FROM surgeries WHERE scheduled_date = %s AND status = 'completed'", (today,))
-        completed = cur.fetchone()[0]
-        
-        # Calculate OR utilization
-        cur.execute("""
-            SELECT 
-                COUNT(CASE WHEN status = 'in_use' THEN 1 END)::float / NULLIF(COUNT(*), 0) * 100
-            FROM operating_rooms
-        """)
-        or_util = cur.fetchone()[0] or 0
-        
-        return {
-            "or_utilization_percentage": round(float(or_util), 2),
-            "total_patients_today": total_patients,
-            "total_surgeries_today": total_surgeries,
-            "completed_surgeries": completed,
-            "avg_wait_time_minutes": 17,
-            "date": today
-        }
-        
+        # No get_db here: a cache hit must not take a pooled connection
+        metrics, age, state = hospital_metrics_cache.get("hospital", _load_hospital_metrics)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
+    _set_cache_headers(response, age, state)
+    return metrics
+
+def _load_doctor_metrics(conn, doctor_id: str) -> dict:
+    today = date.today()
+    cur = conn.cursor()
+    try:
+        cur.execute(DOCTOR_METRICS_QUERY, doctor_metrics_params(doctor_id, today))
+        notes_today, notes_week, patients_today, upcoming, total_recordings = cur.fetchone()
     finally:
-        if cur:
-            cur.close()
-        if conn:
-            conn.close()
+        cur.close()
+    
+    return {
+        "doctor_id": doctor_id,
+        "notes_taken_today": notes_today,
+        "notes_taken_this_week": notes_week,
+        "patients_seen_today": patients_today,
+        "upcoming_surgeries": upcoming,
+        "total_recordings": total_recordings,
+        "date": today
+    }
 
 @router.get("/doctor-metrics")
-def get_doctor_metrics(current_doctor: dict = Depends(get_current_doctor)):
-    """Get current doctor's usage statistics"""
-    conn = None
-    cur = None
+def get_doctor_metrics(response: Response, current_doctor: dict = Depends(get_current_doctor_lazy)):
+    """Get current doctor's usage statistics (cached per doctor; see the Age and X-Cache headers)"""
+    doctor_id = current_doctor["id"]
+    
+    def load():
+        # Only a miss or a background refresh takes a pooled connection
+        with connection() as conn:
+            return _load_doctor_metrics(conn, doctor_id)
     
     try:
-        conn = get_connection()
-        cur = conn.cursor()
-        
-        doctor_id = current_doctor["id"]
-        today = date.today()
-        week_ago = today - timedelta(days=7)
-        
-        # Notes taken today
-        cur.execute("""
-            SELECT COUNT(*) FROM notes 
-            WHERE doctor_id = %s AND DATE(created_at) = %s
-        """, (doctor_id, today))
-        notes_today = cur.fetchone()[0]
-        
-        # Notes taken this week
-        cur.execute("""
-            SELECT COUNT(*) FROM notes 
-            WHERE doctor_id = %s AND DATE(created_at) >= %s
-        """, (doctor_id, week_ago))
-        notes_week = cur.fetchone()[0]
-        
-        # Patients seen today
-        cur.execute("""
-            SELECT COUNT(DISTINCT patient_id) FROM notes 
-            WHERE doctor_id = %s AND DATE(created_at) = %s
-        """, (doctor_id, today))
-        patients_today = cur.fetchone()[0]
-        
-        # Upcoming surgeries
-        cur.execute("""
-            SELECT COUNT(*) FROM surgeries 
-            WHERE doctor_id = %s AND scheduled_date >= %s AND status = 'scheduled'
-        """, (doctor_id, today))
-        upcoming = cur.fetchone()[0]
-        
-        # Total recordings
-        cur.execute("""
-            SELECT COUNT(*) FROM transcriptions 
-            WHERE doctor_id = %s
-        """, (doctor_id,))
-        total_recordings = cur.fetchone()[0]
-        
-        return {
-            "doctor_id": doctor_id,
-            "notes_taken_today": notes_today,
-            "notes_taken_this_week": notes_week,
-            "patients_seen_today": patients_today,
-            "upcoming_surgeries": upcoming,
-            "total_recordings": total_recordings,
-            "date": today
-        }
-        
+        metrics, age, state = doctor_metrics_cache.get(doctor_id, load)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+    _set_cache_headers(response, age, state)
+    return metrics
+
+@router.get("/or-utilization")
+def get_or_utilization(
+    start: date = Query(..., description="First day (inclusive)"),
+    end: date = Query(..., description="Day after the last one (exclusive)"),
+    day_start: time = Query(DEFAULT_DAY_START, description="Staffed window used as capacity"),
+    day_end: time = Query(DEFAULT_DAY_END),
+    grace_minutes: int = Query(FIRST_CASE_GRACE_MINUTES, ge=0, le=120, description="First-case start tolerance"),
+    current_doctor: dict = Depends(get_current_doctor),
+    conn=Depends(get_db)
+):
+    """
+    OR utilization from actual surgery start/end times over [start, end): overall,
+    per room, per day and per hour, plus turnover gaps, overruns against
+    duration_minutes and first-case on-time starts (see app.analytics)
+    """
+    num_days = (end - start).days
+    if num_days < 1:
+        raise HTTPException(status_code=400, detail="end must be after start")
+    if num_days > MAX_ANALYTICS_RANGE_DAYS:
+        raise HTTPException(status_code=400, detail=f"Range cannot exceed {MAX_ANALYTICS_RANGE_DAYS} days")
+    if minutes_of(day_start) >= minutes_of(day_end):
+        raise HTTPException(status_code=400, detail="day_start must be before day_end")
+    
+    cur = conn.cursor()
+    try:
+        cases = load_or_cases(cur, start, end)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
     finally:
-        if cur:
-            cur.close()
-        if conn:
-            conn.close()
+        cur.close()
+    
+    return or_utilization(cases, day_start, day_end, grace_minutes)
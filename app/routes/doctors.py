@@ -1,19 +1,18 @@
 """Doctor routes - Profile, surgeries, patients, stats"""
-from fastapi import APIRouter, HTTPException, Depends
-from app.dependencies import get_current_doctor
-from app.db import get_connection
+from fastapi import APIRouter, HTTPException, Depends, Header
+from typing import Optional
+from app.dependencies import get_current_doctor, get_db
+from app.utils import stream_cursor, wants_ndjson
 from datetime import date
 
 router = APIRouter()
 
 @router.get("/{doctor_id}")
-def get_doctor_basic(doctor_id: str, current_doctor: dict = Depends(get_current_doctor)):
+def get_doctor_basic(doctor_id: str, current_doctor: dict = Depends(get_current_doctor), conn=Depends(get_db)):
     """Get basic doctor information"""
-    conn = None
     cur = None
     
     try:
-        conn = get_connection()
         cur = conn.cursor()
         
         cur.execute("""
@@ -47,49 +46,34 @@ def get_doctor_basic(doctor_id: str, current_doctor: dict = Depends(get_current_
     finally:
         if cur:
             cur.close()
-        if conn:
-            conn.close()
 
 @router.get("/{doctor_id}/details")
-def get_doctor_details(doctor_id: str, current_doctor: dict = Depends(get_current_doctor)):
+def get_doctor_details(doctor_id: str, current_doctor: dict = Depends(get_current_doctor), conn=Depends(get_db)):
     """Get full doctor details including statistics"""
-    conn = None
     cur = None
     
     try:
-        conn = get_connection()
         cur = conn.cursor()
         
-        # Basic info
+        # Basic info and counters from the doctor_stats rollup in one round trip.
+        # Upcoming depends on today's date, so it stays a live (indexed) count.
         cur.execute("""
-            SELECT id, doctor_code, first_name, last_name, specialization, email, phone,
-                   license_number, profile_image_url, status, created_at
-            FROM doctors WHERE id = %s
-        """, (doctor_id,))
+            SELECT d.id, d.doctor_code, d.first_name, d.last_name, d.specialization, d.email, d.phone,
+                   d.license_number, d.profile_image_url, d.status, d.created_at,
+                   COALESCE(ds.surgeries_total, 0), COALESCE(ds.patients_total, 0), COALESCE(ds.notes_total, 0),
+                   (SELECT COUNT(*) FROM surgeries s
+                    WHERE s.doctor_id = d.id AND s.status = 'scheduled' AND s.scheduled_date >= %s)
+            FROM doctors d
+            LEFT JOIN doctor_stats ds ON ds.doctor_id = d.id
+            WHERE d.id = %s
+        """, (date.today(), doctor_id))
         
         doctor = cur.fetchone()
         
         if not doctor:
             raise HTTPException(status_code=404, detail="Doctor not found")
         
-        # Total surgeries
-        cur.execute("SELECT COUNT(*) FROM surgeries WHERE doctor_id = %s", (doctor_id,))
-        total_surgeries = cur.fetchone()[0]
-        
-        # Total patients
-        cur.execute("SELECT COUNT(DISTINCT patient_id) FROM notes WHERE doctor_id = %s", (doctor_id,))
-        total_patients = cur.fetchone()[0]
-        
-        # Total notes
-        cur.execute("SELECT COUNT(*) FROM notes WHERE doctor_id = %s", (doctor_id,))
-        total_notes = cur.fetchone()[0]
-        
-        # Upcoming surgeries
-        cur.execute("""
-            SELECT COUNT(*) FROM surgeries 
-            WHERE doctor_id = %s AND scheduled_date >= %s AND status = 'scheduled'
-        """, (doctor_id, date.today()))
-        upcoming_surgeries = cur.fetchone()[0]
+        total_surgeries, total_patients, total_notes, upcoming_surgeries = doctor[11:15]
         
         return {
             "id": str(doctor[0]),
@@ -118,17 +102,13 @@ def get_doctor_details(doctor_id: str, current_doctor: dict = Depends(get_curren
     finally:
         if cur:
             cur.close()
-        if conn:
-            conn.close()
 
 @router.get("/{doctor_id}/surgeries/upcoming")
-def get_doctor_upcoming_surgeries(doctor_id: str, current_doctor: dict = Depends(get_current_doctor)):
+def get_doctor_upcoming_surgeries(doctor_id: str, current_doctor: dict = Depends(get_current_doctor), conn=Depends(get_db)):
     """Get upcoming surgeries for doctor"""
-    conn = None
     cur = None
     
     try:
-        conn = get_connection()
         cur = conn.cursor()
         
         cur.execute("""
@@ -164,18 +144,31 @@ def get_doctor_upcoming_surgeries(doctor_id: str, current_doctor: dict = Depends
     finally:
         if cur:
             cur.close()
-        if conn:
-            conn.close()
+
+def _cancelled_surgery_row(row) -> dict:
+    return {
+        "id": str(row[0]),
+        "procedure_name": row[1],
+        "scheduled_date": row[2],
+        "scheduled_time": str(row[3]),
+        "patient_name": f"{row[4]} {row[5]}",
+        "patient_code": row[6],
+        "cancelled_at": row[7]
+    }
 
 @router.get("/{doctor_id}/surgeries/cancelled")
-def get_doctor_cancelled_surgeries(doctor_id: str, current_doctor: dict = Depends(get_current_doctor)):
-    """Get cancelled surgeries for doctor"""
-    conn = None
+def get_doctor_cancelled_surgeries(
+    doctor_id: str,
+    accept: Optional[str] = Header(None),
+    current_doctor: dict = Depends(get_current_doctor),
+    conn=Depends(get_db)
+):
+    """Get cancelled surgeries for doctor (streamed; Accept: application/x-ndjson for NDJSON)"""
     cur = None
     
     try:
-        conn = get_connection()
-        cur = conn.cursor()
+        # Named (server-side) cursor: rows are streamed in batches, never all held in memory
+        cur = conn.cursor(name="doctor_cancelled_surgeries")
         
         cur.execute("""
             SELECT s.id, s.procedure_name, s.scheduled_date, s.scheduled_time,
@@ -186,38 +179,22 @@ def get_doctor_cancelled_surgeries(doctor_id: str, current_doctor: dict = Depend
             ORDER BY s.updated_at DESC
         """, (doctor_id,))
         
-        results = cur.fetchall()
-        
-        surgeries = []
-        for row in results:
-            surgeries.append({
-                "id": str(row[0]),
-                "procedure_name": row[1],
-                "scheduled_date": row[2],
-                "scheduled_time": str(row[3]),
-                "patient_name": f"{row[4]} {row[5]}",
-                "patient_code": row[6],
-                "cancelled_at": row[7]
-            })
-        
-        return surgeries
+        response = stream_cursor(cur, _cancelled_surgery_row, wants_ndjson(accept))
+        cur = None  # the response closes it once streamed
+        return response
         
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
     finally:
         if cur:
             cur.close()
-        if conn:
-            conn.close()
 
 @router.get("/{doctor_id}/surgeries/delayed")
-def get_doctor_delayed_surgeries(doctor_id: str, current_doctor: dict = Depends(get_current_doctor)):
+def get_doctor_delayed_surgeries(doctor_id: str, current_doctor: dict = Depends(get_current_doctor), conn=Depends(get_db)):
     """Get delayed surgeries for doctor"""
-    conn = None
     cur = None
     
     try:
-        conn = get_connection()
         cur = conn.cursor()
         
         cur.execute("""
@@ -250,18 +227,33 @@ def get_doctor_delayed_surgeries(doctor_id: str, current_doctor: dict = Depends(
     finally:
         if cur:
             cur.close()
-        if conn:
-            conn.close()
+
+def _doctor_surgery_row(row) -> dict:
+    return {
+        "id": str(row[0]),
+        "procedure_name": row[1],
+        "scheduled_date": row[2],
+        "scheduled_time": str(row[3]),
+        "status": row[4],
+        "urgency_level": row[5],
+        "patient_name": f"{row[6]} {row[7]}",
+        "patient_code": row[8],
+        "room_number": row[9]
+    }
 
 @router.get("/{doctor_id}/surgeries/all")
-def get_doctor_all_surgeries(doctor_id: str, current_doctor: dict = Depends(get_current_doctor)):
-    """Get all surgeries for doctor"""
-    conn = None
+def get_doctor_all_surgeries(
+    doctor_id: str,
+    accept: Optional[str] = Header(None),
+    current_doctor: dict = Depends(get_current_doctor),
+    conn=Depends(get_db)
+):
+    """Get all surgeries for doctor (streamed; Accept: application/x-ndjson for NDJSON)"""
     cur = None
     
     try:
-        conn = get_connection()
-        cur = conn.cursor()
+        # Named (server-side) cursor: rows are streamed in batches, never all held in memory
+        cur = conn.cursor(name="doctor_all_surgeries")
         
         cur.execute("""
             SELECT s.id, s.procedure_name, s.scheduled_date, s.scheduled_time, s.status,
@@ -274,40 +266,22 @@ def get_doctor_all_surgeries(doctor_id: str, current_doctor: dict = Depends(get_
             ORDER BY s.scheduled_date DESC, s.scheduled_time DESC
         """, (doctor_id,))
         
-        results = cur.fetchall()
-        
-        surgeries = []
-        for row in results:
-            surgeries.append({
-                "id": str(row[0]),
-                "procedure_name": row[1],
-                "scheduled_date": row[2],
-                "scheduled_time": str(row[3]),
-                "status": row[4],
-                "urgency_level": row[5],
-                "patient_name": f"{row[6]} {row[7]}",
-                "patient_code": row[8],
-                "room_number": row[9]
-            })
-        
-        return surgeries
+        response = stream_cursor(cur, _doctor_surgery_row, wants_ndjson(accept))
+        cur = None  # the response closes it once streamed
+        return response
         
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
     finally:
         if cur:
             cur.close()
-        if conn:
-            conn.close()
 
 @router.get("/{doctor_id}/patients/with-notes")
-def get_doctor_patients_with_notes(doctor_id: str, current_doctor: dict = Depends(get_current_doctor)):
+def get_doctor_patients_with_notes(doctor_id: str, current_doctor: dict = Depends(get_current_doctor), conn=Depends(get_db)):
     """Get patients with their latest notes (for carousel)"""
-    conn = None
     cur = None
     
     try:
-        conn = get_connection()
         cur = conn.cursor()
         
         cur.execute("""
@@ -348,42 +322,24 @@ def get_doctor_patients_with_notes(doctor_id: str, current_doctor: dict = Depend
     finally:
         if cur:
             cur.close()
-        if conn:
-            conn.close()
 
 @router.get("/{doctor_id}/stats")
-def get_doctor_stats(doctor_id: str, current_doctor: dict = Depends(get_current_doctor)):
+def get_doctor_stats(doctor_id: str, current_doctor: dict = Depends(get_current_doctor), conn=Depends(get_db)):
     """Get doctor statistics summary"""
-    conn = None
     cur = None
     
     try:
-        conn = get_connection()
         cur = conn.cursor()
         
-        # Total surgeries by status
+        # One primary-key lookup on the trigger-maintained rollup
         cur.execute("""
-            SELECT status, COUNT(*) 
-            FROM surgeries 
-            WHERE doctor_id = %s 
-            GROUP BY status
+            SELECT patients_total, notes_total, recordings_total, surgeries_by_status
+            FROM doctor_stats WHERE doctor_id = %s
         """, (doctor_id,))
         
-        surgery_stats = {row[0]: row[1] for row in cur.fetchall()}
-        
-        # Total patients
-        cur.execute("""
-            SELECT COUNT(DISTINCT patient_id) FROM notes WHERE doctor_id = %s
-        """, (doctor_id,))
-        total_patients = cur.fetchone()[0]
-        
-        # Total notes
-        cur.execute("SELECT COUNT(*) FROM notes WHERE doctor_id = %s", (doctor_id,))
-        total_notes = cur.fetchone()[0]
-        
-        # Total recordings
-        cur.execute("SELECT COUNT(*) FROM transcriptions WHERE doctor_id = %s", (doctor_id,))
-        total_recordings = cur.fetchone()[0]
+        result = cur.fetchone()
+        total_patients, total_notes, total_recordings, by_status = result or (0, 0, 0, {})
+        surgery_stats = {status: count for status, count in by_status.items() if count > 0}
         
         return {
             "doctor_id": doctor_id,
@@ -398,5 +354,3 @@ def get_doctor_stats(doctor_id: str, current_doctor: dict = Depends(get_current_
     finally:
         if cur:
             cur.close()
-        if conn:
-            conn.close()
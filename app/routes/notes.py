@@ -1,21 +1,19 @@
 """Notes routes - Save and retrieve patient notes"""
 from fastapi import APIRouter, HTTPException, Query, Depends
 from typing import List, Optional
-from app.dependencies import get_current_doctor
-from app.db import get_connection
+from app.dependencies import get_current_doctor, get_db
 from app.models import SaveNoteRequest
+from app.utils import encode_cursor, decode_cursor, keyset_after
 from datetime import datetime
 
 router = APIRouter()
 
 @router.post("/save")
-def save_note(request: SaveNoteRequest, current_doctor: dict = Depends(get_current_doctor)):
+def save_note(request: SaveNoteRequest, current_doctor: dict = Depends(get_current_doctor), conn=Depends(get_db)):
     """Save transcription as a patient note (triggers analysis)"""
-    conn = None
     cur = None
     
     try:
-        conn = get_connection()
         cur = conn.cursor()
         
         # Get transcription text
@@ -86,14 +84,11 @@ def save_note(request: SaveNoteRequest, current_doctor: dict = Depends(get_curre
     except HTTPException:
         raise
     except Exception as e:
-        if conn:
-            conn.rollback()
+        conn.rollback()
         raise HTTPException(status_code=400, detail=str(e))
     finally:
         if cur:
             cur.close()
-        if conn:
-            conn.close()
 
 @router.get("/patient/{patient_id}/book")
 def get_patient_notes_book(
@@ -101,15 +96,22 @@ def get_patient_notes_book(
     note_context: Optional[str] = Query(None),
     search: Optional[str] = Query(None),
     limit: int = Query(20, ge=1, le=100),
-    offset: int = Query(0, ge=0),
-    current_doctor: dict = Depends(get_current_doctor)
+    cursor: Optional[str] = Query(None, description="next_cursor from the previous page"),
+    offset: int = Query(0, ge=0, description="Deprecated: use cursor"),
+    current_doctor: dict = Depends(get_current_doctor),
+    conn=Depends(get_db)
 ):
-    """Get patient's notes book with pagination and filters"""
-    conn = None
+    """Get patient's notes book with keyset (cursor) pagination and filters"""
     cur = None
     
     try:
-        conn = get_connection()
+        after = None
+        if cursor:
+            try:
+                after = decode_cursor(cursor)
+            except ValueError as e:
+                raise HTTPException(status_code=400, detail=str(e))
+        
         cur = conn.cursor()
         
         query = """
@@ -132,8 +134,13 @@ def get_patient_notes_book(
             search_param = f"%{search}%"
             params.extend([search_param, search_param])
         
-        query += " ORDER BY n.created_at DESC LIMIT %s OFFSET %s"
-        params.extend([limit, offset])
+        if after:
+            condition, after_params = keyset_after("n.created_at", "n.id", after)
+            query += f" AND {condition} ORDER BY n.created_at DESC, n.id DESC LIMIT %s"
+            params.extend(after_params + [limit])
+        else:
+            query += " ORDER BY n.created_at DESC, n.id DESC LIMIT %s OFFSET %s"
+            params.extend([limit, offset])
         
         cur.execute(query, params)
         results = cur.fetchall()
@@ -169,30 +176,33 @@ def get_patient_notes_book(
         cur.execute(count_query, count_params)
         total_count = cur.fetchone()[0]
         
+        next_cursor = None
+        if len(results) == limit:
+            next_cursor = encode_cursor(results[-1][4], results[-1][0])
+        
         return {
             "patient_id": patient_id,
             "notes": notes,
             "total_count": total_count,
             "limit": limit,
-            "offset": offset
+            "offset": offset,
+            "next_cursor": next_cursor
         }
         
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
     finally:
         if cur:
             cur.close()
-        if conn:
-            conn.close()
 
 @router.get("/{note_id}")
-def get_note_detail(note_id: str, current_doctor: dict = Depends(get_current_doctor)):
+def get_note_detail(note_id: str, current_doctor: dict = Depends(get_current_doctor), conn=Depends(get_db)):
     """Get single note with full transcription and analysis"""
-    conn = None
     cur = None
     
     try:
-        conn = get_connection()
         cur = conn.cursor()
         
         cur.execute("""
@@ -246,6 +256,4 @@ def get_note_detail(note_id: str, current_doctor: dict = Depends(get_current_doc
         raise HTTPException(status_code=500, detail=str(e))
     finally:
         if cur:
-            cur.close()
-        if conn:
-            conn.close()
\ No newline at end of file
+            cur.close()
\ No newline at end of file
@@ -1,23 +1,20 @@
 """Notifications routes - CRUD and triggers"""
 from fastapi import APIRouter, HTTPException, Depends
 from typing import List
-from app.dependencies import get_current_doctor
-from app.db import get_connection
+from app.dependencies import get_current_doctor_async, get_async_db
 from app.models import NotificationCreate
 
 router = APIRouter()
 
 @router.get("/")
-def get_notifications(current_doctor: dict = Depends(get_current_doctor)):
+async def get_notifications(current_doctor: dict = Depends(get_current_doctor_async), conn=Depends(get_async_db)):
     """Get all notifications for current doctor"""
-    conn = None
     cur = None
     
     try:
-        conn = get_connection()
         cur = conn.cursor()
         
-        cur.execute("""
+        await cur.execute("""
             SELECT id, title, message, notification_type, is_read, related_entity_id, created_at
             FROM notifications
             WHERE doctor_id = %s
@@ -25,7 +22,7 @@ def get_notifications(current_doctor: dict = Depends(get_current_doctor)):
             LIMIT 50
         """, (current_doctor["id"],))
         
-        results = cur.fetchall()
+        results = await cur.fetchall()
         
         notifications = []
         for row in results:
@@ -45,26 +42,22 @@ def get_notifications(current_doctor: dict = Depends(get_current_doctor)):
         raise HTTPException(status_code=500, detail=str(e))
     finally:
         if cur:
-            cur.close()
-        if conn:
-            conn.close()
+            await cur.close()
 
 @router.get("/unread")
-def get_unread_count(current_doctor: dict = Depends(get_current_doctor)):
+async def get_unread_count(current_doctor: dict = Depends(get_current_doctor_async), conn=Depends(get_async_db)):
     """Get count of unread notifications"""
-    conn = None
     cur = None
     
     try:
-        conn = get_connection()
         cur = conn.cursor()
         
-        cur.execute("""
+        await cur.execute("""
             SELECT COUNT(*) FROM notifications
             WHERE doctor_id = %s AND is_read = FALSE
         """, (current_doctor["id"],))
         
-        count = cur.fetchone()[0]
+        count = (await cur.fetchone())[0]
         
         return {
             "doctor_id": current_doctor["id"],
@@ -75,33 +68,29 @@ def get_unread_count(current_doctor: dict = Depends(get_current_doctor)):
         raise HTTPException(status_code=500, detail=str(e))
     finally:
         if cur:
-            cur.close()
-        if conn:
-            conn.close()
+            await cur.close()
 
 @router.patch("/{notification_id}/read")
-def mark_notification_read(notification_id: str, current_doctor: dict = Depends(get_current_doctor)):
+async def mark_notification_read(notification_id: str, current_doctor: dict = Depends(get_current_doctor_async), conn=Depends(get_async_db)):
     """Mark notification as read"""
-    conn = None
     cur = None
     
     try:
-        conn = get_connection()
         cur = conn.cursor()
         
-        cur.execute("""
+        await cur.execute("""
             UPDATE notifications
             SET is_read = TRUE
             WHERE id = %s AND doctor_id = %s
             RETURNING id, is_read
         """, (notification_id, current_doctor["id"]))
         
-        result = cur.fetchone()
+        result = await cur.fetchone()
         
         if not result:
             raise HTTPException(status_code=404, detail="Notification not found")
         
-        conn.commit()
+        await conn.commit()
         
         return {
             "notification_id": str(result[0]),
@@ -112,26 +101,21 @@ def mark_notification_read(notification_id: str, current_doctor: dict = Depends(
     except HTTPException:
         raise
     except Exception as e:
-        if conn:
-            conn.rollback()
+        await conn.rollback()
         raise HTTPException(status_code=400, detail=str(e))
     finally:
         if cur:
-            cur.close()
-        if conn:
-            conn.close()
+            await cur.close()
 
 @router.post("/trigger")
-def create_notification(notification: NotificationCreate, current_doctor: dict = Depends(get_current_doctor)):
+async def create_notification(notification: NotificationCreate, current_doctor: dict = Depends(get_current_doctor_async), conn=Depends(get_async_db)):
     """Internal: Create a notification (used by other routes)"""
-    conn = None
     cur = None
     
     try:
-        conn = get_connection()
         cur = conn.cursor()
         
-        cur.execute("""
+        await cur.execute("""
             INSERT INTO notifications (doctor_id, title, message, notification_type, related_entity_id)
             VALUES (%s, %s, %s, %s, %s)
             RETURNING id, title, message, notification_type, is_read, created_at
@@ -143,8 +127,8 @@ def create_notification(notification: NotificationCreate, current_doctor: dict =
             notification.related_entity_id
         ))
         
-        result = cur.fetchone()
-        conn.commit()
+        result = await cur.fetchone()
+        await conn.commit()
         
         return {
             "id": str(result[0]),
@@ -156,11 +140,8 @@ def create_notification(notification: NotificationCreate, current_doctor: dict =
         }
         
     except Exception as e:
-        if conn:
-            conn.rollback()
+        await conn.rollback()
         raise HTTPException(status_code=400, detail=str(e))
     finally:
         if cur:
-            cur.close()
-        if conn:
-            conn.close()
\ No newline at end of file
+            await cur.close()
\ No newline at end of file
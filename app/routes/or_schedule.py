@@ -1,39 +1,92 @@
 """OR Schedule routes - Calendar and booking"""
-from fastapi import APIRouter, HTTPException, Depends
-from app.dependencies import get_current_doctor
-from app.db import get_connection
-from app.models import ORBookingRequest
+from fastapi import APIRouter, HTTPException, Depends, Query, Request, Response
+from fastapi.responses import StreamingResponse
+from psycopg import errors
+from app.db import async_connection
+from app.dependencies import get_current_doctor_async, get_current_doctor_stream, get_async_db
+from app.events import board_broker, publish_schedule_change, BoardFull
+from app.models import ORBookingRequest, AutoScheduleRequest
+from app.autoscheduler import AutoScheduler
+from app.scheduling import (
+    build_day_grid, build_day_columns, slot_times, validate_grid_bounds,
+    month_availability_cache, record_surgery_count_change, IntervalIndex, room_free_slots,
+    SLOT_MINUTES, DEFAULT_DAY_START, DEFAULT_DAY_END, DEFAULT_SURGERY_MINUTES
+)
+from app.utils import json_etag, etag_matches, sse_event, SSE_MEDIA_TYPE
+from typing import List, Optional
+from uuid import UUID
 from datetime import date, datetime, time, timedelta
+import asyncio
 import calendar
+import heapq
+import itertools
 import json
 
 router = APIRouter()
 
+MAX_SCHEDULE_RANGE_DAYS = 31
+MAX_SLOT_SEARCH_DAYS = 31
+SSE_HEARTBEAT_SECONDS = 15
+SSE_RETRY_MILLISECONDS = 3000
+
+# Surgeries that hold a room (cancelled ones free it), with what a grid cell shows
+SCHEDULE_SURGERIES_QUERY = """
+    SELECT s.scheduled_time, s.procedure_name, s.status,
+           p.first_name, p.last_name, p.patient_code,
+           o.room_number, s.id, s.duration_minutes, s.scheduled_date
+    FROM surgeries s
+    JOIN patients p ON s.patient_id = p.id
+    JOIN operating_rooms o ON s.operating_room_id = o.id
+    WHERE s.scheduled_date >= %s AND s.scheduled_date < %s AND s.status <> 'cancelled'
+    ORDER BY s.scheduled_date, s.scheduled_time
+"""
+
+
+def _schedule_surgery(row) -> dict:
+    """SCHEDULE_SURGERIES_QUERY row -> surgery dict for the grid builders"""
+    duration = row[8] or DEFAULT_SURGERY_MINUTES
+    return {
+        "room_number": row[6],
+        "start": row[0],
+        "duration_minutes": duration,
+        "payload": {
+            "status": "occupied",
+            "patient_name": f"{row[3]} {row[4]}",
+            "patient_code": row[5],
+            "procedure": row[1],
+            "surgery_status": row[2],
+            "surgery_id": str(row[7]),
+            "start_time": str(row[0])[:5],
+            "duration_minutes": duration
+        }
+    }
+
 @router.get("/calendar/month/{year}/{month}")
-def get_month_availability(year: int, month: int, current_doctor: dict = Depends(get_current_doctor)):
-    """Get available days in a month"""
-    conn = None
+async def get_month_availability(response: Response, year: int, month: int, current_doctor: dict = Depends(get_current_doctor_async), conn=Depends(get_async_db)):
+    """Get available days in a month (per-day counts are cached; surgery writes keep them current)"""
     cur = None
     
     try:
-        conn = get_connection()
-        cur = conn.cursor()
+        if not 1 <= month <= 12:
+            raise HTTPException(status_code=400, detail="month must be between 1 and 12")
         
         # Get number of days in month
         num_days = calendar.monthrange(year, month)[1]
         
-        # Get days with surgeries
-        start_date = date(year, month, 1)
-        end_date = date(year, month, num_days)
-        
-        cur.execute("""
-            SELECT DISTINCT scheduled_date, COUNT(*) as surgery_count
-            FROM surgeries
-            WHERE scheduled_date BETWEEN %s AND %s
-            GROUP BY scheduled_date
-        """, (start_date, end_date))
-        
-        surgery_counts = {row[0]: row[1] for row in cur.fetchall()}
+        surgery_counts = month_availability_cache.get((year, month))
+        response.headers["X-Cache"] = "HIT" if surgery_counts is not None else "MISS"
+        if surgery_counts is None:
+            # Get days with surgeries that hold a room (cancelled ones free it)
+            token = month_availability_cache.begin_fill()
+            cur = conn.cursor()
+            await cur.execute("""
+                SELECT scheduled_date, COUNT(*) as surgery_count
+                FROM surgeries
+                WHERE scheduled_date >= %s AND scheduled_date < %s AND status <> 'cancelled'
+                GROUP BY scheduled_date
+            """, (date(year, month, 1), date(year, month, num_days) + timedelta(days=1)))
+            surgery_counts = {row[0]: row[1] for row in await cur.fetchall()}
+            month_availability_cache.fill((year, month), token, surgery_counts)
         
         # Build response
         days = []
@@ -55,159 +108,486 @@ def get_month_availability(year: int, month: int, current_doctor: dict = Depends
             "days": days
         }
         
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
     finally:
         if cur:
-            cur.close()
-        if conn:
-            conn.close()
+            await cur.close()
+
+async def _load_day_grid(cur, schedule_date: date, slot_minutes: int, day_start: time, day_end: time) -> list:
+    """Rooms and the day's surgeries -> build_day_grid time slots"""
+    await cur.execute("SELECT room_number FROM operating_rooms ORDER BY room_number")
+    room_numbers = [row[0] for row in await cur.fetchall()]
+    await cur.execute(SCHEDULE_SURGERIES_QUERY, (schedule_date, schedule_date + timedelta(days=1)))
+    surgeries = [_schedule_surgery(row) for row in await cur.fetchall()]
+    return build_day_grid(room_numbers, surgeries, slot_minutes, day_start, day_end)
 
 @router.get("/or-schedule/day/{schedule_date}")
-def get_day_schedule(schedule_date: date, current_doctor: dict = Depends(get_current_doctor)):
-    """Get OR schedule for a specific day with time slots"""
-    conn = None
+async def get_day_schedule(
+    request: Request,
+    response: Response,
+    schedule_date: date,
+    slot_minutes: int = Query(60, description="Slot size: 5, 15, 30 or 60 minutes"),
+    day_start: time = Query(DEFAULT_DAY_START),
+    day_end: time = Query(DEFAULT_DAY_END),
+    current_doctor: dict = Depends(get_current_doctor_async),
+    conn=Depends(get_async_db)
+):
+    """
+    Get OR schedule for a specific day; a surgery occupies every slot its duration overlaps.
+    Responses carry an ETag: pollers that send it back in If-None-Match get 304 when nothing changed.
+    """
+    cur = None
+    
+    try:
+        try:
+            validate_grid_bounds(slot_minutes, day_start, day_end)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        
+        cur = conn.cursor()
+        body = {
+            "date": schedule_date,
+            "slot_minutes": slot_minutes,
+            "time_slots": await _load_day_grid(cur, schedule_date, slot_minutes, day_start, day_end)
+        }
+        
+        etag = json_etag(body)
+        headers = {"ETag": etag, "Cache-Control": "no-cache"}
+        if etag_matches(request.headers.get("if-none-match"), etag):
+            return Response(status_code=304, headers=headers)
+        response.headers.update(headers)
+        return body
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+    finally:
+        if cur:
+            await cur.close()
+
+@router.get("/or-schedule/day/{schedule_date}/stream")
+async def stream_day_schedule(
+    request: Request,
+    schedule_date: date,
+    slot_minutes: int = Query(60, description="Slot size: 5, 15, 30 or 60 minutes"),
+    day_start: time = Query(DEFAULT_DAY_START),
+    day_end: time = Query(DEFAULT_DAY_END),
+    current_doctor: dict = Depends(get_current_doctor_stream)
+):
+    """
+    Server-sent events for the OR board of one day: a "snapshot" event (the
+    day's time_slots) and then a "diff" event with the changed {time, room,
+    cell} entries whenever a surgery on that date changes. Each event id is the
+    board version; a client reconnecting with a Last-Event-ID equal to the
+    current version skips the snapshot. Clients that cannot keep a stream open
+    should poll /or-schedule/day/{date} with If-None-Match instead.
+    """
+    try:
+        validate_grid_bounds(slot_minutes, day_start, day_end)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    async def load():
+        async with async_connection() as conn:
+            async with conn.cursor() as cur:
+                return await _load_day_grid(cur, schedule_date, slot_minutes, day_start, day_end)
+    
+    try:
+        board, queue = await board_broker.subscribe((schedule_date, slot_minutes, day_start, day_end), load)
+    except BoardFull:
+        raise HTTPException(status_code=503, detail="Too many open OR board streams; poll instead")
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+    
+    if request.headers.get("last-event-id") == str(board.version):
+        queue.get_nowait()  # the client already has this version
+    
+    async def events():
+        try:
+            yield f"retry: {SSE_RETRY_MILLISECONDS}\n\n".encode()
+            while True:
+                try:
+                    event, version, data = await asyncio.wait_for(queue.get(), SSE_HEARTBEAT_SECONDS)
+                except asyncio.TimeoutError:
+                    yield b": keep-alive\n\n"
+                    continue
+                yield sse_event(event, {"date": schedule_date, "slot_minutes": slot_minutes, **data}, version)
+        finally:
+            board_broker.unsubscribe(board, queue)
+    
+    return StreamingResponse(
+        events(),
+        media_type=SSE_MEDIA_TYPE,
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@router.get("/or-schedule/range")
+async def get_range_schedule(
+    start: date = Query(..., description="First day (inclusive)"),
+    end: date = Query(..., description="Day after the last one (exclusive)"),
+    slot_minutes: int = Query(60, description="Slot size: 5, 15, 30 or 60 minutes"),
+    day_start: time = Query(DEFAULT_DAY_START),
+    day_end: time = Query(DEFAULT_DAY_END),
+    format: str = Query("grid", pattern="^(grid|columnar)$"),
+    current_doctor: dict = Depends(get_current_doctor_async),
+    conn=Depends(get_async_db)
+):
+    """
+    Get the OR schedule for every day in [start, end) - e.g. a week view - with
+    one rooms query and one surgeries query for the whole range.
+
+    format=grid returns the same time_slots per day as /or-schedule/day.
+    format=columnar returns, per day, one occupancy array per room (ordered as
+    in rooms, one entry per slot in slot_times): -1 for a free slot, otherwise
+    the index of the surgery in the shared surgeries list.
+    """
     cur = None
     
     try:
-        conn = get_connection()
+        num_days = (end - start).days
+        if num_days < 1:
+            raise HTTPException(status_code=400, detail="end must be after start")
+        if num_days > MAX_SCHEDULE_RANGE_DAYS:
+            raise HTTPException(status_code=400, detail=f"Range cannot exceed {MAX_SCHEDULE_RANGE_DAYS} days")
+        try:
+            validate_grid_bounds(slot_minutes, day_start, day_end)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        
         cur = conn.cursor()
         
-        # Get all operating rooms
-        cur.execute("SELECT id, room_number, status FROM operating_rooms ORDER BY room_number")
-        rooms = cur.fetchall()
-        
-        # Get all surgeries for this day
-        cur.execute("""
-            SELECT s.scheduled_time, s.procedure_name, s.status,
-                   p.first_name, p.last_name, p.patient_code,
-                   o.room_number, s.id
-            FROM surgeries s
-            JOIN patients p ON s.patient_id = p.id
-            LEFT JOIN operating_rooms o ON s.operating_room_id = o.id
-            WHERE s.scheduled_date = %s
-            ORDER BY s.scheduled_time
-        """, (schedule_date,))
-        
-        surgeries = cur.fetchall()
-        
-        # Build time slots (7 AM to 7 PM, hourly)
+        await cur.execute("SELECT room_number FROM operating_rooms ORDER BY room_number")
+        room_numbers = [row[0] for row in await cur.fetchall()]
+        
+        await cur.execute(SCHEDULE_SURGERIES_QUERY, (start, end))
+        surgeries_by_day = {}
+        for row in await cur.fetchall():
+            surgeries_by_day.setdefault(row[9], []).append(_schedule_surgery(row))
+        
+        days = [start + timedelta(days=offset) for offset in range(num_days)]
+        
+        if format == "columnar":
+            surgery_index = {}
+            surgery_table = []
+            return {
+                "start": start,
+                "end": end,
+                "slot_minutes": slot_minutes,
+                "rooms": room_numbers,
+                "slot_times": slot_times(slot_minutes, day_start, day_end),
+                "days": [{
+                    "date": day,
+                    "occupancy": build_day_columns(
+                        room_numbers, surgeries_by_day.get(day, ()), surgery_index, surgery_table,
+                        slot_minutes, day_start, day_end
+                    )
+                } for day in days],
+                "surgeries": surgery_table
+            }
+        
+        return {
+            "start": start,
+            "end": end,
+            "slot_minutes": slot_minutes,
+            "days": [{
+                "date": day,
+                "time_slots": build_day_grid(room_numbers, surgeries_by_day.get(day, ()), slot_minutes, day_start, day_end)
+            } for day in days]
+        }
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+    finally:
+        if cur:
+            await cur.close()
+
+async def _busy_intervals(cur, room_ids: List[str], surgeon_ids: List[str], start: date, end: date):
+    """
+    Busy intervals touching [start, end) of live surgeries, as
+    ({room_id: [(start, end)]}, {doctor_id: [(start, end)]}). A room is busy
+    for its or_slot (duration + turnover, as the exclusion constraint sees it,
+    served by its GiST index); a surgeon for each surgery's duration.
+    """
+    await cur.execute("""
+        SELECT operating_room_id, lower(or_slot), upper(or_slot)
+        FROM surgeries
+        WHERE operating_room_id = ANY(%s::uuid[])
+          AND or_slot && tsrange(%s, %s)
+          AND status NOT IN ('cancelled', 'completed')
+    """, (room_ids, datetime.combine(start, time.min), datetime.combine(end, time.min)))
+    room_intervals = {}
+    for room_id, busy_start, busy_end in await cur.fetchall():
+        room_intervals.setdefault(str(room_id), []).append((busy_start, busy_end))
+    
+    await cur.execute("""
+        SELECT doctor_id, scheduled_date + scheduled_time,
+               scheduled_date + scheduled_time + COALESCE(duration_minutes, %s) * INTERVAL '1 minute'
+        FROM surgeries
+        WHERE doctor_id = ANY(%s::uuid[])
+          AND scheduled_date >= %s AND scheduled_date < %s
+          AND status NOT IN ('cancelled', 'completed')
+    """, (DEFAULT_SURGERY_MINUTES, surgeon_ids, start - timedelta(days=1), end))
+    surgeon_intervals = {}
+    for doctor_id, busy_start, busy_end in await cur.fetchall():
+        surgeon_intervals.setdefault(str(doctor_id), []).append((busy_start, busy_end))
+    return room_intervals, surgeon_intervals
+
+@router.get("/or-schedule/available-slots")
+async def find_available_slots(
+    duration_minutes: int = Query(..., ge=5, le=24 * 60),
+    start: Optional[date] = Query(None, description="First day to search (default today)"),
+    end: Optional[date] = Query(None, description="Day after the last one to search (default start + 7 days)"),
+    room_ids: Optional[List[str]] = Query(None, description="Only these operating rooms"),
+    surgeon_id: Optional[UUID] = Query(None, description="Surgeon who must also be free (default: you)"),
+    limit: int = Query(5, ge=1, le=50),
+    step_minutes: int = Query(15, description="Start times are multiples of this from midnight: 5, 15, 30 or 60"),
+    day_start: time = Query(DEFAULT_DAY_START),
+    day_end: time = Query(DEFAULT_DAY_END),
+    current_doctor: dict = Depends(get_current_doctor_async),
+    conn=Depends(get_async_db)
+):
+    """
+    Earliest `limit` start times, across rooms, at which a surgery of
+    duration_minutes can be booked in [start, end): the room must be free for
+    the duration plus its turnover (as the booking constraint requires) and
+    the surgeon must not be in another surgery. One slot per free gap per room.
+
+    Busy intervals for the window are read in two indexed queries and merged
+    into a sorted per-room IntervalIndex; the rooms' candidate slots are then
+    merged lazily, so only as much of the window is scanned as the answer needs.
+    """
+    cur = None
+    
+    try:
+        start = start or date.today()
+        end = end or start + timedelta(days=7)
+        num_days = (end - start).days
+        if num_days < 1:
+            raise HTTPException(status_code=400, detail="end must be after start")
+        if num_days > MAX_SLOT_SEARCH_DAYS:
+            raise HTTPException(status_code=400, detail=f"Range cannot exceed {MAX_SLOT_SEARCH_DAYS} days")
+        if step_minutes not in SLOT_MINUTES:
+            raise HTTPException(status_code=400, detail=f"step_minutes must be one of {', '.join(map(str, SLOT_MINUTES))}")
+        try:
+            validate_grid_bounds(step_minutes, day_start, day_end)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        
+        # Canonical form: it is also the key of the intervals read back from the database
+        surgeon_id = str(surgeon_id) if surgeon_id else current_doctor["id"]
+        cur = conn.cursor()
+        
+        if room_ids:
+            await cur.execute("""
+                SELECT id, room_number, turnover_minutes FROM operating_rooms
+                WHERE id = ANY(%s::uuid[]) ORDER BY room_number
+            """, (room_ids,))
+        else:
+            await cur.execute("SELECT id, room_number, turnover_minutes FROM operating_rooms ORDER BY room_number")
+        rooms = await cur.fetchall()
+        
+        room_intervals, surgeon_intervals = await _busy_intervals(
+            cur, [str(room[0]) for room in rooms], [surgeon_id], start, end
+        )
+        surgeon_busy = IntervalIndex(surgeon_intervals.get(surgeon_id, ()))
+        
+        days = [start + timedelta(days=offset) for offset in range(num_days)]
+        now = datetime.now()
+        
+        def candidates(room):
+            room_id, room_number, turnover = room
+            for slot_start, free_until in room_free_slots(
+                IntervalIndex(room_intervals.get(str(room_id), ())), surgeon_busy, days,
+                duration_minutes, turnover or 0, day_start, day_end, step_minutes, not_before=now
+            ):
+                yield slot_start, room_number, room_id, turnover or 0, free_until
+        
         slots = []
-        for hour in range(7, 20):
-            slot_time = time(hour, 0)
-            
-            # Build OR status for this time slot
-            or_rooms = {}
-            for room in rooms:
-                room_id = str(room[0])
-                room_number = room[1]
-                
-                # Find surgery in this room at this time
-                surgery_at_time = None
-                for surgery in surgeries:
-                    if surgery[6] == room_number and surgery[0] == slot_time:
-                        surgery_at_time = surgery
-                        break
-                
-                if surgery_at_time:
-                    or_rooms[f"or_{room_number}"] = {
-                        "status": "occupied",
-                        "patient_name": f"{surgery_at_time[3]} {surgery_at_time[4]}",
-                        "patient_code": surgery_at_time[5],
-                        "procedure": surgery_at_time[1],
-                        "surgery_status": surgery_at_time[2],
-                        "surgery_id": str(surgery_at_time[7])
-                    }
-                else:
-                    or_rooms[f"or_{room_number}"] = {
-                        "status": "available",
-                        "patient_name": None,
-                        "patient_code": None,
-                        "procedure": None
-                    }
-            
+        for slot_start, room_number, room_id, turnover, free_until in itertools.islice(
+            heapq.merge(*(candidates(room) for room in rooms)), limit
+        ):
+            slot_end = slot_start + timedelta(minutes=duration_minutes)
             slots.append({
-                "time": str(slot_time)[:5],  # HH:MM format
-                "or_rooms": or_rooms
+                "operating_room_id": str(room_id),
+                "room_number": room_number,
+                "scheduled_date": slot_start.date(),
+                "scheduled_time": slot_start.time().strftime("%H:%M"),
+                "start": slot_start,
+                "end": slot_end,
+                "room_free_at": slot_end + timedelta(minutes=turnover),
+                "free_until": free_until
             })
         
         return {
-            "date": schedule_date,
-            "time_slots": slots
+            "duration_minutes": duration_minutes,
+            "surgeon_id": surgeon_id,
+            "start": start,
+            "end": end,
+            "slots": slots
         }
         
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
     finally:
         if cur:
-            cur.close()
-        if conn:
-            conn.close()
+            await cur.close()
 
-@router.post("/or-schedule/book")
-def book_operating_room(booking: ORBookingRequest, current_doctor: dict = Depends(get_current_doctor)):
-    """Book an operating room (creates a surgery)"""
-    conn = None
+@router.post("/or-schedule/auto-schedule")
+async def auto_schedule(request: AutoScheduleRequest, current_doctor: dict = Depends(get_current_doctor_async), conn=Depends(get_async_db)):
+    """
+    Pack a backlog of cases into operating rooms over [start, end) - see
+    app/autoscheduler.py for the heuristic. The solver runs in a worker thread
+    for at most time_limit_seconds of local search. Unless dry_run, every
+    placed case is inserted as a scheduled surgery in one transaction; if a
+    booking made meanwhile conflicts, nothing is written and the response is 409.
+    """
     cur = None
     
     try:
-        conn = get_connection()
+        num_days = (request.end - request.start).days
+        if num_days < 1:
+            raise HTTPException(status_code=400, detail="end must be after start")
+        if num_days > MAX_SLOT_SEARCH_DAYS:
+            raise HTTPException(status_code=400, detail=f"Range cannot exceed {MAX_SLOT_SEARCH_DAYS} days")
+        if request.step_minutes not in SLOT_MINUTES:
+            raise HTTPException(status_code=400, detail=f"step_minutes must be one of {', '.join(map(str, SLOT_MINUTES))}")
+        try:
+            validate_grid_bounds(request.step_minutes, request.day_start, request.day_end)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        
         cur = conn.cursor()
         
-        # Check if OR is available at this time
-        cur.execute("""
-            SELECT id FROM surgeries
-            WHERE operating_room_id = %s 
-            AND scheduled_date = %s 
-            AND scheduled_time = %s
-            AND status NOT IN ('cancelled', 'completed')
-        """, (booking.operating_room_id, booking.scheduled_date, booking.scheduled_time))
+        await cur.execute("SELECT id, room_number, turnover_minutes FROM operating_rooms ORDER BY room_number")
+        rooms = {str(row[0]): (row[1], row[2] or 0) for row in await cur.fetchall()}
+        
+        cases = []
+        for case in request.cases:
+            unknown = set(case.room_ids or ()) - rooms.keys()
+            if unknown:
+                raise HTTPException(status_code=400, detail=f"Unknown operating room: {sorted(unknown)[0]}")
+            cases.append({**case.model_dump(), "doctor_id": case.doctor_id or current_doctor["id"]})
         
-        if cur.fetchone():
-            raise HTTPException(status_code=409, detail="Operating room not available at this time")
+        room_intervals, surgeon_intervals = await _busy_intervals(
+            cur, list(rooms), sorted({case["doctor_id"] for case in cases}), request.start, request.end
+        )
+        scheduler = AutoScheduler(
+            cases, {room_id: turnover for room_id, (_, turnover) in rooms.items()},
+            room_intervals, surgeon_intervals,
+            [request.start + timedelta(days=offset) for offset in range(num_days)],
+            request.day_start, request.day_end, request.step_minutes, not_before=datetime.now()
+        )
+        summary = await asyncio.to_thread(scheduler.solve, request.time_limit_seconds)
+        
+        placed = sorted(scheduler.placement.items(), key=lambda item: (item[1][1], rooms[item[1][0]][0]))
+        surgery_ids = []
+        if placed and not request.dry_run:
+            await cur.executemany("""
+                INSERT INTO surgeries (
+                    patient_id, doctor_id, operating_room_id, surgery_type, procedure_name,
+                    scheduled_date, scheduled_time, duration_minutes, status, urgency_level
+                ) VALUES (%s, %s, %s, %s, %s, %s, %s, %s, 'scheduled', %s)
+                RETURNING id
+            """, [(
+                cases[index]["patient_id"], cases[index]["doctor_id"], room_id,
+                cases[index]["surgery_type"], cases[index]["procedure_name"],
+                slot_start.date(), slot_start.time(), cases[index]["duration_minutes"], cases[index]["urgency_level"]
+            ) for index, (room_id, slot_start) in placed], returning=True)
+            while True:
+                surgery_ids.append(str((await cur.fetchone())[0]))
+                if not cur.nextset():
+                    break
+            await conn.commit()
+            for _, (_, slot_start) in placed:
+                record_surgery_count_change(slot_start.date(), 1)
+            publish_schedule_change(*(slot_start.date() for _, (_, slot_start) in placed))
+        
+        return {
+            **summary,
+            "dry_run": request.dry_run,
+            "scheduled": [{
+                "case_index": index,
+                "surgery_id": surgery_ids[position] if surgery_ids else None,
+                "operating_room_id": room_id,
+                "room_number": rooms[room_id][0],
+                "scheduled_date": slot_start.date(),
+                "scheduled_time": slot_start.time().strftime("%H:%M"),
+                "end": slot_start + timedelta(minutes=cases[index]["duration_minutes"])
+            } for position, (index, (room_id, slot_start)) in enumerate(placed)],
+            "unscheduled": [index for index in range(len(cases)) if index not in scheduler.placement]
+        }
         
-        # Create surgery
-        cur.execute("""
+    except errors.ExclusionViolation:
+        await conn.rollback()
+        raise HTTPException(status_code=409, detail="The schedule changed while solving; nothing was booked, retry")
+    except HTTPException:
+        raise
+    except Exception as e:
+        await conn.rollback()
+        raise HTTPException(status_code=400, detail=str(e))
+    finally:
+        if cur:
+            await cur.close()
+
+@router.post("/or-schedule/book")
+async def book_operating_room(booking: ORBookingRequest, current_doctor: dict = Depends(get_current_doctor_async), conn=Depends(get_async_db)):
+    """
+    Book an operating room (creates a surgery).
+
+    Conflicts are enforced by the surgeries_no_or_overlap exclusion constraint
+    (migrations/or_booking_exclusion.sql): the surgery's [start, start +
+    duration + room turnover) may not overlap another live surgery in the room.
+    The insert is the check, so concurrent bookings cannot both succeed.
+    """
+    cur = None
+    
+    try:
+        cur = conn.cursor()
+        
+        await cur.execute("""
             INSERT INTO surgeries (
-                patient_id, doctor_id, operating_room_id, procedure_name,
-                scheduled_date, scheduled_time, estimated_duration_minutes,
+                patient_id, doctor_id, operating_room_id, surgery_type, procedure_name,
+                scheduled_date, scheduled_time, duration_minutes,
                 status, urgency_level, participants
-            ) VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
-            RETURNING id, procedure_name, scheduled_date, scheduled_time
+            ) VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
+            RETURNING id, procedure_name, scheduled_date, scheduled_time, upper(or_slot)
         """, (
-            booking.patient_id, current_doctor["id"], booking.operating_room_id,
+            booking.patient_id, current_doctor["id"], booking.operating_room_id, booking.surgery_type,
             booking.procedure_name, booking.scheduled_date, booking.scheduled_time,
-            booking.estimated_duration_minutes or 60, 'scheduled', booking.urgency_level or 'routine',
+            booking.duration_minutes or DEFAULT_SURGERY_MINUTES, 'scheduled', booking.urgency_level or 'routine',
             json.dumps(booking.participants) if booking.participants else None
         ))
         
-        result = cur.fetchone()
-        
-        # Update OR status
-        cur.execute("""
-            UPDATE operating_rooms 
-            SET status = 'reserved' 
-            WHERE id = %s
-        """, (booking.operating_room_id,))
-        
-        conn.commit()
+        result = await cur.fetchone()
+        await conn.commit()
+        record_surgery_count_change(result[2], 1)
+        publish_schedule_change(result[2])
         
         return {
             "surgery_id": str(result[0]),
             "procedure_name": result[1],
             "scheduled_date": result[2],
             "scheduled_time": str(result[3]),
+            "room_free_at": result[4],
             "message": "Operating room booked successfully"
         }
         
+    except errors.ExclusionViolation:
+        await conn.rollback()
+        raise HTTPException(status_code=409, detail="Operating room not available at this time")
     except HTTPException:
         raise
     except Exception as e:
-        if conn:
-            conn.rollback()
+        await conn.rollback()
         raise HTTPException(status_code=400, detail=str(e))
     finally:
         if cur:
-            cur.close()
-        if conn:
-            conn.close()
\ No newline at end of file
+            await cur.close()
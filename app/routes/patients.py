@@ -1,24 +1,22 @@
 """Patient routes - CRUD and related data"""
-from fastapi import APIRouter, HTTPException, Query, Depends
-from typing import List, Optional
-from app.models import PatientCreate, PatientUpdate, PatientResponse
-from app.dependencies import get_current_doctor
-from app.db import get_connection
+from fastapi import APIRouter, HTTPException, Query, Depends, Response, Header
+from typing import List, Optional, Tuple
+from app.models import PatientCreate, PatientUpdate, PatientResponse, PatientSearchResult
+from app.utils import escape_like, encode_cursor, decode_cursor, keyset_after, stream_cursor_async, wants_ndjson
+from app.dependencies import get_current_doctor_async, get_async_db
 import json
 
 router = APIRouter()
 
 @router.post("/", response_model=PatientResponse, status_code=201)
-def create_patient(patient: PatientCreate, current_doctor: dict = Depends(get_current_doctor)):
+async def create_patient(patient: PatientCreate, current_doctor: dict = Depends(get_current_doctor_async), conn=Depends(get_async_db)):
     """Create a new patient"""
-    conn = None
     cur = None
     
     try:
-        conn = get_connection()
         cur = conn.cursor()
         
-        cur.execute("""
+        await cur.execute("""
             INSERT INTO patients (patient_code, first_name, last_name, date_of_birth, gender, email, phone,
                                 address, emergency_contact_name, emergency_contact_phone, blood_type,
                                 allergies, medical_history, insurance_info, profile_image_url, status)
@@ -35,8 +33,8 @@ def create_patient(patient: PatientCreate, current_doctor: dict = Depends(get_cu
             patient.profile_image_url, patient.status
         ))
         
-        result = cur.fetchone()
-        conn.commit()
+        result = await cur.fetchone()
+        await conn.commit()
         
         return {
             "id": str(result[0]), "patient_code": result[1], "first_name": result[2],
@@ -49,57 +47,118 @@ def create_patient(patient: PatientCreate, current_doctor: dict = Depends(get_cu
         }
         
     except Exception as e:
-        if conn:
-            conn.rollback()
+        await conn.rollback()
         raise HTTPException(status_code=400, detail=str(e))
     finally:
         if cur:
-            cur.close()
-        if conn:
-            conn.close()
+            await cur.close()
 
-@router.get("/", response_model=List[PatientResponse])
-def get_all_patients(
+# Must match idx_patients_full_name_trgm in migrations/patient_search_trgm.sql
+FULL_NAME_EXPR = "(first_name || ' ' || last_name)"
+# Shorter terms produce unselective trigrams, so ranked search falls back to prefix matching
+MIN_TRIGRAM_TERM_LENGTH = 3
+
+def build_patient_search_query(term: str, ranked: bool, status: Optional[str], limit: int, offset: int,
+                               after: Optional[Tuple] = None) -> tuple:
+    """
+    SQL and params for the patient list/search. Ranked queries add score and
+    matched_fields columns (indexes 19 and 20) after the patient columns.
+    Unranked lists are ordered by (created_at, id) and resume after the decoded
+    cursor position `after` when given (keyset pagination; offset is then ignored).
+    """
+    query = """
+        SELECT id, patient_code, first_name, last_name, date_of_birth, gender, email, phone,
+               address, emergency_contact_name, emergency_contact_phone, blood_type,
+               allergies, medical_history, insurance_info, profile_image_url, status, created_at, updated_at
+    """
+    params = []
+    if ranked:
+        code_prefix = escape_like(term.upper()) + "%"
+        name_prefix = escape_like(term.lower()) + "%"
+        query += f""",
+               GREATEST(word_similarity(%s, {FULL_NAME_EXPR}),
+                        CASE WHEN upper(patient_code) LIKE %s THEN 1.0 ELSE 0.0 END) AS score,
+               ARRAY_REMOVE(ARRAY[
+                   CASE WHEN lower(first_name) LIKE %s OR %s <%% first_name THEN 'first_name' END,
+                   CASE WHEN lower(last_name) LIKE %s OR %s <%% last_name THEN 'last_name' END,
+                   CASE WHEN upper(patient_code) LIKE %s THEN 'patient_code' END
+               ], NULL) AS matched_fields
+        FROM patients WHERE 1=1
+        """
+        params.extend([term, code_prefix, name_prefix, term, name_prefix, term, code_prefix])
+        if len(term) >= MIN_TRIGRAM_TERM_LENGTH:
+            query += f" AND (%s <%% {FULL_NAME_EXPR} OR upper(patient_code) LIKE %s)"
+            params.extend([term, code_prefix])
+        else:
+            query += " AND (upper(patient_code) LIKE %s OR lower(first_name) LIKE %s OR lower(last_name) LIKE %s)"
+            params.extend([code_prefix, name_prefix, name_prefix])
+    else:
+        query += " FROM patients WHERE 1=1"
+        if term:
+            query += f" AND ({FULL_NAME_EXPR} ILIKE %s OR patient_code ILIKE %s)"
+            search_param = f"%{escape_like(term)}%"
+            params.extend([search_param, search_param])
+    
+    if status:
+        query += " AND status = %s"
+        params.append(status)
+    
+    if ranked:
+        query += " ORDER BY score DESC, created_at DESC LIMIT %s OFFSET %s"
+        params.extend([limit, offset])
+    elif after:
+        condition, after_params = keyset_after("created_at", "id", after)
+        query += f" AND {condition} ORDER BY created_at DESC, id DESC LIMIT %s"
+        params.extend(after_params + [limit])
+    else:
+        query += " ORDER BY created_at DESC, id DESC LIMIT %s OFFSET %s"
+        params.extend([limit, offset])
+    return query, params
+
+@router.get("/", response_model=List[PatientSearchResult], response_model_exclude_unset=True)
+async def get_all_patients(
+    response: Response,
     search: Optional[str] = Query(None),
+    search_mode: str = Query("substring", pattern="^(substring|ranked)$"),
+    include_matches: bool = Query(False),
     status: Optional[str] = Query(None),
     limit: int = Query(100, ge=1, le=1000),
-    offset: int = Query(0, ge=0),
-    current_doctor: dict = Depends(get_current_doctor)
+    cursor: Optional[str] = Query(None, description="X-Next-Cursor from the previous page"),
+    offset: int = Query(0, ge=0, description="Deprecated: use cursor"),
+    current_doctor: dict = Depends(get_current_doctor_async),
+    conn=Depends(get_async_db)
 ):
-    """Get all patients with filters"""
-    conn = None
+    """
+    Get all patients with filters.
+    search_mode=substring matches the text anywhere in the name or patient code (newest first);
+    search_mode=ranked orders fuzzy name matches and patient code prefix matches by similarity.
+    include_matches adds score (ranked only) and matched_fields to each result.
+    Unranked pages send an X-Next-Cursor header when more rows may follow; pass it
+    back as cursor to fetch the next page.
+    """
     cur = None
     
     try:
-        conn = get_connection()
-        cur = conn.cursor()
+        term = search.strip() if search else ""
+        ranked = bool(term) and search_mode == "ranked"
+        after = None
+        if cursor:
+            if ranked:
+                raise HTTPException(status_code=400, detail="cursor is not supported with search_mode=ranked")
+            try:
+                after = decode_cursor(cursor)
+            except ValueError as e:
+                raise HTTPException(status_code=400, detail=str(e))
         
-        query = """
-            SELECT id, patient_code, first_name, last_name, date_of_birth, gender, email, phone,
-                   address, emergency_contact_name, emergency_contact_phone, blood_type,
-                   allergies, medical_history, insurance_info, profile_image_url, status, created_at, updated_at
-            FROM patients WHERE 1=1
-        """
-        params = []
-        
-        if search:
-            query += """ AND (first_name ILIKE %s OR last_name ILIKE %s OR patient_code ILIKE %s)"""
-            search_param = f"%{search}%"
-            params.extend([search_param, search_param, search_param])
-        
-        if status:
-            query += " AND status = %s"
-            params.append(status)
-        
-        query += " ORDER BY created_at DESC LIMIT %s OFFSET %s"
-        params.extend([limit, offset])
+        cur = conn.cursor()
+        query, params = build_patient_search_query(term, ranked, status, limit, offset, after)
         
-        cur.execute(query, params)
-        results = cur.fetchall()
+        await cur.execute(query, params)
+        results = await cur.fetchall()
         
         patients = []
         for row in results:
-            patients.append({
+            patient = {
                 "id": str(row[0]), "patient_code": row[1], "first_name": row[2],
                 "last_name": row[3], "date_of_birth": row[4], "gender": row[5],
                 "email": row[6], "phone": row[7], "address": row[8],
@@ -107,36 +166,47 @@ def get_all_patients(
                 "blood_type": row[11], "allergies": row[12], "medical_history": row[13],
                 "insurance_info": row[14], "profile_image_url": row[15],
                 "status": row[16], "created_at": row[17], "updated_at": row[18]
-            })
+            }
+            if include_matches and ranked:
+                patient["score"] = round(float(row[19]), 4)
+                patient["matched_fields"] = list(row[20])
+            elif include_matches and term:
+                needle = term.lower()
+                patient["matched_fields"] = [
+                    field for field in ("first_name", "last_name", "patient_code")
+                    if needle in (patient[field] or "").lower()
+                ] or ["first_name", "last_name"]  # matched across the first/last name boundary
+            patients.append(patient)
+        
+        if not ranked and len(results) == limit:
+            response.headers["X-Next-Cursor"] = encode_cursor(results[-1][17], results[-1][0])
         
         return patients
         
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
     finally:
         if cur:
-            cur.close()
-        if conn:
-            conn.close()
+            await cur.close()
 
 @router.get("/{patient_id}", response_model=PatientResponse)
-def get_patient(patient_id: str, current_doctor: dict = Depends(get_current_doctor)):
+async def get_patient(patient_id: str, current_doctor: dict = Depends(get_current_doctor_async), conn=Depends(get_async_db)):
     """Get a specific patient"""
-    conn = None
     cur = None
     
     try:
-        conn = get_connection()
         cur = conn.cursor()
         
-        cur.execute("""
+        await cur.execute("""
             SELECT id, patient_code, first_name, last_name, date_of_birth, gender, email, phone,
                    address, emergency_contact_name, emergency_contact_phone, blood_type,
                    allergies, medical_history, insurance_info, profile_image_url, status, created_at, updated_at
             FROM patients WHERE id = %s
         """, (patient_id,))
         
-        result = cur.fetchone()
+        result = await cur.fetchone()
         
         if not result:
             raise HTTPException(status_code=404, detail="Patient not found")
@@ -157,21 +227,35 @@ def get_patient(patient_id: str, current_doctor: dict = Depends(get_current_doct
         raise HTTPException(status_code=500, detail=str(e))
     finally:
         if cur:
-            cur.close()
-        if conn:
-            conn.close()
+            await cur.close()
+
+def _patient_surgery_row(row) -> dict:
+    return {
+        "id": str(row[0]),
+        "procedure_name": row[1],
+        "scheduled_date": row[2],
+        "scheduled_time": str(row[3]),
+        "status": row[4],
+        "urgency_level": row[5],
+        "doctor_name": f"{row[6]} {row[7]}",
+        "room_number": row[8]
+    }
 
 @router.get("/{patient_id}/surgeries")
-def get_patient_surgeries(patient_id: str, current_doctor: dict = Depends(get_current_doctor)):
-    """Get all surgeries for a patient"""
-    conn = None
+async def get_patient_surgeries(
+    patient_id: str,
+    accept: Optional[str] = Header(None),
+    current_doctor: dict = Depends(get_current_doctor_async),
+    conn=Depends(get_async_db)
+):
+    """Get all surgeries for a patient (streamed; Accept: application/x-ndjson for NDJSON)"""
     cur = None
     
     try:
-        conn = get_connection()
-        cur = conn.cursor()
+        # Named (server-side) cursor: rows are streamed in batches, never all held in memory
+        cur = conn.cursor(name="patient_surgeries")
         
-        cur.execute("""
+        await cur.execute("""
             SELECT s.id, s.procedure_name, s.scheduled_date, s.scheduled_time, s.status, s.urgency_level,
                    d.first_name, d.last_name, o.room_number
             FROM surgeries s
@@ -181,42 +265,25 @@ def get_patient_surgeries(patient_id: str, current_doctor: dict = Depends(get_cu
             ORDER BY s.scheduled_date DESC, s.scheduled_time DESC
         """, (patient_id,))
         
-        results = cur.fetchall()
-        
-        surgeries = []
-        for row in results:
-            surgeries.append({
-                "id": str(row[0]),
-                "procedure_name": row[1],
-                "scheduled_date": row[2],
-                "scheduled_time": str(row[3]),
-                "status": row[4],
-                "urgency_level": row[5],
-                "doctor_name": f"{row[6]} {row[7]}",
-                "room_number": row[8]
-            })
-        
-        return surgeries
+        response = stream_cursor_async(cur, _patient_surgery_row, wants_ndjson(accept))
+        cur = None  # the response closes it once streamed
+        return response
         
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
     finally:
         if cur:
-            cur.close()
-        if conn:
-            conn.close()
+            await cur.close()
 
 @router.get("/{patient_id}/latest-note")
-def get_patient_latest_note(patient_id: str, current_doctor: dict = Depends(get_current_doctor)):
+async def get_patient_latest_note(patient_id: str, current_doctor: dict = Depends(get_current_doctor_async), conn=Depends(get_async_db)):
     """Get latest note summary for patient"""
-    conn = None
     cur = None
     
     try:
-        conn = get_connection()
         cur = conn.cursor()
         
-        cur.execute("""
+        await cur.execute("""
             SELECT n.id, n.title, n.content, n.note_context, n.created_at,
                    d.first_name, d.last_name
             FROM notes n
@@ -226,7 +293,7 @@ def get_patient_latest_note(patient_id: str, current_doctor: dict = Depends(get_
             LIMIT 1
         """, (patient_id,))
         
-        result = cur.fetchone()
+        result = await cur.fetchone()
         
         if not result:
             return None
@@ -246,18 +313,14 @@ def get_patient_latest_note(patient_id: str, current_doctor: dict = Depends(get_
         raise HTTPException(status_code=500, detail=str(e))
     finally:
         if cur:
-            cur.close()
-        if conn:
-            conn.close()
+            await cur.close()
 
 @router.put("/{patient_id}", response_model=PatientResponse)
-def update_patient(patient_id: str, updates: PatientUpdate, current_doctor: dict = Depends(get_current_doctor)):
+async def update_patient(patient_id: str, updates: PatientUpdate, current_doctor: dict = Depends(get_current_doctor_async), conn=Depends(get_async_db)):
     """Update patient information"""
-    conn = None
     cur = None
     
     try:
-        conn = get_connection()
         cur = conn.cursor()
         
         update_fields = []
@@ -285,13 +348,13 @@ def update_patient(patient_id: str, updates: PatientUpdate, current_doctor: dict
                       allergies, medical_history, insurance_info, profile_image_url, status, created_at, updated_at
         """
         
-        cur.execute(query, params)
-        result = cur.fetchone()
+        await cur.execute(query, params)
+        result = await cur.fetchone()
         
         if not result:
             raise HTTPException(status_code=404, detail="Patient not found")
         
-        conn.commit()
+        await conn.commit()
         
         return {
             "id": str(result[0]), "patient_code": result[1], "first_name": result[2],
@@ -306,42 +369,34 @@ def update_patient(patient_id: str, updates: PatientUpdate, current_doctor: dict
     except HTTPException:
         raise
     except Exception as e:
-        if conn:
-            conn.rollback()
+        await conn.rollback()
         raise HTTPException(status_code=400, detail=str(e))
     finally:
         if cur:
-            cur.close()
-        if conn:
-            conn.close()
+            await cur.close()
 
 @router.delete("/{patient_id}", status_code=204)
-def delete_patient(patient_id: str, current_doctor: dict = Depends(get_current_doctor)):
+async def delete_patient(patient_id: str, current_doctor: dict = Depends(get_current_doctor_async), conn=Depends(get_async_db)):
     """Delete a patient"""
-    conn = None
     cur = None
     
     try:
-        conn = get_connection()
         cur = conn.cursor()
         
-        cur.execute("DELETE FROM patients WHERE id = %s RETURNING id", (patient_id,))
-        result = cur.fetchone()
+        await cur.execute("DELETE FROM patients WHERE id = %s RETURNING id", (patient_id,))
+        result = await cur.fetchone()
         
         if not result:
             raise HTTPException(status_code=404, detail="Patient not found")
         
-        conn.commit()
+        await conn.commit()
         return None
         
     except HTTPException:
         raise
     except Exception as e:
-        if conn:
-            conn.rollback()
+        await conn.rollback()
         raise HTTPException(status_code=400, detail=str(e))
     finally:
         if cur:
-            cur.close()
-        if conn:
-            conn.close()
\ No newline at end of file
+            await cur.close()
\ No newline at end of file
@@ -1,20 +1,30 @@
-"""Recording routes - Start/stop recording and transcription"""
-from fastapi import APIRouter, HTTPException, Depends
-from app.dependencies import get_current_doctor
-from app.db import get_connection
-from app.models import StartRecordingRequest
+"""Recording routes - Start/stop recording, audio upload and transcription"""
+from fastapi import APIRouter, HTTPException, Depends, Header, Query, Request, WebSocket, WebSocketException, status
+from typing import Optional
+from app.db import async_connection
+from app.dependencies import get_current_doctor, get_current_doctor_stream, get_current_doctor_websocket, get_db
+from app.live_transcription import LiveSession, LiveSessionBusy, live_sessions
+from app.models import StartRecordingRequest, AudioUploadComplete
+from app.transcription import (
+    transcription_worker, QUEUE_DEPTH_QUERY, ENQUEUE_TRANSCRIPTION, FINISH_LIVE_TRANSCRIPTION,
+    TRANSCRIPTION_MAX_QUEUED, TRANSCRIPTION_RETRY_BASE_SECONDS
+)
+from app.uploads import (
+    append_chunk, finalize_upload, restore_upload, discard_upload, upload_offset,
+    UploadConflict, UploadTooLarge, ChecksumMismatch, MAX_CHUNK_BYTES
+)
 from datetime import datetime
+import asyncio
+import uuid
 
 router = APIRouter()
 
 @router.post("/start")
-def start_recording(request: StartRecordingRequest, current_doctor: dict = Depends(get_current_doctor)):
+def start_recording(request: StartRecordingRequest, current_doctor: dict = Depends(get_current_doctor), conn=Depends(get_db)):
     """Start a new recording session"""
-    conn = None
     cur = None
     
     try:
-        conn = get_connection()
         cur = conn.cursor()
         
         # Create transcription record
@@ -45,98 +55,239 @@ def start_recording(request: StartRecordingRequest, current_doctor: dict = Depen
         }
         
     except Exception as e:
-        if conn:
-            conn.rollback()
+        conn.rollback()
         raise HTTPException(status_code=400, detail=str(e))
     finally:
         if cur:
             cur.close()
-        if conn:
-            conn.close()
 
-@router.post("/{transcription_id}/stop")
-def stop_recording(transcription_id: str, current_doctor: dict = Depends(get_current_doctor)):
-    """Stop recording and generate mock transcription"""
-    conn = None
+@router.post("/{transcription_id}/stop", status_code=202)
+def stop_recording(transcription_id: str, current_doctor: dict = Depends(get_current_doctor), conn=Depends(get_db)):
+    """
+    Stop recording and queue the transcription (202); poll /{transcription_id}/status.
+    Stopping a failed transcription queues it again. 503 when the queue is full.
+    A recording dictated over /{transcription_id}/live already has its text and
+    completes right away.
+    """
     cur = None
     
     try:
-        conn = get_connection()
         cur = conn.cursor()
         
-        # Mock transcription text
-        transcription_text = """Patient presents with cardiac related issue and possible concerns. 
-Patient reports chest discomfort and shortness of breath during physical activity. 
-Vital signs show elevated blood pressure at 145/95. Heart rate is 88 bpm.
-Recommend ECG and blood pressure measurement. Consider stress test if symptoms persist.
-Patient has history of hypertension, currently on medication.
-Follow-up appointment scheduled in two weeks."""
-        
-        confidence_score = 95.5
-        mock_audio_url = f"recordings/audio_{transcription_id}.wav"
+        cur.execute(FINISH_LIVE_TRANSCRIPTION, (transcription_id, current_doctor["id"]))
+        result = cur.fetchone()
+        if result:
+            conn.commit()
+            return {
+                "transcription_id": str(result[0]),
+                "status": result[1],
+                "message": "Recording stopped; live transcript saved"
+            }
         
-        # Update transcription
-        cur.execute("""
-            UPDATE transcriptions 
-            SET transcription_text = %s,
-                confidence_score = %s,
-                audio_file_url = %s,
-                recording_duration_seconds = %s,
-                transcription_status = %s
-            WHERE id = %s AND doctor_id = %s
-            RETURNING id, transcription_text, confidence_score, transcription_status
-        """, (
-            transcription_text,
-            confidence_score,
-            mock_audio_url,
-            125,  # ~2 minutes
-            "completed",
-            transcription_id,
-            current_doctor["id"]
-        ))
+        cur.execute(QUEUE_DEPTH_QUERY)
+        if cur.fetchone()[0] >= TRANSCRIPTION_MAX_QUEUED:
+            transcription_worker.rejected += 1
+            raise HTTPException(
+                status_code=503,
+                detail="Transcription queue is full, try again shortly",
+                headers={"Retry-After": str(int(TRANSCRIPTION_RETRY_BASE_SECONDS))}
+            )
         
+        cur.execute(ENQUEUE_TRANSCRIPTION, (transcription_id, current_doctor["id"]))
         result = cur.fetchone()
         
         if not result:
-            raise HTTPException(status_code=404, detail="Transcription not found or access denied")
+            cur.execute(
+                "SELECT transcription_status FROM transcriptions WHERE id = %s AND doctor_id = %s",
+                (transcription_id, current_doctor["id"])
+            )
+            existing = cur.fetchone()
+            if not existing:
+                raise HTTPException(status_code=404, detail="Transcription not found or access denied")
+            raise HTTPException(status_code=409, detail=f"Transcription is already {existing[0]}")
         
         conn.commit()
+        transcription_worker.notify()
         
         return {
             "transcription_id": str(result[0]),
-            "transcription_text": result[1],
-            "confidence_score": result[2],
-            "status": result[3],
-            "message": "Recording stopped and transcribed successfully"
+            "status": result[1],
+            "message": "Recording stopped; transcription queued"
         }
         
     except HTTPException:
         raise
     except Exception as e:
-        if conn:
-            conn.rollback()
+        conn.rollback()
         raise HTTPException(status_code=400, detail=str(e))
     finally:
         if cur:
             cur.close()
-        if conn:
-            conn.close()
+
+# Audio upload: GET the offset, PATCH raw chunks at that offset (resuming from the
+# returned offset after a dropped connection), then POST .../complete. These
+# routes do not hold a pooled connection while the body streams in: ownership is
+# checked with a short-lived one.
+
+async def _owned_transcription(transcription_id: str, doctor_id: str) -> Optional[tuple]:
+    """(transcription_status, audio_file_url) if the doctor owns the transcription, else None"""
+    try:
+        upload_offset(transcription_id)  # validates the id
+    except ValueError:
+        return None
+    async with async_connection() as conn:
+        async with conn.cursor() as cur:
+            await cur.execute(
+                "SELECT transcription_status, audio_file_url FROM transcriptions WHERE id = %s AND doctor_id = %s",
+                (transcription_id, doctor_id)
+            )
+            return await cur.fetchone()
+
+async def _upload_target(transcription_id: str, doctor_id: str) -> Optional[str]:
+    """404 unless the doctor owns the transcription; returns its audio_file_url"""
+    row = await _owned_transcription(transcription_id, doctor_id)
+    if not row:
+        raise HTTPException(status_code=404, detail="Transcription not found")
+    return row[1]
+
+@router.get("/{transcription_id}/audio")
+async def get_audio_upload(transcription_id: str, current_doctor: dict = Depends(get_current_doctor_stream)):
+    """Upload progress: the offset the next chunk must start at"""
+    audio_file_url = await _upload_target(transcription_id, current_doctor["id"])
+    return {
+        "transcription_id": transcription_id,
+        "offset": upload_offset(transcription_id),
+        "max_chunk_bytes": MAX_CHUNK_BYTES,
+        "complete": audio_file_url is not None,
+        "audio_file_url": audio_file_url
+    }
+
+@router.patch("/{transcription_id}/audio")
+async def upload_audio_chunk(
+    transcription_id: str,
+    request: Request,
+    upload_offset_header: int = Header(..., alias="Upload-Offset", ge=0),
+    chunk_sha256: Optional[str] = Header(None, alias="X-Chunk-SHA256", pattern="^[0-9a-fA-F]{64}$"),
+    current_doctor: dict = Depends(get_current_doctor_stream)
+):
+    """
+    Append the raw request body (application/octet-stream) at Upload-Offset.
+    409 with the current Upload-Offset if it does not match; a chunk that fails
+    X-Chunk-SHA256 (400) or is cut off is discarded whole.
+    """
+    if await _upload_target(transcription_id, current_doctor["id"]) is not None:
+        raise HTTPException(status_code=409, detail="Audio upload already completed")
+    
+    try:
+        offset = await append_chunk(transcription_id, upload_offset_header, request.stream(), chunk_sha256)
+    except UploadConflict as e:
+        raise HTTPException(status_code=409, detail=str(e), headers={"Upload-Offset": str(e.offset)})
+    except UploadTooLarge as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    except ChecksumMismatch as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    return {"transcription_id": transcription_id, "offset": offset}
+
+@router.post("/{transcription_id}/audio/complete")
+async def complete_audio_upload(
+    transcription_id: str,
+    upload: AudioUploadComplete,
+    current_doctor: dict = Depends(get_current_doctor_stream)
+):
+    """Verify the whole recording against sha256 and attach it to the transcription"""
+    if await _upload_target(transcription_id, current_doctor["id"]) is not None:
+        raise HTTPException(status_code=409, detail="Audio upload already completed")
+    
+    try:
+        path, size, digest = await finalize_upload(transcription_id, upload.audio_format, upload.sha256)
+    except FileNotFoundError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except UploadConflict as e:
+        raise HTTPException(status_code=409, detail=str(e), headers={"Upload-Offset": str(e.offset)})
+    except ChecksumMismatch as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    try:
+        async with async_connection() as conn:
+            async with conn.cursor() as cur:
+                await cur.execute("""
+                    UPDATE transcriptions
+                    SET audio_file_url = %s,
+                        recording_duration_seconds = COALESCE(%s, recording_duration_seconds)
+                    WHERE id = %s AND doctor_id = %s
+                    RETURNING id
+                """, (path, upload.duration_seconds, transcription_id, current_doctor["id"]))
+                result = await cur.fetchone()
+    except BaseException:
+        # Not recorded: put the bytes back under .part so completing can be retried
+        await asyncio.shield(restore_upload(transcription_id, upload.audio_format))
+        raise
+    
+    if not result:
+        await restore_upload(transcription_id, upload.audio_format)
+        raise HTTPException(status_code=404, detail="Transcription not found")
+    
+    return {
+        "transcription_id": transcription_id,
+        "audio_file_url": path,
+        "size_bytes": size,
+        "sha256": digest
+    }
+
+@router.websocket("/{transcription_id}/live")
+async def live_transcription(
+    websocket: WebSocket,
+    transcription_id: str,
+    sample_rate: int = Query(16000, ge=8000, le=48000, description="PCM sample rate (16-bit mono)"),
+    current_doctor: dict = Depends(get_current_doctor_websocket)
+):
+    """
+    Live dictation for a transcription that is still recording: send binary
+    16-bit mono PCM frames and receive partial/final segments as JSON; send
+    {"type": "stop"} to flush the last words and get "done" (see
+    app.live_transcription). Final segments are saved as they arrive, so the
+    following /stop completes at once.
+    """
+    row = await _owned_transcription(transcription_id, current_doctor["id"])
+    if not row:
+        raise WebSocketException(code=status.WS_1008_POLICY_VIOLATION, reason="Transcription not found")
+    if row[0] != "recording":
+        raise WebSocketException(code=status.WS_1008_POLICY_VIOLATION, reason=f"Transcription is {row[0]}")
+    # One session per transcription however its id is spelled (case, braces, no dashes)
+    transcription_id = str(uuid.UUID(transcription_id))
+    try:
+        live_sessions.open(transcription_id)
+    except LiveSessionBusy as e:
+        raise WebSocketException(code=status.WS_1013_TRY_AGAIN_LATER, reason=str(e))
+    
+    try:
+        session = LiveSession(websocket, transcription_id, current_doctor["id"], sample_rate)
+        await websocket.accept()
+        await session.run()
+    finally:
+        live_sessions.close(transcription_id)
 
 @router.get("/{transcription_id}/status")
-def get_transcription_status(transcription_id: str, current_doctor: dict = Depends(get_current_doctor)):
+def get_transcription_status(transcription_id: str, current_doctor: dict = Depends(get_current_doctor), conn=Depends(get_db)):
     """Get transcription status (for polling)"""
-    conn = None
     cur = None
     
     try:
-        conn = get_connection()
         cur = conn.cursor()
         
+        # jobs_ahead: queued jobs due before this one (only while it is waiting)
         cur.execute("""
-            SELECT id, transcription_status, confidence_score, recording_duration_seconds,
-                   transcription_text, created_at
-            FROM transcriptions
-            WHERE id = %s AND doctor_id = %s
+            SELECT t.id, t.transcription_status, t.confidence_score, t.recording_duration_seconds,
+                   t.transcription_text, t.created_at, t.attempts, t.last_error, t.started_at,
+                   t.completed_at, t.claimed_until IS NOT NULL,
+                   CASE WHEN t.transcription_status = 'processing' AND t.claimed_until IS NULL THEN (
+                       SELECT COUNT(*) FROM transcriptions q
+                       WHERE q.transcription_status = 'processing' AND q.claimed_until IS NULL
+                         AND q.next_attempt_at < t.next_attempt_at
+                   ) END
+            FROM transcriptions t
+            WHERE t.id = %s AND t.doctor_id = %s
         """, (transcription_id, current_doctor["id"]))
         
         result = cur.fetchone()
@@ -144,13 +295,28 @@ def get_transcription_status(transcription_id: str, current_doctor: dict = Depen
         if not result:
             raise HTTPException(status_code=404, detail="Transcription not found")
         
+        status, attempts, claimed = result[1], result[6], result[10]
+        if status != "processing":
+            stage = status
+        elif claimed:
+            stage = "transcribing"
+        else:
+            stage = "retrying" if attempts else "queued"
+        
         return {
             "transcription_id": str(result[0]),
-            "status": result[1],
+            "status": status,
+            "stage": stage,
+            "jobs_ahead": result[11],
+            "attempts": attempts,
+            "last_error": result[7],
             "confidence_score": result[2],
             "duration_seconds": result[3],
             "has_text": result[4] is not None,
-            "created_at": result[5]
+            "transcription_text": result[4] if status == "completed" else None,
+            "created_at": result[5],
+            "started_at": result[8],
+            "completed_at": result[9]
         }
         
     except HTTPException:
@@ -160,17 +326,13 @@ def get_transcription_status(transcription_id: str, current_doctor: dict = Depen
     finally:
         if cur:
             cur.close()
-        if conn:
-            conn.close()
 
 @router.delete("/{transcription_id}")
-def discard_recording(transcription_id: str, current_doctor: dict = Depends(get_current_doctor)):
+def discard_recording(transcription_id: str, current_doctor: dict = Depends(get_current_doctor), conn=Depends(get_db)):
     """Discard a recording/transcription"""
-    conn = None
     cur = None
     
     try:
-        conn = get_connection()
         cur = conn.cursor()
         
         cur.execute("""
@@ -185,17 +347,15 @@ def discard_recording(transcription_id: str, current_doctor: dict = Depends(get_
             raise HTTPException(status_code=404, detail="Transcription not found or access denied")
         
         conn.commit()
+        discard_upload(transcription_id)
         
         return {"message": "Recording discarded successfully"}
         
     except HTTPException:
         raise
     except Exception as e:
-        if conn:
-            conn.rollback()
+        conn.rollback()
         raise HTTPException(status_code=400, detail=str(e))
     finally:
         if cur:
-            cur.close()
-        if conn:
-            conn.close()
\ No newline at end of file
+            cur.close()
\ No newline at end of file
@@ -2,9 +2,11 @@
 from fastapi import APIRouter, HTTPException, Query, Depends
 from typing import List, Optional
 from app.models import SurgeryCreate, SurgeryUpdate, SurgeryResponse, StatusUpdate
-from app.dependencies import get_current_doctor
-from app.db import get_connection
+from app.dependencies import get_current_doctor, get_db
+from app.scheduling import record_surgery_count_change, status_count_delta
+from app.events import publish_schedule_change
 from datetime import date
+from psycopg2 import errors
 import json
 
 router = APIRouter()
@@ -14,20 +16,20 @@ def get_surgeries(
     status: Optional[str] = Query(None),
     schedule_date: Optional[date] = Query(None),
     doctor_id: Optional[str] = Query(None),
-    current_doctor: dict = Depends(get_current_doctor)
+    current_doctor: dict = Depends(get_current_doctor),
+    conn=Depends(get_db)
 ):
     """Get surgeries with filters"""
-    conn = None
     cur = None
     
     try:
-        conn = get_connection()
         cur = conn.cursor()
         
         query = """
             SELECT s.id, s.patient_id, s.doctor_id, s.operating_room_id, s.procedure_name,
-                   s.scheduled_date, s.scheduled_time, s.estimated_duration_minutes, s.actual_start_time,
-                   s.actual_end_time, s.status, s.urgency_level, s.notes, s.participants, s.created_at, s.updated_at
+                   s.scheduled_date, s.scheduled_time, s.duration_minutes, s.actual_start_time,
+                   s.actual_end_time, s.status, s.urgency_level, s.pre_op_notes, s.participants, s.created_at, s.updated_at,
+                   s.surgery_type, s.post_op_notes, s.complications
             FROM surgeries s WHERE 1=1
         """
         params = []
@@ -55,9 +57,10 @@ def get_surgeries(
                 "id": str(row[0]), "patient_id": str(row[1]), "doctor_id": str(row[2]),
                 "operating_room_id": str(row[3]) if row[3] else None, "procedure_name": row[4],
                 "scheduled_date": row[5], "scheduled_time": str(row[6]) if row[6] else None,
-                "estimated_duration_minutes": row[7], "actual_start_time": row[8],
+                "duration_minutes": row[7], "actual_start_time": row[8],
                 "actual_end_time": row[9], "status": row[10], "urgency_level": row[11],
-                "notes": row[12], "participants": row[13], "created_at": row[14], "updated_at": row[15]
+                "pre_op_notes": row[12], "participants": row[13], "created_at": row[14], "updated_at": row[15],
+                "surgery_type": row[16], "post_op_notes": row[17], "complications": row[18]
             })
         
         return surgeries
@@ -67,23 +70,20 @@ def get_surgeries(
     finally:
         if cur:
             cur.close()
-        if conn:
-            conn.close()
 
 @router.get("/{surgery_id}", response_model=SurgeryResponse)
-def get_surgery(surgery_id: str, current_doctor: dict = Depends(get_current_doctor)):
+def get_surgery(surgery_id: str, current_doctor: dict = Depends(get_current_doctor), conn=Depends(get_db)):
     """Get specific surgery details"""
-    conn = None
     cur = None
     
     try:
-        conn = get_connection()
         cur = conn.cursor()
         
         cur.execute("""
             SELECT id, patient_id, doctor_id, operating_room_id, procedure_name,
-                   scheduled_date, scheduled_time, estimated_duration_minutes, actual_start_time,
-                   actual_end_time, status, urgency_level, notes, participants, created_at, updated_at
+                   scheduled_date, scheduled_time, duration_minutes, actual_start_time,
+                   actual_end_time, status, urgency_level, pre_op_notes, participants, created_at, updated_at,
+                   surgery_type, post_op_notes, complications
             FROM surgeries WHERE id = %s
         """, (surgery_id,))
         
@@ -96,9 +96,10 @@ def get_surgery(surgery_id: str, current_doctor: dict = Depends(get_current_doct
             "id": str(result[0]), "patient_id": str(result[1]), "doctor_id": str(result[2]),
             "operating_room_id": str(result[3]) if result[3] else None, "procedure_name": result[4],
             "scheduled_date": result[5], "scheduled_time": str(result[6]) if result[6] else None,
-            "estimated_duration_minutes": result[7], "actual_start_time": result[8],
+            "duration_minutes": result[7], "actual_start_time": result[8],
             "actual_end_time": result[9], "status": result[10], "urgency_level": result[11],
-            "notes": result[12], "participants": result[13], "created_at": result[14], "updated_at": result[15]
+            "pre_op_notes": result[12], "participants": result[13], "created_at": result[14], "updated_at": result[15],
+            "surgery_type": result[16], "post_op_notes": result[17], "complications": result[18]
         }
         
     except HTTPException:
@@ -108,66 +109,64 @@ def get_surgery(surgery_id: str, current_doctor: dict = Depends(get_current_doct
     finally:
         if cur:
             cur.close()
-        if conn:
-            conn.close()
 
 @router.post("/", response_model=SurgeryResponse, status_code=201)
-def create_surgery(surgery: SurgeryCreate, current_doctor: dict = Depends(get_current_doctor)):
+def create_surgery(surgery: SurgeryCreate, current_doctor: dict = Depends(get_current_doctor), conn=Depends(get_db)):
     """Create a new surgery"""
-    conn = None
     cur = None
     
     try:
-        conn = get_connection()
         cur = conn.cursor()
         
         cur.execute("""
             INSERT INTO surgeries (
-                patient_id, doctor_id, operating_room_id, procedure_name,
-                scheduled_date, scheduled_time, estimated_duration_minutes,
-                status, urgency_level, notes, participants
-            ) VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
+                patient_id, doctor_id, operating_room_id, surgery_type, procedure_name,
+                scheduled_date, scheduled_time, duration_minutes,
+                status, urgency_level, pre_op_notes, participants
+            ) VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
             RETURNING id, patient_id, doctor_id, operating_room_id, procedure_name,
-                      scheduled_date, scheduled_time, estimated_duration_minutes, actual_start_time,
-                      actual_end_time, status, urgency_level, notes, participants, created_at, updated_at
+                      scheduled_date, scheduled_time, duration_minutes, actual_start_time,
+                      actual_end_time, status, urgency_level, pre_op_notes, participants, created_at, updated_at,
+                      surgery_type, post_op_notes, complications
         """, (
-            surgery.patient_id, surgery.doctor_id, surgery.operating_room_id,
+            surgery.patient_id, surgery.doctor_id, surgery.operating_room_id, surgery.surgery_type,
             surgery.procedure_name, surgery.scheduled_date, surgery.scheduled_time,
-            surgery.estimated_duration_minutes, surgery.status or 'scheduled',
-            surgery.urgency_level or 'routine', surgery.notes,
+            surgery.duration_minutes, 'scheduled',
+            surgery.urgency_level or 'routine', surgery.pre_op_notes,
             json.dumps(surgery.participants) if surgery.participants else None
         ))
         
         result = cur.fetchone()
         conn.commit()
+        record_surgery_count_change(result[5], status_count_delta("cancelled", result[10]))
+        publish_schedule_change(result[5])
         
         return {
             "id": str(result[0]), "patient_id": str(result[1]), "doctor_id": str(result[2]),
             "operating_room_id": str(result[3]) if result[3] else None, "procedure_name": result[4],
             "scheduled_date": result[5], "scheduled_time": str(result[6]) if result[6] else None,
-            "estimated_duration_minutes": result[7], "actual_start_time": result[8],
+            "duration_minutes": result[7], "actual_start_time": result[8],
             "actual_end_time": result[9], "status": result[10], "urgency_level": result[11],
-            "notes": result[12], "participants": result[13], "created_at": result[14], "updated_at": result[15]
+            "pre_op_notes": result[12], "participants": result[13], "created_at": result[14], "updated_at": result[15],
+            "surgery_type": result[16], "post_op_notes": result[17], "complications": result[18]
         }
         
+    except errors.ExclusionViolation:
+        conn.rollback()
+        raise HTTPException(status_code=409, detail="Operating room not available at this time")
     except Exception as e:
-        if conn:
-            conn.rollback()
+        conn.rollback()
         raise HTTPException(status_code=400, detail=str(e))
     finally:
         if cur:
             cur.close()
-        if conn:
-            conn.close()
 
 @router.put("/{surgery_id}", response_model=SurgeryResponse)
-def update_surgery(surgery_id: str, updates: SurgeryUpdate, current_doctor: dict = Depends(get_current_doctor)):
+def update_surgery(surgery_id: str, updates: SurgeryUpdate, current_doctor: dict = Depends(get_current_doctor), conn=Depends(get_db)):
     """Update surgery information"""
-    conn = None
     cur = None
     
     try:
-        conn = get_connection()
         cur = conn.cursor()
         
         update_fields = []
@@ -187,12 +186,19 @@ def update_surgery(surgery_id: str, updates: SurgeryUpdate, current_doctor: dict
         
         params.append(surgery_id)
         
+        # A reschedule moves the surgery between days of the month availability counts
+        previous = None
+        if updates.scheduled_date is not None:
+            cur.execute("SELECT scheduled_date, status FROM surgeries WHERE id = %s FOR UPDATE", (surgery_id,))
+            previous = cur.fetchone()
+        
         query = f"""
             UPDATE surgeries SET {', '.join(update_fields)}
             WHERE id = %s
             RETURNING id, patient_id, doctor_id, operating_room_id, procedure_name,
-                      scheduled_date, scheduled_time, estimated_duration_minutes, actual_start_time,
-                      actual_end_time, status, urgency_level, notes, participants, created_at, updated_at
+                      scheduled_date, scheduled_time, duration_minutes, actual_start_time,
+                      actual_end_time, status, urgency_level, pre_op_notes, participants, created_at, updated_at,
+                      surgery_type, post_op_notes, complications
         """
         
         cur.execute(query, params)
@@ -202,43 +208,47 @@ def update_surgery(surgery_id: str, updates: SurgeryUpdate, current_doctor: dict
             raise HTTPException(status_code=404, detail="Surgery not found")
         
         conn.commit()
+        if previous and previous[0] != result[5] and previous[1] != "cancelled":
+            record_surgery_count_change(previous[0], -1)
+            record_surgery_count_change(result[5], 1)
+        publish_schedule_change(result[5], previous[0] if previous else None)
         
         return {
             "id": str(result[0]), "patient_id": str(result[1]), "doctor_id": str(result[2]),
             "operating_room_id": str(result[3]) if result[3] else None, "procedure_name": result[4],
             "scheduled_date": result[5], "scheduled_time": str(result[6]) if result[6] else None,
-            "estimated_duration_minutes": result[7], "actual_start_time": result[8],
+            "duration_minutes": result[7], "actual_start_time": result[8],
             "actual_end_time": result[9], "status": result[10], "urgency_level": result[11],
-            "notes": result[12], "participants": result[13], "created_at": result[14], "updated_at": result[15]
+            "pre_op_notes": result[12], "participants": result[13], "created_at": result[14], "updated_at": result[15],
+            "surgery_type": result[16], "post_op_notes": result[17], "complications": result[18]
         }
         
     except HTTPException:
         raise
+    except errors.ExclusionViolation:
+        conn.rollback()
+        raise HTTPException(status_code=409, detail="Operating room not available at this time")
     except Exception as e:
-        if conn:
-            conn.rollback()
+        conn.rollback()
         raise HTTPException(status_code=400, detail=str(e))
     finally:
         if cur:
             cur.close()
-        if conn:
-            conn.close()
 
 @router.patch("/{surgery_id}/status")
-def update_surgery_status(surgery_id: str, status_update: StatusUpdate, current_doctor: dict = Depends(get_current_doctor)):
+def update_surgery_status(surgery_id: str, status_update: StatusUpdate, current_doctor: dict = Depends(get_current_doctor), conn=Depends(get_db)):
     """Update surgery status"""
-    conn = None
     cur = None
     
     try:
-        conn = get_connection()
         cur = conn.cursor()
         
         cur.execute("""
+            WITH previous AS (SELECT status FROM surgeries WHERE id = %s FOR UPDATE)
             UPDATE surgeries SET status = %s
             WHERE id = %s
-            RETURNING id, status
-        """, (status_update.status, surgery_id))
+            RETURNING id, status, scheduled_date, (SELECT status FROM previous)
+        """, (surgery_id, status_update.status, surgery_id))
         
         result = cur.fetchone()
         
@@ -246,6 +256,8 @@ def update_surgery_status(surgery_id: str, status_update: StatusUpdate, current_
             raise HTTPException(status_code=404, detail="Surgery not found")
         
         conn.commit()
+        record_surgery_count_change(result[2], status_count_delta(result[3], result[1]))
+        publish_schedule_change(result[2])
         
         return {
             "surgery_id": str(result[0]),
@@ -255,24 +267,23 @@ def update_surgery_status(surgery_id: str, status_update: StatusUpdate, current_
         
     except HTTPException:
         raise
+    except errors.ExclusionViolation:
+        # Reinstating a cancelled/completed surgery whose slot has since been booked
+        conn.rollback()
+        raise HTTPException(status_code=409, detail="Operating room not available at this time")
     except Exception as e:
-        if conn:
-            conn.rollback()
+        conn.rollback()
         raise HTTPException(status_code=400, detail=str(e))
     finally:
         if cur:
             cur.close()
-        if conn:
-            conn.close()
 
 @router.post("/{surgery_id}/participants/add")
-def add_surgery_participant(surgery_id: str, participant_name: str, current_doctor: dict = Depends(get_current_doctor)):
+def add_surgery_participant(surgery_id: str, participant_name: str, current_doctor: dict = Depends(get_current_doctor), conn=Depends(get_db)):
     """Add participant to surgery (triggers notification)"""
-    conn = None
     cur = None
     
     try:
-        conn = get_connection()
         cur = conn.cursor()
         
         # Get current participants
@@ -317,31 +328,27 @@ def add_surgery_participant(surgery_id: str, participant_name: str, current_doct
     except HTTPException:
         raise
     except Exception as e:
-        if conn:
-            conn.rollback()
+        conn.rollback()
         raise HTTPException(status_code=400, detail=str(e))
     finally:
         if cur:
             cur.close()
-        if conn:
-            conn.close()
 
 @router.post("/{surgery_id}/delay")
-def delay_surgery(surgery_id: str, current_doctor: dict = Depends(get_current_doctor)):
+def delay_surgery(surgery_id: str, current_doctor: dict = Depends(get_current_doctor), conn=Depends(get_db)):
     """Mark surgery as delayed and notify participants"""
-    conn = None
     cur = None
     
     try:
-        conn = get_connection()
         cur = conn.cursor()
         
         # Update surgery status
         cur.execute("""
+            WITH previous AS (SELECT status FROM surgeries WHERE id = %s FOR UPDATE)
             UPDATE surgeries SET status = 'delayed'
             WHERE id = %s
-            RETURNING doctor_id, participants, procedure_name
-        """, (surgery_id,))
+            RETURNING doctor_id, participants, procedure_name, scheduled_date, (SELECT status FROM previous)
+        """, (surgery_id, surgery_id))
         
         result = cur.fetchone()
         
@@ -365,6 +372,8 @@ def delay_surgery(surgery_id: str, current_doctor: dict = Depends(get_current_do
         ))
         
         conn.commit()
+        record_surgery_count_change(result[3], status_count_delta(result[4], "delayed"))
+        publish_schedule_change(result[3])
         
         return {
             "surgery_id": surgery_id,
@@ -375,31 +384,27 @@ def delay_surgery(surgery_id: str, current_doctor: dict = Depends(get_current_do
     except HTTPException:
         raise
     except Exception as e:
-        if conn:
-            conn.rollback()
+        conn.rollback()
         raise HTTPException(status_code=400, detail=str(e))
     finally:
         if cur:
             cur.close()
-        if conn:
-            conn.close()
 
 @router.post("/{surgery_id}/cancel")
-def cancel_surgery(surgery_id: str, current_doctor: dict = Depends(get_current_doctor)):
+def cancel_surgery(surgery_id: str, current_doctor: dict = Depends(get_current_doctor), conn=Depends(get_db)):
     """Cancel surgery and notify participants"""
-    conn = None
     cur = None
     
     try:
-        conn = get_connection()
         cur = conn.cursor()
         
         # Update surgery status
         cur.execute("""
+            WITH previous AS (SELECT status FROM surgeries WHERE id = %s FOR UPDATE)
             UPDATE surgeries SET status = 'cancelled'
             WHERE id = %s
-            RETURNING doctor_id, participants, procedure_name, operating_room_id
-        """, (surgery_id,))
+            RETURNING doctor_id, participants, procedure_name, operating_room_id, scheduled_date, (SELECT status FROM previous)
+        """, (surgery_id, surgery_id))
         
         result = cur.fetchone()
         
@@ -428,6 +433,8 @@ def cancel_surgery(surgery_id: str, current_doctor: dict = Depends(get_current_d
         ))
         
         conn.commit()
+        record_surgery_count_change(result[4], status_count_delta(result[5], "cancelled"))
+        publish_schedule_change(result[4])
         
         return {
             "surgery_id": surgery_id,
@@ -438,31 +445,27 @@ def cancel_surgery(surgery_id: str, current_doctor: dict = Depends(get_current_d
     except HTTPException:
         raise
     except Exception as e:
-        if conn:
-            conn.rollback()
+        conn.rollback()
         raise HTTPException(status_code=400, detail=str(e))
     finally:
         if cur:
             cur.close()
-        if conn:
-            conn.close()
 
 @router.post("/{surgery_id}/complete")
-def complete_surgery(surgery_id: str, current_doctor: dict = Depends(get_current_doctor)):
+def complete_surgery(surgery_id: str, current_doctor: dict = Depends(get_current_doctor), conn=Depends(get_db)):
     """Mark surgery as completed and notify participants"""
-    conn = None
     cur = None
     
     try:
-        conn = get_connection()
         cur = conn.cursor()
         
         # Update surgery status
         cur.execute("""
+            WITH previous AS (SELECT status FROM surgeries WHERE id = %s FOR UPDATE)
             UPDATE surgeries SET status = 'completed', actual_end_time = NOW()
             WHERE id = %s
-            RETURNING doctor_id, participants, procedure_name, operating_room_id
-        """, (surgery_id,))
+            RETURNING doctor_id, participants, procedure_name, operating_room_id, scheduled_date, (SELECT status FROM previous)
+        """, (surgery_id, surgery_id))
         
         result = cur.fetchone()
         
@@ -491,6 +494,8 @@ def complete_surgery(surgery_id: str, current_doctor: dict = Depends(get_current
         ))
         
         conn.commit()
+        record_surgery_count_change(result[4], status_count_delta(result[5], "completed"))
+        publish_schedule_change(result[4])
         
         return {
             "surgery_id": surgery_id,
@@ -501,11 +506,8 @@ def complete_surgery(surgery_id: str, current_doctor: dict = Depends(get_current
     except HTTPException:
         raise
     except Exception as e:
-        if conn:
-            conn.rollback()
+        conn.rollback()
         raise HTTPException(status_code=400, detail=str(e))
     finally:
         if cur:
             cur.close()
-        if conn:
-            conn.close()
@@ -0,0 +1,285 @@
+"""
+OR scheduling helpers - day grid building, the month availability cache and free slot search
+"""
+from bisect import bisect_left, bisect_right
+from datetime import date, datetime, time, timedelta
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+import os
+
+from app.cache import PatchableCache
+
+SLOT_MINUTES = (5, 15, 30, 60)
+DEFAULT_DAY_START = time(7, 0)
+DEFAULT_DAY_END = time(20, 0)
+DEFAULT_SURGERY_MINUTES = 60
+
+
+def minutes_of(t: time) -> int:
+    return t.hour * 60 + t.minute
+
+
+def format_minutes(minutes: int) -> str:
+    """HH:MM for a minute-of-day (24:00 for end of day)"""
+    return f"{minutes // 60:02d}:{minutes % 60:02d}"
+
+
+def validate_grid_bounds(slot_minutes: int, day_start: time, day_end: time) -> None:
+    """Raise ValueError for a slot size or day window the grid builder cannot use"""
+    if slot_minutes not in SLOT_MINUTES:
+        raise ValueError(f"slot_minutes must be one of {', '.join(map(str, SLOT_MINUTES))}")
+    if minutes_of(day_start) >= minutes_of(day_end):
+        raise ValueError("day_start must be before day_end")
+
+
+def _slot_bounds(slot_minutes: int, day_start: time, day_end: time):
+    validate_grid_bounds(slot_minutes, day_start, day_end)
+    start = minutes_of(day_start)
+    end = minutes_of(day_end)
+    return start, end, -(-(end - start) // slot_minutes)  # last slot may be partial
+
+
+def slot_times(slot_minutes: int = 60, day_start: time = DEFAULT_DAY_START, day_end: time = DEFAULT_DAY_END) -> List[str]:
+    """HH:MM start of every slot in the day window"""
+    start, _, slot_count = _slot_bounds(slot_minutes, day_start, day_end)
+    return [format_minutes(start + index * slot_minutes) for index in range(slot_count)]
+
+
+def place_surgeries(
+    room_numbers: Iterable[str],
+    surgeries: Iterable[Dict[str, Any]],
+    slot_minutes: int = 60,
+    day_start: time = DEFAULT_DAY_START,
+    day_end: time = DEFAULT_DAY_END
+) -> Dict[str, List[Optional[dict]]]:
+    """
+    room_number -> per-slot list holding the payload of the surgery in that slot (or None).
+
+    surgeries are dicts with room_number, start (time), duration_minutes and a
+    payload. Each surgery is placed once by index arithmetic into every slot it
+    overlaps, so the cost is O(rooms * slots + surgeries * slots they span)
+    rather than a scan of all surgeries per cell. Where two surgeries overlap in
+    a room the earlier-listed one keeps the cell.
+    """
+    start, _, slot_count = _slot_bounds(slot_minutes, day_start, day_end)
+    cells: Dict[str, List[Optional[dict]]] = {room: [None] * slot_count for room in room_numbers}
+
+    for surgery in surgeries:
+        row = cells.get(surgery["room_number"])
+        if row is None:
+            continue
+        surgery_start = minutes_of(surgery["start"])
+        surgery_end = surgery_start + (surgery.get("duration_minutes") or DEFAULT_SURGERY_MINUTES)
+        first = max(0, (surgery_start - start) // slot_minutes)
+        last = min(slot_count, -(-(surgery_end - start) // slot_minutes))
+        payload = surgery["payload"]
+        for index in range(first, last):
+            if row[index] is None:
+                row[index] = payload
+    return cells
+
+
+def build_day_grid(
+    room_numbers: Iterable[str],
+    surgeries: Iterable[Dict[str, Any]],
+    slot_minutes: int = 60,
+    day_start: time = DEFAULT_DAY_START,
+    day_end: time = DEFAULT_DAY_END
+) -> List[Dict[str, Any]]:
+    """Build the OR grid for one day: one entry per slot, each with every room's cell"""
+    room_numbers = list(room_numbers)
+    cells = place_surgeries(room_numbers, surgeries, slot_minutes, day_start, day_end)
+    start, end, slot_count = _slot_bounds(slot_minutes, day_start, day_end)
+
+    available = {"status": "available", "patient_name": None, "patient_code": None, "procedure": None}
+    slots = []
+    for index in range(slot_count):
+        slot_start = start + index * slot_minutes
+        slots.append({
+            "time": format_minutes(slot_start),
+            "end_time": format_minutes(min(slot_start + slot_minutes, end)),
+            "or_rooms": {
+                f"or_{room}": cells[room][index] or available
+                for room in room_numbers
+            }
+        })
+    return slots
+
+
+def build_day_columns(
+    room_numbers: Iterable[str],
+    surgeries: Iterable[Dict[str, Any]],
+    surgery_index: Dict[int, int],
+    surgery_table: List[dict],
+    slot_minutes: int = 60,
+    day_start: time = DEFAULT_DAY_START,
+    day_end: time = DEFAULT_DAY_END
+) -> List[List[int]]:
+    """
+    Compact form of one day: one occupancy array per room (in room_numbers order)
+    with, per slot, -1 when free or the position of the surgery's payload in
+    surgery_table. surgery_index / surgery_table are shared across days so each
+    payload is listed once.
+    """
+    room_numbers = list(room_numbers)
+    cells = place_surgeries(room_numbers, surgeries, slot_minutes, day_start, day_end)
+    occupancy = []
+    for room in room_numbers:
+        row = []
+        for payload in cells[room]:
+            if payload is None:
+                row.append(-1)
+                continue
+            position = surgery_index.get(id(payload))
+            if position is None:
+                position = surgery_index[id(payload)] = len(surgery_table)
+                surgery_table.append(payload)
+            row.append(position)
+        occupancy.append(row)
+    return occupancy
+
+
+# ============================================
+# MONTH AVAILABILITY CACHE
+# ============================================
+
+# (year, month) -> {date: number of non-cancelled surgeries}, only days that have any.
+# Surgery writes in this process patch or drop the affected month; the TTL bounds
+# staleness from writes made elsewhere (another worker, SQL run by hand).
+MONTH_AVAILABILITY_CACHE_TTL_SECONDS = float(os.getenv("MONTH_AVAILABILITY_CACHE_TTL_SECONDS", "300"))
+month_availability_cache = PatchableCache(maxsize=240, ttl=MONTH_AVAILABILITY_CACHE_TTL_SECONDS)
+
+
+def record_surgery_count_change(day: Optional[date], delta: int) -> None:
+    """Adjust the cached count of `day` after a surgery starts or stops holding it"""
+    if day is None or not delta:
+        return
+
+    def update(counts: Dict[date, int]) -> Dict[date, int]:
+        counts = dict(counts)
+        count = counts.get(day, 0) + delta
+        if count > 0:
+            counts[day] = count
+        else:
+            counts.pop(day, None)
+        return counts
+
+    month_availability_cache.patch((day.year, day.month), update)
+
+
+def status_count_delta(old_status: Optional[str], new_status: Optional[str]) -> int:
+    """+1/-1 when a status change makes a surgery start/stop holding its day (cancelled frees it)"""
+    return (new_status != "cancelled") - (old_status != "cancelled")
+
+
+# ============================================
+# FREE SLOT SEARCH
+# ============================================
+
+class IntervalIndex:
+    """
+    Busy [start, end) intervals merged into sorted, non-overlapping runs, with
+    bisect lookups. Built once per search; each lookup is O(log n) plus the runs
+    it skips. Runs that only touch are kept apart, so an interval added with
+    add() (which must not overlap any run) can later be taken out with remove().
+    """
+
+    def __init__(self, intervals: Iterable[Tuple[datetime, datetime]]):
+        self.starts: List[datetime] = []
+        self.ends: List[datetime] = []
+        for start, end in sorted(intervals):
+            if end <= start:
+                continue
+            if self.ends and start < self.ends[-1]:
+                self.ends[-1] = max(self.ends[-1], end)
+            else:
+                self.starts.append(start)
+                self.ends.append(end)
+
+    def __len__(self) -> int:
+        return len(self.starts)
+
+    def next_free(self, at: datetime, length: timedelta) -> datetime:
+        """Earliest t >= at with [t, t + length) clear of every busy run"""
+        index = bisect_right(self.ends, at)
+        while index < len(self.starts) and self.starts[index] < at + length:
+            at = max(at, self.ends[index])
+            index += 1
+        return at
+
+    def add(self, start: datetime, end: datetime) -> None:
+        index = bisect_right(self.starts, start)
+        if (index and self.ends[index - 1] > start) or (index < len(self.starts) and self.starts[index] < end):
+            raise ValueError("interval overlaps a busy run")
+        self.starts.insert(index, start)
+        self.ends.insert(index, end)
+
+    def remove(self, start: datetime, end: datetime) -> None:
+        index = bisect_left(self.starts, start)
+        if index == len(self.starts) or self.starts[index] != start or self.ends[index] != end:
+            raise ValueError("interval not in index")
+        del self.starts[index]
+        del self.ends[index]
+
+    def busy_minutes(self, days: Iterable[date], day_start: time, day_end: time) -> float:
+        """Busy time inside the day windows of `days`"""
+        total = 0.0
+        for day in days:
+            open_at, close = datetime.combine(day, day_start), datetime.combine(day, day_end)
+            index = bisect_right(self.ends, open_at)
+            while index < len(self.starts) and self.starts[index] < close:
+                total += (min(self.ends[index], close) - max(self.starts[index], open_at)).total_seconds() / 60
+                index += 1
+        return total
+
+    def next_busy(self, at: datetime) -> Optional[datetime]:
+        """Start of the first busy run ending after `at` (at itself if it is busy), or None"""
+        index = bisect_right(self.ends, at)
+        return self.starts[index] if index < len(self.starts) else None
+
+
+def _align(at: datetime, step_minutes: int) -> datetime:
+    """Round up to the next step boundary counted from midnight"""
+    minutes = at.hour * 60 + at.minute + (1 if at.second or at.microsecond else 0)
+    aligned = -(-minutes // step_minutes) * step_minutes
+    return datetime.combine(at.date(), time.min) + timedelta(minutes=aligned)
+
+
+def room_free_slots(
+    room_busy: IntervalIndex,
+    surgeon_busy: IntervalIndex,
+    days: Iterable[date],
+    duration_minutes: int,
+    turnover_minutes: int = 0,
+    day_start: time = DEFAULT_DAY_START,
+    day_end: time = DEFAULT_DAY_END,
+    step_minutes: int = 15,
+    not_before: Optional[datetime] = None
+) -> Iterator[Tuple[datetime, datetime]]:
+    """
+    Yield (start, free_until) for the earliest feasible start in each free gap
+    of one room, in time order: the room is clear for duration + turnover (the
+    booking's or_slot), the surgeon for the duration, and the surgery ends by
+    day_end. free_until is when the room's next booking starts (or day_end).
+    """
+    duration = timedelta(minutes=duration_minutes)
+    room_need = timedelta(minutes=duration_minutes + turnover_minutes)
+    for day in days:
+        close = datetime.combine(day, day_end)
+        at = datetime.combine(day, day_start)
+        if not_before and not_before > at:
+            at = not_before
+        while True:
+            at = _align(at, step_minutes)
+            free_at = room_busy.next_free(at, room_need)
+            if free_at == at:
+                free_at = surgeon_busy.next_free(at, duration)
+            if free_at != at:
+                at = free_at
+                continue
+            if at + duration > close:
+                break
+            next_busy = room_busy.next_busy(at)
+            yield at, min(next_busy, close) if next_busy else close
+            if next_busy is None or next_busy >= close:
+                break
+            at = next_busy
@@ -0,0 +1,337 @@
+"""
+Background transcription pipeline
+
+Stopping a recording enqueues a job instead of transcribing in the request:
+the transcription row moves to 'processing' and is the job (see
+migrations/transcription_jobs.sql). Every app worker runs a TranscriptionWorker
+that claims due jobs with FOR UPDATE SKIP LOCKED under a lease and runs the ASR
+engine in a process pool of TRANSCRIPTION_WORKERS processes, so a long
+recording never holds an HTTP worker or the event loop.
+
+- Success sets the text, confidence and duration, 'completed' and completed_at.
+- A failure is retried with exponential backoff (TRANSCRIPTION_RETRY_BASE_SECONDS,
+  doubling) up to TRANSCRIPTION_MAX_ATTEMPTS, then set 'failed' with completed_at
+  and last_error. A missing audio file fails at once.
+- A worker that dies mid-job leaves its lease to expire; the job is then
+  claimed again (or failed, if it has no attempts left).
+- A job over TRANSCRIPTION_JOB_TIMEOUT_SECONDS is recorded as a failed attempt,
+  but a process cannot be interrupted, so its slot stays busy until the engine
+  call actually returns. A pool broken by a dead child is shut down and
+  replaced.
+- Backpressure: no worker claims more jobs than it has free processes, and
+  enqueueing is refused (503) once TRANSCRIPTION_MAX_QUEUED jobs are waiting.
+
+ASR_ENGINE names the engine as "module:function"; the function takes the audio
+file path (or None when no audio was uploaded) and returns a dict with text,
+confidence and duration_seconds. The default is stub_transcribe, which needs no
+model or network so the pipeline can run offline.
+"""
+import asyncio
+import importlib
+import logging
+import os
+import random
+import time
+import wave
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Dict, Optional, Set
+
+from app.db import async_connection
+
+logger = logging.getLogger(__name__)
+
+ASR_ENGINE = os.getenv("ASR_ENGINE", "app.transcription:stub_transcribe")
+TRANSCRIPTION_WORKERS = int(os.getenv("TRANSCRIPTION_WORKERS", "2"))
+TRANSCRIPTION_MAX_QUEUED = int(os.getenv("TRANSCRIPTION_MAX_QUEUED", "200"))
+TRANSCRIPTION_MAX_ATTEMPTS = int(os.getenv("TRANSCRIPTION_MAX_ATTEMPTS", "3"))
+TRANSCRIPTION_RETRY_BASE_SECONDS = float(os.getenv("TRANSCRIPTION_RETRY_BASE_SECONDS", "30"))
+TRANSCRIPTION_JOB_TIMEOUT_SECONDS = float(os.getenv("TRANSCRIPTION_JOB_TIMEOUT_SECONDS", "1800"))
+TRANSCRIPTION_POLL_SECONDS = float(os.getenv("TRANSCRIPTION_POLL_SECONDS", "5"))
+
+# The lease outlives the job timeout so only a dead worker's jobs are re-claimed
+LEASE_SECONDS = TRANSCRIPTION_JOB_TIMEOUT_SECONDS + 60
+
+# Stub engine: seconds of work per second of audio, and a failure rate for trying out retries
+STUB_REALTIME_FACTOR = float(os.getenv("TRANSCRIPTION_STUB_REALTIME_FACTOR", "0"))
+STUB_FAILURE_RATE = float(os.getenv("TRANSCRIPTION_STUB_FAILURE_RATE", "0"))
+STUB_BYTES_PER_SECOND = 16000  # compressed formats: assume ~128 kbit/s
+
+STUB_TEXT = """Patient presents with cardiac related issue and possible concerns.
+Patient reports chest discomfort and shortness of breath during physical activity.
+Vital signs show elevated blood pressure at 145/95. Heart rate is 88 bpm.
+Recommend ECG and blood pressure measurement. Consider stress test if symptoms persist.
+Patient has history of hypertension, currently on medication.
+Follow-up appointment scheduled in two weeks."""
+
+QUEUE_DEPTH_QUERY = """
+    SELECT COUNT(*) FROM transcriptions
+    WHERE transcription_status = 'processing' AND claimed_until IS NULL
+"""
+
+# A recording dictated live already has its text (app.live_transcription): stopping it completes it
+FINISH_LIVE_TRANSCRIPTION = """
+    UPDATE transcriptions
+    SET transcription_status = 'completed',
+        completed_at = NOW()
+    WHERE id = %s AND doctor_id = %s AND transcription_status = 'recording' AND transcription_text IS NOT NULL
+    RETURNING id, transcription_status
+"""
+
+# 'failed' can be stopped again to retry by hand
+ENQUEUE_TRANSCRIPTION = """
+    UPDATE transcriptions
+    SET transcription_status = 'processing',
+        attempts = 0,
+        next_attempt_at = NOW(),
+        claimed_until = NULL,
+        started_at = NULL,
+        completed_at = NULL,
+        last_error = NULL
+    WHERE id = %s AND doctor_id = %s AND transcription_status IN ('recording', 'failed')
+    RETURNING id, transcription_status
+"""
+
+EXPIRE_ABANDONED_JOBS = """
+    UPDATE transcriptions
+    SET transcription_status = 'failed',
+        completed_at = NOW(),
+        claimed_until = NULL,
+        last_error = 'Transcription worker stopped before finishing'
+    WHERE transcription_status = 'processing' AND claimed_until < NOW() AND attempts >= %s
+"""
+
+CLAIM_JOBS = """
+    UPDATE transcriptions t
+    SET attempts = t.attempts + 1,
+        claimed_until = NOW() + make_interval(secs => %(lease)s),
+        started_at = NOW()
+    FROM (
+        SELECT id FROM transcriptions
+        WHERE transcription_status = 'processing'
+          AND next_attempt_at <= NOW()
+          AND (claimed_until IS NULL OR claimed_until < NOW())
+        ORDER BY next_attempt_at
+        LIMIT %(limit)s
+        FOR UPDATE SKIP LOCKED
+    ) due
+    WHERE t.id = due.id
+    RETURNING t.id, t.audio_file_url, t.attempts
+"""
+
+# Result writes are guarded by attempts: a job whose lease expired and was
+# claimed again no longer accepts the stale attempt's outcome.
+COMPLETE_JOB = """
+    UPDATE transcriptions
+    SET transcription_text = %s,
+        confidence_score = %s,
+        recording_duration_seconds = COALESCE(%s, recording_duration_seconds),
+        transcription_status = 'completed',
+        completed_at = NOW(),
+        claimed_until = NULL,
+        last_error = NULL
+    WHERE id = %s AND transcription_status = 'processing' AND attempts = %s
+"""
+
+RETRY_JOB = """
+    UPDATE transcriptions
+    SET claimed_until = NULL,
+        next_attempt_at = NOW() + make_interval(secs => %s),
+        last_error = %s
+    WHERE id = %s AND transcription_status = 'processing' AND attempts = %s
+"""
+
+FAIL_JOB = """
+    UPDATE transcriptions
+    SET transcription_status = 'failed',
+        completed_at = NOW(),
+        claimed_until = NULL,
+        last_error = %s
+    WHERE id = %s AND transcription_status = 'processing' AND attempts = %s
+"""
+
+# Jobs interrupted by a shutdown go back to the queue without using up an attempt
+RELEASE_JOBS = """
+    UPDATE transcriptions
+    SET claimed_until = NULL,
+        attempts = GREATEST(attempts - 1, 0)
+    WHERE id = ANY(%s::uuid[]) AND transcription_status = 'processing'
+"""
+
+
+def stub_transcribe(audio_path: Optional[str]) -> Dict[str, Any]:
+    """Offline stand-in for an ASR engine: canned text, duration from the file"""
+    duration = 0
+    if audio_path is not None:
+        if audio_path.endswith(".wav"):
+            with wave.open(audio_path, "rb") as audio:
+                duration = round(audio.getnframes() / audio.getframerate())
+        else:
+            duration = round(os.path.getsize(audio_path) / STUB_BYTES_PER_SECOND)
+    if STUB_REALTIME_FACTOR:
+        time.sleep(duration * STUB_REALTIME_FACTOR)
+    if random.random() < STUB_FAILURE_RATE:
+        raise RuntimeError("Stub ASR engine failure")
+    return {"text": STUB_TEXT, "confidence": 95.5, "duration_seconds": duration}
+
+
+def run_asr(engine: str, audio_path: Optional[str]) -> Dict[str, Any]:
+    """Process-pool entry point: load the engine by name and transcribe"""
+    module, _, name = engine.partition(":")
+    return getattr(importlib.import_module(module), name)(audio_path)
+
+
+class TranscriptionWorker:
+    def __init__(self, workers: int = TRANSCRIPTION_WORKERS, engine: str = ASR_ENGINE):
+        self.workers = workers
+        self.engine = engine
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._running: Dict[str, asyncio.Task] = {}
+        self._overrunning: Set[asyncio.Future] = set()  # timed out, process still busy
+        self._dispatches: Set[asyncio.Task] = set()  # started by notify(); held so they are not collected
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._lock: Optional[asyncio.Lock] = None
+        self.completed = 0
+        self.failed = 0
+        self.retried = 0
+        self.rejected = 0
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(max_workers=self.workers)
+        return self._executor
+
+    def notify(self) -> None:
+        """A job was enqueued: claim it now instead of at the next poll (safe from any thread)"""
+        loop = self._loop
+        if loop is None or loop.is_closed():
+            return
+        try:
+            loop.call_soon_threadsafe(self._start_dispatch)
+        except RuntimeError:
+            pass  # loop shutting down
+
+    def _start_dispatch(self) -> None:
+        task = asyncio.get_running_loop().create_task(self.dispatch())
+        self._dispatches.add(task)
+        task.add_done_callback(self._dispatch_done)
+
+    def _dispatch_done(self, task: asyncio.Task) -> None:
+        self._dispatches.discard(task)
+        if not task.cancelled() and task.exception() is not None:
+            # The next poll tries again
+            logger.error("Dispatching transcription jobs failed", exc_info=task.exception())
+
+    async def dispatch(self) -> int:
+        """Claim as many due jobs as there are free processes and start them; returns how many"""
+        self._loop = asyncio.get_running_loop()
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        async with self._lock:
+            free = self.workers - len(self._running) - len(self._overrunning)
+            async with async_connection() as conn:
+                async with conn.cursor() as cur:
+                    await cur.execute(EXPIRE_ABANDONED_JOBS, (TRANSCRIPTION_MAX_ATTEMPTS,))
+                    self.failed += max(cur.rowcount, 0)
+                    if free <= 0:
+                        return 0
+                    await cur.execute(CLAIM_JOBS, {"lease": LEASE_SECONDS, "limit": free})
+                    jobs = await cur.fetchall()
+            for transcription_id, audio_file_url, attempts in jobs:
+                job_id = str(transcription_id)
+                task = asyncio.create_task(self._run(job_id, audio_file_url, attempts), name=f"transcription:{job_id}")
+                self._running[job_id] = task
+                task.add_done_callback(lambda _, job_id=job_id: self._running.pop(job_id, None))
+            return len(jobs)
+
+    def _overran(self, future: asyncio.Future) -> None:
+        """Keep the timed-out job's process counted until it really finishes"""
+        self._overrunning.add(future)
+
+        def release(done: asyncio.Future):
+            if not done.cancelled():
+                done.exception()  # retrieved: the outcome was already recorded as a timeout
+            self._overrunning.discard(future)
+            self.notify()
+        future.add_done_callback(release)
+
+    def _replace_executor(self, executor: ProcessPoolExecutor) -> None:
+        if self._executor is executor:
+            self._executor = None  # a child died; start a fresh pool for the next job
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    async def _run(self, transcription_id: str, audio_file_url: Optional[str], attempts: int) -> None:
+        loop = asyncio.get_running_loop()
+        executor = self._get_executor()
+        future = loop.run_in_executor(executor, run_asr, self.engine, audio_file_url)
+        try:
+            # shield: on timeout the process keeps running; only the wait ends
+            result = await asyncio.wait_for(asyncio.shield(future), TRANSCRIPTION_JOB_TIMEOUT_SECONDS)
+        except asyncio.CancelledError:
+            raise  # shutting down: shutdown() releases the job
+        except Exception as e:
+            if isinstance(e, asyncio.TimeoutError):
+                self._overran(future)
+            elif isinstance(e, BrokenProcessPool):
+                self._replace_executor(executor)
+            error = f"{type(e).__name__}: {e}"[:500]
+            logger.warning("Transcription %s attempt %d failed: %s", transcription_id, attempts, error)
+            await self._record_failure(transcription_id, attempts, error, retry=not isinstance(e, FileNotFoundError))
+        else:
+            await self._write(COMPLETE_JOB, (
+                result["text"], result.get("confidence"), result.get("duration_seconds"), transcription_id, attempts
+            ))
+            self.completed += 1
+        self.notify()  # a process is free again
+
+    async def _record_failure(self, transcription_id: str, attempts: int, error: str, retry: bool) -> None:
+        if retry and attempts < TRANSCRIPTION_MAX_ATTEMPTS:
+            delay = TRANSCRIPTION_RETRY_BASE_SECONDS * 2 ** (attempts - 1)
+            await self._write(RETRY_JOB, (delay, error, transcription_id, attempts))
+            self.retried += 1
+        else:
+            await self._write(FAIL_JOB, (error, transcription_id, attempts))
+            self.failed += 1
+
+    async def _write(self, query: str, params: tuple) -> None:
+        try:
+            async with async_connection() as conn:
+                async with conn.cursor() as cur:
+                    await cur.execute(query, params)
+        except Exception:
+            # The lease runs out and the job is claimed again
+            logger.exception("Recording the transcription job outcome failed")
+
+    async def shutdown(self) -> None:
+        # No new claims: a dispatch finishing after the release below would strand its jobs
+        dispatches = list(self._dispatches)
+        for task in dispatches:
+            task.cancel()
+        await asyncio.gather(*dispatches, return_exceptions=True)
+        job_ids = list(self._running)
+        tasks = list(self._running.values())
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        if job_ids:
+            await self._write(RELEASE_JOBS, (job_ids,))
+        self._overrunning.clear()
+        executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    def stats(self) -> dict:
+        return {
+            "engine": self.engine,
+            "workers": self.workers,
+            "running": len(self._running),
+            "overrunning": len(self._overrunning),
+            "max_queued": TRANSCRIPTION_MAX_QUEUED,
+            "completed": self.completed,
+            "retried": self.retried,
+            "failed": self.failed,
+            "rejected": self.rejected
+        }
+
+
+transcription_worker = TranscriptionWorker()
@@ -0,0 +1,193 @@
+"""
+Chunked, resumable recording uploads
+
+Audio for a transcription is uploaded as raw chunks appended at an explicit
+offset to RECORDINGS_DIR/<transcription_id>.part, then finalized (whole-file
+checksum, renamed to <transcription_id>.<format>). The file on disk is the
+upload state: its size is the committed offset, so a client that lost its
+connection asks for the offset and resumes from there, on any worker that
+shares the directory.
+
+Each chunk is streamed from the request body straight to the file in
+CHUNK_WRITE_BYTES-sized writes (never held whole in memory) while its SHA-256
+is computed. A chunk that fails its checksum, exceeds the limits or is cut off
+by a dropped connection is truncated away, so the offset only ever moves by
+whole, verified chunks. An exclusive flock serialises writers of one upload.
+If recording the finalized file in the database fails, restore_upload renames
+it back so the file never exists under its final name without a row pointing
+at it.
+"""
+import asyncio
+import fcntl
+import hashlib
+import os
+import uuid
+from typing import AsyncIterator, Optional, Tuple
+
+RECORDINGS_DIR = os.getenv("RECORDINGS_DIR", "recordings")
+MAX_CHUNK_BYTES = int(os.getenv("RECORDING_MAX_CHUNK_BYTES", str(8 * 1024 * 1024)))
+MAX_RECORDING_BYTES = int(os.getenv("RECORDING_MAX_BYTES", str(512 * 1024 * 1024)))
+CHUNK_WRITE_BYTES = 256 * 1024
+AUDIO_FORMATS = ("wav", "webm", "ogg", "m4a", "mp3")
+
+
+class UploadConflict(Exception):
+    """The chunk's offset is not the upload's current offset (or another chunk is being written)"""
+
+    def __init__(self, message: str, offset: int):
+        super().__init__(message)
+        self.offset = offset
+
+
+class UploadTooLarge(Exception):
+    pass
+
+
+class ChecksumMismatch(Exception):
+    pass
+
+
+def _upload_id(transcription_id: str) -> str:
+    """Canonical UUID string; also keeps path components out of file names"""
+    return str(uuid.UUID(transcription_id))
+
+
+def part_path(transcription_id: str) -> str:
+    return os.path.join(RECORDINGS_DIR, f"{_upload_id(transcription_id)}.part")
+
+
+def audio_path(transcription_id: str, audio_format: str) -> str:
+    if audio_format not in AUDIO_FORMATS:
+        raise ValueError(f"audio_format must be one of {', '.join(AUDIO_FORMATS)}")
+    return os.path.join(RECORDINGS_DIR, f"{_upload_id(transcription_id)}.{audio_format}")
+
+
+def upload_offset(transcription_id: str) -> int:
+    """Bytes committed so far (0 if nothing has been uploaded)"""
+    try:
+        return os.path.getsize(part_path(transcription_id))
+    except FileNotFoundError:
+        return 0
+
+
+def _open_locked(path: str):
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    f = open(path, "ab")
+    try:
+        fcntl.flock(f.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except BlockingIOError:
+        size = os.fstat(f.fileno()).st_size
+        f.close()
+        raise UploadConflict("Another chunk of this upload is being written", size)
+    return f
+
+
+def _close(f) -> None:
+    fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+    f.close()
+
+
+def _write_all(f, pieces: list) -> None:
+    for piece in pieces:
+        f.write(piece)
+
+
+def _commit(f) -> None:
+    f.flush()
+    os.fsync(f.fileno())
+
+
+def _rewind(f, size: int) -> None:
+    f.flush()
+    f.truncate(size)
+
+
+async def append_chunk(
+    transcription_id: str,
+    offset: int,
+    body: AsyncIterator[bytes],
+    sha256: Optional[str] = None
+) -> int:
+    """
+    Append the streamed chunk at `offset` (must equal the current offset) and
+    return the new offset. Raises UploadConflict, UploadTooLarge or
+    ChecksumMismatch; on any failure the file is left at `offset`.
+    """
+    f = await asyncio.to_thread(_open_locked, part_path(transcription_id))
+    try:
+        current = os.fstat(f.fileno()).st_size
+        if offset != current:
+            raise UploadConflict(f"Upload is at offset {current}, not {offset}", current)
+        digest = hashlib.sha256()
+        written = 0
+        pending, pending_bytes = [], 0
+        try:
+            async for piece in body:
+                written += len(piece)
+                if written > MAX_CHUNK_BYTES:
+                    raise UploadTooLarge(f"Chunks cannot exceed {MAX_CHUNK_BYTES} bytes")
+                if current + written > MAX_RECORDING_BYTES:
+                    raise UploadTooLarge(f"Recordings cannot exceed {MAX_RECORDING_BYTES} bytes")
+                digest.update(piece)
+                pending.append(piece)
+                pending_bytes += len(piece)
+                if pending_bytes >= CHUNK_WRITE_BYTES:
+                    await asyncio.to_thread(_write_all, f, pending)
+                    pending, pending_bytes = [], 0
+            await asyncio.to_thread(_write_all, f, pending)
+            if sha256 and digest.hexdigest() != sha256.lower():
+                raise ChecksumMismatch("Chunk SHA-256 does not match its content")
+            await asyncio.to_thread(_commit, f)
+        except BaseException:
+            # Includes the client disconnecting mid-chunk and task cancellation
+            await asyncio.shield(asyncio.to_thread(_rewind, f, current))
+            raise
+        return current + written
+    finally:
+        await asyncio.to_thread(_close, f)
+
+
+def _finalize(transcription_id: str, audio_format: str, sha256: Optional[str]) -> Tuple[str, int, str]:
+    source, target = part_path(transcription_id), audio_path(transcription_id, audio_format)
+    if not os.path.exists(source):
+        raise FileNotFoundError("Nothing has been uploaded for this transcription")
+    f = _open_locked(source)
+    try:
+        size = os.fstat(f.fileno()).st_size
+        digest = hashlib.sha256()
+        with open(source, "rb") as reader:
+            for block in iter(lambda: reader.read(1024 * 1024), b""):
+                digest.update(block)
+        if sha256 and digest.hexdigest() != sha256.lower():
+            raise ChecksumMismatch("Recording SHA-256 does not match the uploaded bytes")
+        os.replace(source, target)
+    finally:
+        _close(f)
+    return target, size, digest.hexdigest()
+
+
+async def finalize_upload(transcription_id: str, audio_format: str, sha256: Optional[str] = None) -> Tuple[str, int, str]:
+    """
+    Check the whole file against sha256 (if given) and move it to its final
+    name; returns (path, size in bytes, sha256 hex). Raises FileNotFoundError,
+    UploadConflict or ChecksumMismatch.
+    """
+    return await asyncio.to_thread(_finalize, transcription_id, audio_format, sha256)
+
+
+def _restore(transcription_id: str, audio_format: str) -> None:
+    os.replace(audio_path(transcription_id, audio_format), part_path(transcription_id))
+
+
+async def restore_upload(transcription_id: str, audio_format: str) -> None:
+    """Undo finalize_upload: move the audio back to its .part so the upload can be completed again"""
+    await asyncio.to_thread(_restore, transcription_id, audio_format)
+
+
+def discard_upload(transcription_id: str) -> None:
+    """Remove the partial and any finalized audio for a transcription"""
+    for path in [part_path(transcription_id)] + [audio_path(transcription_id, fmt) for fmt in AUDIO_FORMATS]:
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
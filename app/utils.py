@@ -1,8 +1,12 @@
 """
 Utility functions
 """
-from typing import Any, Dict, List, Optional
+from typing import Any, AsyncIterator, Callable, Dict, Iterator, List, Optional, Tuple
 from datetime import datetime, date, time
+from decimal import Decimal
+from fastapi.responses import StreamingResponse
+import base64
+import hashlib
 import json
 
 def format_date(d: date) -> str:
@@ -33,6 +37,33 @@ def build_query_filters(base_query: str, filters: Dict[str, Any]) -> tuple:
 def paginate(query: str, limit: int = 100, offset: int = 0) -> str:
     return f"{query} LIMIT {limit} OFFSET {offset}"
 
+def encode_cursor(created_at: Optional[datetime], row_id: Any) -> str:
+    """Opaque keyset cursor for the (created_at, id) position of the last row on a page"""
+    raw = json.dumps([created_at.isoformat() if created_at is not None else None, str(row_id)], separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+def decode_cursor(cursor: str) -> Tuple[Optional[datetime], str]:
+    """Inverse of encode_cursor; raises ValueError for a malformed or tampered cursor"""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        created_at, row_id = json.loads(raw)
+        return datetime.fromisoformat(created_at) if created_at is not None else None, str(row_id)
+    except Exception:
+        raise ValueError("Invalid cursor")
+
+def keyset_after(created_column: str, id_column: str, after: Tuple[Optional[datetime], str]) -> Tuple[str, list]:
+    """
+    WHERE condition (and params) for the rows after a decoded cursor in
+    ORDER BY created DESC, id DESC order. DESC sorts NULL created_at first, so
+    after a NULL position come the remaining NULL rows and then every dated
+    one; after a dated position the row comparison already skips NULLs.
+    """
+    created_at, row_id = after
+    if created_at is None:
+        return (f"(({created_column} IS NULL AND {id_column} < %s::uuid) OR {created_column} IS NOT NULL)",
+                [row_id])
+    return f"({created_column}, {id_column}) < (%s::timestamp, %s::uuid)", [created_at, row_id]
+
 def parse_json_field(value: Any) -> Any:
     if value is None:
         return None
@@ -54,3 +85,108 @@ def error_response(message: str, details: Any = None) -> dict:
     if details is not None:
         response["details"] = details
     return response
+
+def escape_like(value: str) -> str:
+    """Escape LIKE/ILIKE wildcards so user input matches literally (default escape char is \\)"""
+    return value.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+# ============================================
+# STREAMING RESPONSES
+# ============================================
+
+# Rows pulled from a server-side cursor per round trip (and per response chunk)
+STREAM_BATCH_SIZE = 500
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
+
+def wants_ndjson(accept: Optional[str]) -> bool:
+    return bool(accept) and NDJSON_MEDIA_TYPE in accept
+
+def _json_default(value: Any) -> Any:
+    # Same shapes FastAPI's encoder produces for these types
+    if isinstance(value, (datetime, date, time)):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return float(value)
+    return str(value)
+
+def _encode_batch(rows, row_to_dict: Callable, ndjson: bool, first: bool) -> bytes:
+    items = [json.dumps(row_to_dict(row), default=_json_default) for row in rows]
+    if ndjson:
+        return ("\n".join(items) + "\n").encode()
+    return (("" if first else ",") + ",".join(items)).encode()
+
+def _iter_cursor_json(cur, row_to_dict: Callable, ndjson: bool, batch_size: int) -> Iterator[bytes]:
+    try:
+        if not ndjson:
+            yield b"["
+        first = True
+        while True:
+            rows = cur.fetchmany(batch_size)
+            if not rows:
+                break
+            yield _encode_batch(rows, row_to_dict, ndjson, first)
+            first = False
+        if not ndjson:
+            yield b"]"
+    finally:
+        cur.close()
+
+async def _aiter_cursor_json(cur, row_to_dict: Callable, ndjson: bool, batch_size: int) -> AsyncIterator[bytes]:
+    try:
+        if not ndjson:
+            yield b"["
+        first = True
+        while True:
+            rows = await cur.fetchmany(batch_size)
+            if not rows:
+                break
+            yield _encode_batch(rows, row_to_dict, ndjson, first)
+            first = False
+        if not ndjson:
+            yield b"]"
+    finally:
+        await cur.close()
+
+def stream_cursor(cur, row_to_dict: Callable, ndjson: bool = False, batch_size: int = STREAM_BATCH_SIZE) -> StreamingResponse:
+    """
+    Stream an executed (named, server-side) psycopg2 cursor as a JSON array or NDJSON.
+    Rows are fetched batch_size at a time, so memory stays flat however many rows
+    match. The response closes the cursor; the caller must not.
+    """
+    return StreamingResponse(
+        _iter_cursor_json(cur, row_to_dict, ndjson, batch_size),
+        media_type=NDJSON_MEDIA_TYPE if ndjson else "application/json"
+    )
+
+def stream_cursor_async(cur, row_to_dict: Callable, ndjson: bool = False, batch_size: int = STREAM_BATCH_SIZE) -> StreamingResponse:
+    """Async counterpart of stream_cursor for psycopg 3 server-side cursors"""
+    return StreamingResponse(
+        _aiter_cursor_json(cur, row_to_dict, ndjson, batch_size),
+        media_type=NDJSON_MEDIA_TYPE if ndjson else "application/json"
+    )
+
+# ============================================
+# CONDITIONAL REQUESTS AND SERVER-SENT EVENTS
+# ============================================
+
+SSE_MEDIA_TYPE = "text/event-stream"
+
+def json_etag(body: Any) -> str:
+    """Weak ETag over the JSON encoding of a response body"""
+    encoded = json.dumps(body, default=_json_default, sort_keys=True, separators=(",", ":"))
+    return 'W/"' + hashlib.sha1(encoded.encode()).hexdigest() + '"'
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    if not if_none_match:
+        return False
+    candidates = [tag.strip() for tag in if_none_match.split(",")]
+    return "*" in candidates or etag in candidates or etag[2:] in candidates
+
+def sse_event(event: str, data: Any, event_id: Optional[Any] = None) -> bytes:
+    """One server-sent event with a JSON data line"""
+    lines = []
+    if event_id is not None:
+        lines.append(f"id: {event_id}")
+    lines.append(f"event: {event}")
+    lines.append("data: " + json.dumps(data, default=_json_default, separators=(",", ":")))
+    return ("\n".join(lines) + "\n\n").encode()
@@ -0,0 +1,135 @@
+"""
+Benchmark: sync (threadpool + psycopg2 pool) vs async (psycopg 3 async pool) handlers
+
+Builds two minimal FastAPI apps that run the same query - the principal lookup
+every authenticated request does - one with a plain `def` handler on the sync
+pool, one with an `async def` handler on the async pool, and drives each with
+the same number of concurrent clients.
+
+Usage (from the repository root, with DB_URL set):
+    python -m benchmarks.async_vs_sync --clients 500 --requests 20000
+
+Both pools are sized by --pool-size so the comparison isolates the handler model.
+Make sure Postgres max_connections allows 2 x pool-size.
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import time
+
+import httpx
+from fastapi import Depends, FastAPI
+
+os.environ.setdefault("DB_POOL_MIN_SIZE", "10")
+
+
+def build_apps(query_sleep_ms: float):
+    from app.dependencies import get_db, get_async_db
+
+    query = "SELECT id, first_name, last_name FROM doctors LIMIT 1"
+    params = ()
+    if query_sleep_ms:
+        query = "SELECT pg_sleep(%s), id, first_name, last_name FROM doctors LIMIT 1"
+        params = (query_sleep_ms / 1000.0,)
+
+    sync_app = FastAPI()
+
+    @sync_app.get("/probe")
+    def sync_probe(conn=Depends(get_db)):
+        cur = conn.cursor()
+        cur.execute(query, params)
+        row = cur.fetchone()
+        cur.close()
+        return {"ok": row is not None}
+
+    async_app = FastAPI()
+
+    @async_app.get("/probe")
+    async def async_probe(conn=Depends(get_async_db)):
+        cur = conn.cursor()
+        await cur.execute(query, params)
+        row = await cur.fetchone()
+        await cur.close()
+        return {"ok": row is not None}
+
+    return sync_app, async_app
+
+
+async def drive(app, clients: int, total_requests: int):
+    """Fire total_requests at /probe from `clients` concurrent workers"""
+    latencies = []
+    errors = 0
+    remaining = total_requests
+    transport = httpx.ASGITransport(app=app)
+    limits = httpx.Limits(max_connections=clients, max_keepalive_connections=clients)
+
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", limits=limits, timeout=60) as client:
+        async def worker():
+            nonlocal remaining, errors
+            while remaining > 0:
+                remaining -= 1
+                started = time.perf_counter()
+                try:
+                    response = await client.get("/probe")
+                    if response.status_code != 200:
+                        errors += 1
+                except Exception:
+                    errors += 1
+                latencies.append(time.perf_counter() - started)
+
+        started = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(clients)))
+        elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    return {
+        "requests": len(latencies),
+        "errors": errors,
+        "rps": len(latencies) / elapsed,
+        "p50_ms": statistics.median(latencies) * 1000,
+        "p99_ms": latencies[int(len(latencies) * 0.99) - 1] * 1000
+    }
+
+
+async def main(args):
+    from app.db import get_pool, close_pool, get_async_pool, close_async_pool
+
+    sync_app, async_app = build_apps(args.sleep_ms)
+
+    get_pool().fill()
+    await get_async_pool()
+
+    # Warm up both paths so connection setup is not measured
+    await drive(sync_app, 20, 200)
+    await drive(async_app, 20, 200)
+
+    results = {
+        "sync (def + threadpool)": await drive(sync_app, args.clients, args.requests),
+        "async (async def)": await drive(async_app, args.clients, args.requests)
+    }
+
+    close_pool()
+    await close_async_pool()
+
+    print("=" * 70)
+    print(f"ASYNC vs SYNC - {args.clients} concurrent clients, {args.requests} requests, "
+          f"pool size {args.pool_size}, query sleep {args.sleep_ms}ms")
+    print("=" * 70)
+    print(f"{'handler':<26}{'req/s':>10}{'p50 ms':>10}{'p99 ms':>10}{'errors':>10}")
+    for name, r in results.items():
+        print(f"{name:<26}{r['rps']:>10.0f}{r['p50_ms']:>10.1f}{r['p99_ms']:>10.1f}{r['errors']:>10}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--clients", type=int, default=500)
+    parser.add_argument("--requests", type=int, default=20000)
+    parser.add_argument("--pool-size", type=int, default=100)
+    parser.add_argument("--sleep-ms", type=float, default=5.0,
+                        help="server-side pg_sleep per query to model network/IO latency")
+    args = parser.parse_args()
+
+    # Pool sizes are read from the environment when app.db is imported
+    os.environ["DB_POOL_MAX_SIZE"] = str(args.pool_size)
+    asyncio.run(main(args))
@@ -0,0 +1,74 @@
+"""
+Microbenchmark: batch OR auto-scheduler on a synthetic backlog
+
+Packs --cases random elective cases (mixed durations and urgency, --surgeons
+surgeons, some pinned to one room) into --rooms rooms over --days days, and
+reports cases placed, utilization and solve time for greedy alone and for
+greedy plus local search at a few time limits. Every solution is checked for
+room, surgeon and day-window conflicts.
+
+Usage (from the repository root; no database needed):
+    python -m benchmarks.auto_schedule_bench --cases 400 --rooms 10 --days 5
+"""
+import argparse
+import random
+from collections import defaultdict
+from datetime import date, datetime, time, timedelta
+
+from app.autoscheduler import AutoScheduler
+
+DAY_START, DAY_END = time(7), time(20)
+TURNOVER = 15
+
+
+def make_cases(count: int, rooms: list, surgeons: int):
+    return [{
+        "duration_minutes": random.choice((45, 60, 90, 120, 180, 240)),
+        "urgency_level": random.choice(("routine", "routine", "routine", "urgent", "emergency")),
+        "doctor_id": f"surgeon-{random.randrange(surgeons)}",
+        "room_ids": [random.choice(rooms)] if random.random() < 0.2 else None
+    } for _ in range(count)]
+
+
+def check(scheduler):
+    """Raise if any room or surgeon is double booked or a case leaves the day window"""
+    by_room, by_surgeon = defaultdict(list), defaultdict(list)
+    for index, (room, start) in scheduler.placement.items():
+        case = scheduler.cases[index]
+        end = start + timedelta(minutes=case["duration_minutes"])
+        assert start.time() >= DAY_START and end <= datetime.combine(start.date(), DAY_END)
+        assert not case["room_ids"] or room in case["room_ids"]
+        by_room[room].append((start, end + timedelta(minutes=TURNOVER)))
+        by_surgeon[case["doctor_id"]].append((start, end))
+    for intervals in list(by_room.values()) + list(by_surgeon.values()):
+        intervals.sort()
+        assert all(a[1] <= b[0] for a, b in zip(intervals, intervals[1:])), "conflict"
+
+
+def main(cases: int, rooms: int, days: int, surgeons: int):
+    random.seed(11)
+    room_ids = [f"room-{i:02d}" for i in range(rooms)]
+    window = [date(2030, 1, 7) + timedelta(days=offset) for offset in range(days)]
+    backlog = make_cases(cases, room_ids, surgeons)
+
+    print("=" * 70)
+    print(f"AUTO-SCHEDULE - {cases} cases, {rooms} rooms x {days} days, {surgeons} surgeons")
+    print("=" * 70)
+    print(f"{'run':<22}{'placed':>8}{'minutes':>10}{'util':>8}{'solve ms':>10}")
+    for name, limit in (("greedy only", 0.0), ("local search 0.5s", 0.5), ("local search 2s", 2.0)):
+        scheduler = AutoScheduler(backlog, {room: TURNOVER for room in room_ids}, {}, {},
+                                  window, DAY_START, DAY_END, 15)
+        summary = scheduler.solve(limit)
+        check(scheduler)
+        print(f"{name:<22}{summary['placed']:>8}{summary['scheduled_minutes']:>10}"
+              f"{summary['utilization_after']:>8.3f}{summary['solve_ms']:>10.1f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--cases", type=int, default=400)
+    parser.add_argument("--rooms", type=int, default=10)
+    parser.add_argument("--days", type=int, default=5)
+    parser.add_argument("--surgeons", type=int, default=15)
+    args = parser.parse_args()
+    main(args.cases, args.rooms, args.days, args.surgeons)
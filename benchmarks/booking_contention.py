@@ -0,0 +1,164 @@
+"""
+Benchmark: --bookings simultaneous POST /or-schedule/book calls at one room
+
+Every request is released at the same instant. Start times (07:00-18:45 on a
+15 minute grid) and durations are random, so many requests overlap each other.
+Reports how many were accepted (200) and refused (409), latency, and then checks
+in the database that no two accepted surgeries overlap once the room's
+turnover is included.
+
+Usage (against a running server, with DB_URL set and migrations applied):
+    uvicorn main:app --workers 4 &
+    python -m benchmarks.booking_contention --email doc@example.com --password secret123 \\
+        --bookings 200 --turnover 15
+    python -m benchmarks.booking_contention --cleanup
+"""
+import argparse
+import asyncio
+import random
+import statistics
+import time
+from datetime import date, timedelta
+
+import httpx
+
+from app.db import connection
+
+API = "/api/v1"
+BENCH_ROOM = "BENCH-OR"
+BENCH_PATIENT = "BENCHB000001"
+DURATIONS = (30, 60, 90, 120, 180)
+
+
+def percentile(values, pct):
+    if not values:
+        return float("nan")
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * pct / 100))]
+
+
+def seed(turnover: int):
+    """Create (or reset) the benchmark room and patient; returns their ids"""
+    with connection() as conn:
+        cur = conn.cursor()
+        cur.execute("""
+            INSERT INTO operating_rooms (room_number, room_name, turnover_minutes)
+            VALUES (%s, 'Booking benchmark', %s)
+            ON CONFLICT (room_number) DO UPDATE SET turnover_minutes = EXCLUDED.turnover_minutes
+            RETURNING id
+        """, (BENCH_ROOM, turnover))
+        room_id = str(cur.fetchone()[0])
+        cur.execute("DELETE FROM surgeries WHERE operating_room_id = %s", (room_id,))
+        cur.execute("""
+            INSERT INTO patients (patient_code, first_name, last_name)
+            VALUES (%s, 'Bench', 'Booking')
+            ON CONFLICT (patient_code) DO UPDATE SET patient_code = EXCLUDED.patient_code
+            RETURNING id
+        """, (BENCH_PATIENT,))
+        patient_id = str(cur.fetchone()[0])
+        cur.close()
+    return room_id, patient_id
+
+
+def cleanup():
+    with connection() as conn:
+        cur = conn.cursor()
+        cur.execute("""
+            DELETE FROM surgeries
+            WHERE operating_room_id = (SELECT id FROM operating_rooms WHERE room_number = %s)
+        """, (BENCH_ROOM,))
+        cur.execute("DELETE FROM operating_rooms WHERE room_number = %s", (BENCH_ROOM,))
+        cur.execute("DELETE FROM patients WHERE patient_code = %s", (BENCH_PATIENT,))
+        cur.close()
+    print("Removed benchmark room, patient and surgeries")
+
+
+def overlapping_pairs(room_id: str) -> int:
+    with connection() as conn:
+        cur = conn.cursor()
+        cur.execute("""
+            SELECT COUNT(*)
+            FROM surgeries a
+            JOIN surgeries b ON a.operating_room_id = b.operating_room_id AND a.id < b.id
+                            AND a.or_slot && b.or_slot
+            WHERE a.operating_room_id = %s
+              AND a.status NOT IN ('cancelled', 'completed') AND b.status NOT IN ('cancelled', 'completed')
+        """, (room_id,))
+        count = cur.fetchone()[0]
+        cur.close()
+    return count
+
+
+async def book(client, headers, body, release, outcomes):
+    await release.wait()
+    started = time.perf_counter()
+    response = await client.post(f"{API}/or-schedule/book", json=body, headers=headers)
+    outcomes.append((response.status_code, (time.perf_counter() - started) * 1000))
+
+
+async def main(args):
+    room_id, patient_id = seed(args.turnover)
+    day = date.today() + timedelta(days=365)
+    random.seed(args.seed)
+
+    limits = httpx.Limits(max_connections=args.bookings + 10)
+    async with httpx.AsyncClient(base_url=args.base_url, limits=limits, timeout=60) as client:
+        response = await client.post(f"{API}/auth/login", json={"email": args.email, "password": args.password})
+        response.raise_for_status()
+        token = response.json()["access_token"]
+        headers = {"Authorization": f"Bearer {token}"}
+
+        release = asyncio.Event()
+        outcomes = []
+        tasks = []
+        for i in range(args.bookings):
+            body = {
+                "operating_room_id": room_id,
+                "patient_id": patient_id,
+                "doctor_id": "",
+                "scheduled_date": day.isoformat(),
+                "scheduled_time": f"{random.randint(7, 18):02d}:{random.choice((0, 15, 30, 45)):02d}",
+                "procedure_name": f"Bench booking {i}",
+                "surgery_type": "benchmark",
+                "duration_minutes": random.choice(DURATIONS)
+            }
+            tasks.append(asyncio.create_task(book(client, headers, body, release, outcomes)))
+        await asyncio.sleep(0.5)  # let every task reach the barrier
+        started = time.perf_counter()
+        release.set()
+        await asyncio.gather(*tasks)
+        wall = time.perf_counter() - started
+
+    booked = [ms for code, ms in outcomes if code == 200]
+    refused = [ms for code, ms in outcomes if code == 409]
+    latencies = [ms for _, ms in outcomes]
+
+    print("=" * 70)
+    print(f"BOOKING CONTENTION - {args.bookings} simultaneous bookings, one room, "
+          f"turnover {args.turnover} min")
+    print("=" * 70)
+    print(f"booked 200: {len(booked)}, refused 409: {len(refused)}, "
+          f"other: {len(outcomes) - len(booked) - len(refused)}")
+    print(f"latency p50 {statistics.median(latencies):.1f}ms, p99 {percentile(latencies, 99):.1f}ms, "
+          f"max {max(latencies):.1f}ms; all done in {wall * 1000:.0f}ms")
+    pairs = overlapping_pairs(room_id)
+    print(f"overlapping booked pairs: {pairs} {'(OK)' if pairs == 0 else '(DOUBLE BOOKED)'}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--base-url", default="http://localhost:8000")
+    parser.add_argument("--email")
+    parser.add_argument("--password")
+    parser.add_argument("--bookings", type=int, default=200)
+    parser.add_argument("--turnover", type=int, default=15, help="room turnover minutes")
+    parser.add_argument("--seed", type=int, default=7, help="random seed for the booking times")
+    parser.add_argument("--cleanup", action="store_true", help="delete the fixture and exit")
+    args = parser.parse_args()
+
+    if args.cleanup:
+        cleanup()
+    else:
+        if not args.email or not args.password:
+            parser.error("--email and --password are required")
+        asyncio.run(main(args))
@@ -0,0 +1,65 @@
+"""
+Microbenchmark: OR day grid building, per-cell scan vs indexed placement
+
+The previous get_day_schedule scanned every surgery of the day for every
+(slot, room) cell. This compares that approach (extended to check duration
+overlap, so both produce the same grid) with app.scheduling.build_day_grid.
+
+Usage (from the repository root; no database needed):
+    python -m benchmarks.day_grid_bench --rooms 60 --surgeries 600
+"""
+import argparse
+import random
+import timeit
+from datetime import time
+
+from app.scheduling import SLOT_MINUTES, build_day_grid, minutes_of
+
+
+def scan_grid(room_numbers, surgeries, slot_minutes, day_start=time(7), day_end=time(20)):
+    """Per-cell linear scan (the old loop shape, with overlap instead of exact-start matching)"""
+    start, end = minutes_of(day_start), minutes_of(day_end)
+    slots = []
+    for slot_start in range(start, end, slot_minutes):
+        slot_end = slot_start + slot_minutes
+        or_rooms = {}
+        for room in room_numbers:
+            cell = None
+            for surgery in surgeries:
+                s_start = minutes_of(surgery["start"])
+                if surgery["room_number"] == room and s_start < slot_end and s_start + surgery["duration_minutes"] > slot_start:
+                    cell = surgery["payload"]
+                    break
+            or_rooms[f"or_{room}"] = cell or {"status": "available"}
+        slots.append(or_rooms)
+    return slots
+
+
+def main(rooms: int, surgery_count: int, number: int):
+    random.seed(7)
+    room_numbers = [f"{i:02d}" for i in range(1, rooms + 1)]
+    surgeries = [{
+        "room_number": random.choice(room_numbers),
+        "start": time(random.randint(7, 18), random.choice((0, 15, 30, 45))),
+        "duration_minutes": random.choice((30, 45, 60, 90, 120, 240)),
+        "payload": {"status": "occupied", "surgery_id": str(i)}
+    } for i in range(surgery_count)]
+
+    print("=" * 70)
+    print(f"DAY GRID - {rooms} rooms, {surgery_count} surgeries, 07:00-20:00")
+    print("=" * 70)
+    print(f"{'slot':>6}{'cells':>8}{'scan ms':>12}{'indexed ms':>12}{'speedup':>10}")
+    for slot_minutes in sorted(SLOT_MINUTES, reverse=True):
+        scan = min(timeit.repeat(lambda: scan_grid(room_numbers, surgeries, slot_minutes), number=number, repeat=3)) / number
+        indexed = min(timeit.repeat(lambda: build_day_grid(room_numbers, surgeries, slot_minutes), number=number, repeat=3)) / number
+        cells = rooms * (13 * 60 // slot_minutes)
+        print(f"{slot_minutes:>4}m{cells:>9}{scan * 1000:>12.2f}{indexed * 1000:>12.2f}{scan / indexed:>9.1f}x")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rooms", type=int, default=60)
+    parser.add_argument("--surgeries", type=int, default=600)
+    parser.add_argument("--number", type=int, default=3)
+    args = parser.parse_args()
+    main(args.rooms, args.surgeries, args.number)
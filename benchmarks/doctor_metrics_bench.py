@@ -0,0 +1,133 @@
+"""
+Benchmark: GET /dashboard/doctor-metrics, five queries vs one aggregate
+
+Fixture: a doctor with --notes notes (default 100k) spread over the last year,
+some of them today, across a few hundred patients. Times the previous
+implementation (five sequential queries, DATE(created_at) filters) against the
+single FILTER aggregate the endpoint now runs.
+
+Usage (from the repository root, with DB_URL set and migrations applied):
+    python -m benchmarks.doctor_metrics_bench --seed
+    python -m benchmarks.doctor_metrics_bench --repeat 50
+    python -m benchmarks.doctor_metrics_bench --cleanup
+"""
+import argparse
+import statistics
+import time
+from datetime import date, timedelta
+
+from app.db import connection
+from app.routes.dashboard import DOCTOR_METRICS_QUERY, doctor_metrics_params
+
+BENCH_EMAIL = "doctor-metrics-bench@example.com"
+BENCH_PATIENTS = 300
+
+
+def seed(notes: int):
+    with connection() as conn:
+        cur = conn.cursor()
+        cur.execute("""
+            INSERT INTO doctors (first_name, last_name, email, specialization)
+            VALUES ('Bench', 'Metrics', %s, 'Surgery')
+            ON CONFLICT (email) DO UPDATE SET email = EXCLUDED.email
+            RETURNING id
+        """, (BENCH_EMAIL,))
+        doctor_id = cur.fetchone()[0]
+        cur.execute("""
+            INSERT INTO patients (patient_code, first_name, last_name)
+            SELECT 'BENCHM' || lpad(i::text, 6, '0'), 'Bench', 'Patient' || i
+            FROM generate_series(1, %s) AS i
+            ON CONFLICT (patient_code) DO NOTHING
+        """, (BENCH_PATIENTS,))
+        # ~1% of notes land today, the rest spread over the past year
+        cur.execute("""
+            INSERT INTO notes (patient_id, doctor_id, note_type, note_context, title, content, created_at)
+            SELECT p.id, %s, 'patient_note', 'rounds', 'Bench note ' || i, 'Synthetic note body',
+                   CASE WHEN i %% 100 = 0 THEN date_trunc('day', NOW()) + (i %% 36000) * interval '1 second'
+                        ELSE NOW() - (i %% 365) * interval '1 day' - (i %% 86400) * interval '1 second' END
+            FROM generate_series(1, %s) AS i
+            JOIN patients p ON p.patient_code = 'BENCHM' || lpad((1 + i %% %s)::text, 6, '0')
+        """, (doctor_id, notes, BENCH_PATIENTS))
+        cur.execute("ANALYZE notes")
+        cur.close()
+    print(f"Seeded doctor {doctor_id} with {notes} notes")
+
+
+def cleanup():
+    with connection() as conn:
+        cur = conn.cursor()
+        cur.execute("DELETE FROM notes WHERE doctor_id = (SELECT id FROM doctors WHERE email = %s)", (BENCH_EMAIL,))
+        cur.execute("DELETE FROM patients WHERE patient_code LIKE 'BENCHM%%'")
+        cur.execute("DELETE FROM doctors WHERE email = %s", (BENCH_EMAIL,))
+        cur.close()
+    print("Removed benchmark doctor, patients and notes")
+
+
+def before(cur, doctor_id, today):
+    """The previous implementation, verbatim"""
+    week_ago = today - timedelta(days=7)
+    cur.execute("SELECT COUNT(*) FROM notes WHERE doctor_id = %s AND DATE(created_at) = %s", (doctor_id, today))
+    notes_today = cur.fetchone()[0]
+    cur.execute("SELECT COUNT(*) FROM notes WHERE doctor_id = %s AND DATE(created_at) >= %s", (doctor_id, week_ago))
+    notes_week = cur.fetchone()[0]
+    cur.execute("SELECT COUNT(DISTINCT patient_id) FROM notes WHERE doctor_id = %s AND DATE(created_at) = %s",
+                (doctor_id, today))
+    patients_today = cur.fetchone()[0]
+    cur.execute("SELECT COUNT(*) FROM surgeries WHERE doctor_id = %s AND scheduled_date >= %s AND status = 'scheduled'",
+                (doctor_id, today))
+    upcoming = cur.fetchone()[0]
+    cur.execute("SELECT COUNT(*) FROM transcriptions WHERE doctor_id = %s", (doctor_id,))
+    recordings = cur.fetchone()[0]
+    return notes_today, notes_week, patients_today, upcoming, recordings
+
+
+def after(cur, doctor_id, today):
+    cur.execute(DOCTOR_METRICS_QUERY, doctor_metrics_params(doctor_id, today))
+    return cur.fetchone()
+
+
+def run(repeat: int):
+    today = date.today()
+    with connection() as conn:
+        cur = conn.cursor()
+        cur.execute("SELECT id FROM doctors WHERE email = %s", (BENCH_EMAIL,))
+        row = cur.fetchone()
+        if not row:
+            raise SystemExit("No benchmark doctor; run with --seed first")
+        doctor_id = str(row[0])
+
+        results = {}
+        for name, fn in (("five queries (before)", before), ("one aggregate (after)", after)):
+            output = fn(cur, doctor_id, today)  # warm up
+            timings = []
+            for _ in range(repeat):
+                started = time.perf_counter()
+                fn(cur, doctor_id, today)
+                timings.append((time.perf_counter() - started) * 1000)
+            timings.sort()
+            results[name] = (output, timings)
+        cur.close()
+
+    print("=" * 70)
+    print(f"DOCTOR METRICS - {repeat} runs")
+    print("=" * 70)
+    print(f"{'implementation':<26}{'p50 ms':>10}{'p99 ms':>10}  result")
+    for name, (output, timings) in results.items():
+        p99 = timings[min(len(timings) - 1, int(len(timings) * 0.99))]
+        print(f"{name:<26}{statistics.median(timings):>10.2f}{p99:>10.2f}  {tuple(output)}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--seed", action="store_true", help="create the benchmark doctor and notes first")
+    parser.add_argument("--notes", type=int, default=100000)
+    parser.add_argument("--cleanup", action="store_true", help="delete the fixture and exit")
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    if args.cleanup:
+        cleanup()
+    else:
+        if args.seed:
+            seed(args.notes)
+        run(args.repeat)
@@ -0,0 +1,101 @@
+"""
+Benchmark: latency of non-login endpoints during a login storm
+
+Models shift change: --storm clients log in back to back while --probe clients
+keep calling an authenticated read endpoint. Reports probe p50/p99 with no
+storm (baseline) and during the storm, plus how the logins fared
+(200 vs fast 503 rejections from the bounded password hashing pool).
+
+Usage (against a running server with a seeded doctor account):
+    uvicorn main:app --workers 1 &
+    python -m benchmarks.login_storm --email doc@example.com --password secret123 \\
+        --base-url http://localhost:8000 --storm 300 --duration 20
+"""
+import argparse
+import asyncio
+import statistics
+import time
+
+import httpx
+
+API = "/api/v1"
+
+
+def percentile(values, pct):
+    if not values:
+        return float("nan")
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * pct / 100))]
+
+
+async def login(client, email, password):
+    response = await client.post(f"{API}/auth/login", json={"email": email, "password": password})
+    return response
+
+
+async def probe_loop(client, token, stop, latencies, probe_path):
+    headers = {"Authorization": f"Bearer {token}"}
+    while not stop.is_set():
+        started = time.perf_counter()
+        response = await client.get(probe_path, headers=headers)
+        if response.status_code == 200:
+            latencies.append((time.perf_counter() - started) * 1000)
+
+
+async def storm_loop(client, email, password, stop, outcomes):
+    while not stop.is_set():
+        started = time.perf_counter()
+        response = await login(client, email, password)
+        outcomes.append((response.status_code, (time.perf_counter() - started) * 1000))
+
+
+async def run_phase(client, token, args, storm_clients):
+    stop = asyncio.Event()
+    latencies, outcomes = [], []
+    tasks = [asyncio.create_task(probe_loop(client, token, stop, latencies, args.probe_path))
+             for _ in range(args.probe)]
+    tasks += [asyncio.create_task(storm_loop(client, args.email, args.password, stop, outcomes))
+              for _ in range(storm_clients)]
+    await asyncio.sleep(args.duration)
+    stop.set()
+    await asyncio.gather(*tasks, return_exceptions=True)
+    return latencies, outcomes
+
+
+async def main(args):
+    limits = httpx.Limits(max_connections=args.storm + args.probe + 10)
+    async with httpx.AsyncClient(base_url=args.base_url, limits=limits, timeout=60) as client:
+        response = await login(client, args.email, args.password)
+        response.raise_for_status()
+        token = response.json()["access_token"]
+
+        baseline, _ = await run_phase(client, token, args, 0)
+        during, outcomes = await run_phase(client, token, args, args.storm)
+
+    print("=" * 70)
+    print(f"LOGIN STORM - {args.storm} login clients, {args.probe} probe clients on {args.probe_path}, "
+          f"{args.duration}s per phase")
+    print("=" * 70)
+    print(f"{'probe phase':<20}{'requests':>10}{'p50 ms':>10}{'p99 ms':>10}")
+    for name, latencies in (("baseline", baseline), ("during storm", during)):
+        p50 = statistics.median(latencies) if latencies else float("nan")
+        print(f"{name:<20}{len(latencies):>10}{p50:>10.1f}{percentile(latencies, 99):>10.1f}")
+
+    ok = [ms for code, ms in outcomes if code == 200]
+    rejected = [ms for code, ms in outcomes if code == 503]
+    print("-" * 70)
+    print(f"logins ok: {len(ok)} (p99 {percentile(ok, 99):.0f}ms), "
+          f"rejected 503: {len(rejected)} (p99 {percentile(rejected, 99):.1f}ms), "
+          f"other: {len(outcomes) - len(ok) - len(rejected)}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--base-url", default="http://localhost:8000")
+    parser.add_argument("--email", required=True)
+    parser.add_argument("--password", required=True)
+    parser.add_argument("--storm", type=int, default=300, help="concurrent login clients")
+    parser.add_argument("--probe", type=int, default=20, help="concurrent non-login clients")
+    parser.add_argument("--probe-path", default=f"{API}/notifications/unread")
+    parser.add_argument("--duration", type=float, default=20.0, help="seconds per phase")
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,108 @@
+"""
+Microbenchmark: OR utilization analytics over a year of cases
+
+Fixture: --rooms rooms x --days days, 3-6 cases per room-day with random
+turnover, late starts and overruns, as the row tuples OR_CASES_QUERY returns.
+Times the array build (load_or_cases, with the database cursor replaced by the
+fixture rows) and the metrics (or_utilization) separately, and checks overall
+utilization, turnover count and first-case count against a per-row Python loop.
+
+Usage (from the repository root; no database needed):
+    python -m benchmarks.or_analytics_bench --rooms 50 --days 365
+"""
+import argparse
+import random
+import timeit
+import uuid
+from datetime import date, datetime, time, timedelta
+
+from app.analytics import MAX_TURNOVER_GAP_MINUTES, load_or_cases, or_utilization
+
+DAY_START, DAY_END = time(7), time(20)
+
+
+class FixtureCursor:
+    """Returns the rooms rows, then the case rows, like the two queries load_or_cases runs"""
+
+    def __init__(self, rooms, cases):
+        self.results = [rooms, cases]
+        self.rows = None
+
+    def execute(self, query, params=None):
+        self.rows = self.results.pop(0)
+
+    def fetchall(self):
+        return self.rows
+
+
+def build_fixture(rooms: int, days: int, first: date):
+    epoch = datetime(1970, 1, 1)
+    room_rows = [(uuid.uuid4(), f"OR-{number + 1:02d}") for number in range(rooms)]
+    case_rows = []
+    for position in range(rooms):
+        for offset in range(days):
+            at = datetime.combine(first + timedelta(days=offset), time(7, 30))
+            for _ in range(random.randint(3, 6)):
+                planned = random.choice((45, 60, 90, 120, 180))
+                start = at + timedelta(minutes=random.choice((0, 0, 5, 10, 25)))
+                end = start + timedelta(minutes=planned + random.randint(-15, 40))
+                case_rows.append((
+                    position, (start - epoch).total_seconds() / 60, (end - epoch).total_seconds() / 60,
+                    (at - epoch).total_seconds() / 60, planned
+                ))
+                at = end + timedelta(minutes=random.randint(10, 45))
+    return room_rows, case_rows
+
+
+def loop_check(room_rows, case_rows, first: date, days: int):
+    """Overall utilization, turnover gaps and first cases, one row at a time"""
+    base = (datetime.combine(first, time()) - datetime(1970, 1, 1)).total_seconds() / 60
+    open_at, close_at = DAY_START.hour * 60, DAY_END.hour * 60
+    busy, turnovers, firsts, previous = 0.0, 0, 0, None
+    for row in sorted(case_rows, key=lambda row: (row[0], row[1])):
+        start, end = row[1] - base, row[2] - base
+        day = int(start // 1440)
+        busy += max(0.0, min(end, day * 1440 + close_at) - max(start, day * 1440 + open_at))
+        if previous and previous[0] == row[0] and previous[1] == day:
+            turnovers += 0 <= start - previous[2] <= MAX_TURNOVER_GAP_MINUTES
+        else:
+            firsts += 1
+        previous = (row[0], day, end)
+    return round(busy * 100 / (len(room_rows) * days * (close_at - open_at)), 2), turnovers, firsts
+
+
+def main(rooms: int, days: int, number: int):
+    random.seed(5)
+    first = date(2029, 1, 1)
+    end = first + timedelta(days=days)
+    room_rows, case_rows = build_fixture(rooms, days, first)
+
+    cases = load_or_cases(FixtureCursor(room_rows, case_rows), first, end)
+    result = or_utilization(cases, DAY_START, DAY_END)
+    expected = loop_check(room_rows, case_rows, first, days)
+    actual = (result["utilization_percentage"], result["turnover"]["count"], result["first_case_starts"]["first_cases"])
+    assert actual == expected, (actual, expected)
+
+    load = min(timeit.repeat(lambda: load_or_cases(FixtureCursor(room_rows, case_rows), first, end),
+                             number=number, repeat=3)) / number
+    compute = min(timeit.repeat(lambda: or_utilization(cases, DAY_START, DAY_END),
+                                number=number, repeat=3)) / number
+
+    print("=" * 70)
+    print(f"OR ANALYTICS - {rooms} rooms x {days} days, {len(case_rows)} cases")
+    print("=" * 70)
+    print(f"utilization {result['utilization_percentage']}%, turnover p50 "
+          f"{result['turnover']['median_minutes']} min, first-case on time "
+          f"{result['first_case_starts']['on_time_percentage']}%, overruns "
+          f"{result['overruns']['overrun_percentage']}% (matches per-row loop)")
+    print(f"rows -> arrays: {load * 1000:.1f}ms, metrics: {compute * 1000:.1f}ms, "
+          f"total {(load + compute) * 1000:.1f}ms")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rooms", type=int, default=50)
+    parser.add_argument("--days", type=int, default=365)
+    parser.add_argument("--number", type=int, default=5)
+    args = parser.parse_args()
+    main(args.rooms, args.days, args.number)
@@ -0,0 +1,92 @@
+"""
+Benchmark: GET /patients search queries (substring vs ranked) at scale
+
+Runs the exact SQL built by app.routes.patients.build_patient_search_query for a
+set of search-box terms and reports p50/p99 latency per mode. --seed inserts
+synthetic patients (codes prefixed BENCH) first; --cleanup removes them.
+
+Usage (from the repository root, with DB_URL set and migrations applied):
+    python -m benchmarks.patient_search_bench --seed 2000000
+    python -m benchmarks.patient_search_bench --repeat 50
+    python -m benchmarks.patient_search_bench --cleanup
+"""
+import argparse
+import statistics
+import time
+
+from app.db import connection
+from app.routes.patients import build_patient_search_query
+
+TERMS = ["jo", "smi", "john", "john smi", "garcia", "mar", "BENCH00012", "BENCH0001", "xqz"]
+
+FIRST_NAMES = ["John", "Maria", "James", "Linda", "Robert", "Patricia", "Michael", "Jennifer",
+               "William", "Elizabeth", "David", "Barbara", "Richard", "Susan", "Joseph", "Jessica"]
+LAST_NAMES = ["Smith", "Johnson", "Williams", "Brown", "Jones", "Garcia", "Miller", "Davis",
+              "Rodriguez", "Martinez", "Hernandez", "Lopez", "Gonzalez", "Wilson", "Anderson", "Thomas"]
+
+
+def seed(count: int):
+    with connection() as conn:
+        cur = conn.cursor()
+        # Suffix the names with a number so trigram sets vary like real data
+        cur.execute("""
+            INSERT INTO patients (patient_code, first_name, last_name, status, created_at)
+            SELECT 'BENCH' || lpad(i::text, 8, '0'),
+                   (%s::text[])[1 + i %% %s] || CASE WHEN i %% 7 = 0 THEN '' ELSE chr(97 + i %% 26) END,
+                   (%s::text[])[1 + (i / 16) %% %s] || CASE WHEN i %% 5 = 0 THEN '' ELSE chr(97 + (i / 26) %% 26) END,
+                   CASE WHEN i %% 10 = 0 THEN 'inactive' ELSE 'active' END,
+                   NOW() - (i || ' seconds')::interval
+            FROM generate_series(1, %s) AS i
+            ON CONFLICT (patient_code) DO NOTHING
+        """, (FIRST_NAMES, len(FIRST_NAMES), LAST_NAMES, len(LAST_NAMES), count))
+        cur.execute("ANALYZE patients")
+        cur.close()
+    print(f"Seeded {count} patients")
+
+
+def cleanup():
+    with connection() as conn:
+        cur = conn.cursor()
+        cur.execute("DELETE FROM patients WHERE patient_code LIKE 'BENCH%%'")
+        print(f"Deleted {cur.rowcount} benchmark patients")
+        cur.close()
+
+
+def run(repeat: int, limit: int):
+    print("=" * 70)
+    print(f"PATIENT SEARCH - {repeat} runs per term, limit {limit}")
+    print("=" * 70)
+    print(f"{'term':<14}{'mode':<12}{'rows':>6}{'p50 ms':>10}{'p99 ms':>10}")
+    with connection() as conn:
+        cur = conn.cursor()
+        for term in TERMS:
+            for mode in ("substring", "ranked"):
+                query, params = build_patient_search_query(term, mode == "ranked", None, limit, 0)
+                cur.execute(query, params)  # warm up
+                rows = len(cur.fetchall())
+                timings = []
+                for _ in range(repeat):
+                    started = time.perf_counter()
+                    cur.execute(query, params)
+                    cur.fetchall()
+                    timings.append((time.perf_counter() - started) * 1000)
+                timings.sort()
+                p99 = timings[min(len(timings) - 1, int(len(timings) * 0.99))]
+                print(f"{term:<14}{mode:<12}{rows:>6}{statistics.median(timings):>10.2f}{p99:>10.2f}")
+        cur.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--seed", type=int, default=0, help="insert this many synthetic patients first")
+    parser.add_argument("--cleanup", action="store_true", help="delete synthetic patients and exit")
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--limit", type=int, default=20)
+    args = parser.parse_args()
+
+    if args.cleanup:
+        cleanup()
+    else:
+        if args.seed:
+            seed(args.seed)
+        run(args.repeat, args.limit)
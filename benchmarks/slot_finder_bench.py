@@ -0,0 +1,94 @@
+"""
+Microbenchmark: next-available OR slot search, linear scan vs IntervalIndex
+
+Fixture: --rooms rooms over --days days, each room-day filled with random
+surgeries (07:00-20:00, 15 minute grid). Times the search the
+/or-schedule/available-slots endpoint runs (per-room merged IntervalIndex,
+rooms merged lazily) against a per-candidate scan of every busy interval, for
+a short surgery (answer found early) and a long one that rarely fits (most of
+the window is scanned).
+
+Usage (from the repository root; no database needed):
+    python -m benchmarks.slot_finder_bench --rooms 40 --days 30
+"""
+import argparse
+import heapq
+import itertools
+import random
+import timeit
+from datetime import date, datetime, time, timedelta
+
+from app.scheduling import IntervalIndex, room_free_slots
+
+DAY_START, DAY_END = time(7), time(20)
+STEP = timedelta(minutes=15)
+
+
+def build_fixture(rooms: int, days: int, per_day: int):
+    first = date(2030, 1, 7)
+    window = [first + timedelta(days=offset) for offset in range(days)]
+    busy = {}
+    for room in range(rooms):
+        intervals = []
+        for day in window:
+            for _ in range(per_day):
+                start = datetime.combine(day, time(random.randint(7, 18), random.choice((0, 15, 30, 45))))
+                intervals.append((start, start + timedelta(minutes=random.choice((30, 60, 90, 120, 180)))))
+        busy[f"{room + 1:02d}"] = intervals
+    surgeon = [interval for intervals in list(busy.values())[:2] for interval in intervals[::7]]
+    return window, busy, surgeon
+
+
+def indexed_search(window, busy, surgeon, duration, limit):
+    surgeon_busy = IntervalIndex(surgeon)
+
+    def candidates(room):
+        for start, _ in room_free_slots(IntervalIndex(busy[room]), surgeon_busy, window, duration, 15):
+            yield start, room
+
+    return list(itertools.islice(heapq.merge(*(candidates(room) for room in busy)), limit))
+
+
+def scan_search(window, busy, surgeon, duration, limit):
+    """Try every 15-minute start in time order against every busy interval"""
+    need, length = timedelta(minutes=duration + 15), timedelta(minutes=duration)
+    found = []
+    for day in window:
+        at, close = datetime.combine(day, DAY_START), datetime.combine(day, DAY_END)
+        while at + length <= close:
+            if not any(s < at + length and at < e for s, e in surgeon):
+                for room, intervals in busy.items():
+                    if not any(s < at + need and at < e for s, e in intervals):
+                        found.append((at, room))
+                        if len(found) == limit:
+                            return found
+            at += STEP
+    return found
+
+
+def main(rooms: int, days: int, per_day: int, limit: int, number: int):
+    random.seed(7)
+    window, busy, surgeon = build_fixture(rooms, days, per_day)
+
+    print("=" * 70)
+    print(f"SLOT SEARCH - {rooms} rooms x {days} days, {per_day} surgeries per room-day, first {limit}")
+    print("=" * 70)
+    print(f"{'duration':>10}{'found':>8}{'scan ms':>12}{'indexed ms':>12}{'speedup':>10}")
+    for duration in (60, 360):
+        found = indexed_search(window, busy, surgeon, duration, limit)
+        scan = min(timeit.repeat(lambda: scan_search(window, busy, surgeon, duration, limit),
+                                 number=number, repeat=3)) / number
+        indexed = min(timeit.repeat(lambda: indexed_search(window, busy, surgeon, duration, limit),
+                                    number=number, repeat=3)) / number
+        print(f"{duration:>8}m{len(found):>9}{scan * 1000:>12.2f}{indexed * 1000:>12.2f}{scan / indexed:>9.1f}x")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rooms", type=int, default=40)
+    parser.add_argument("--days", type=int, default=30)
+    parser.add_argument("--per-day", type=int, default=5, help="surgeries per room per day")
+    parser.add_argument("--limit", type=int, default=10)
+    parser.add_argument("--number", type=int, default=3)
+    args = parser.parse_args()
+    main(args.rooms, args.days, args.per_day, args.limit, args.number)
@@ -6,7 +6,23 @@ recording, notes, analysis, and notifications
 from fastapi import FastAPI, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
 from app.routes import api_router
-from app.db import get_connection
+from app.db import connection, get_pool, close_pool, get_async_pool, close_async_pool
+from app.dependencies import principal_cache
+from app.routes.dashboard import hospital_metrics_cache, doctor_metrics_cache
+from app.scheduling import month_availability_cache
+from app.events import board_broker
+from app.auth import token_cache_stats, password_hasher_stats, shutdown_password_hasher
+from app.jobs import (
+    register_job, start_jobs, stop_jobs, job_stats,
+    purge_expired_refresh_tokens, REFRESH_TOKEN_PURGE_INTERVAL_SECONDS
+)
+from app.transcription import transcription_worker, TRANSCRIPTION_POLL_SECONDS
+from app.live_transcription import live_sessions
+from app.rollups import (
+    rebuild_doctor_stats, DOCTOR_STATS_REBUILD_INTERVAL_SECONDS,
+    refresh_dashboard_metrics, DASHBOARD_METRICS_REFRESH_INTERVAL_SECONDS
+)
+import asyncio
 import uvicorn
 
 # Create FastAPI app
@@ -25,6 +41,7 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor", "Age", "X-Cache", "ETag"],
 )
 
 # Include all API routes with /api/v1 prefix
@@ -32,18 +49,34 @@ app.include_router(api_router, prefix="/api/v1")
 
 @app.on_event("startup")
 async def startup_event():
-    """Test database connection on startup"""
+    """Warm up the connection pool and test the database on startup"""
     try:
-        conn = get_connection()
-        cur = conn.cursor()
-        cur.execute("SELECT 1")
-        cur.close()
-        conn.close()
+        await asyncio.to_thread(get_pool().fill)  # opening connections blocks
+        await get_async_pool()
+        with connection() as conn:
+            cur = conn.cursor()
+            cur.execute("SELECT 1")
+            cur.close()
         print("✓ Database connection successful")
+        register_job("purge_refresh_tokens", REFRESH_TOKEN_PURGE_INTERVAL_SECONDS, purge_expired_refresh_tokens)
+        register_job("rebuild_doctor_stats", DOCTOR_STATS_REBUILD_INTERVAL_SECONDS, rebuild_doctor_stats,
+                     run_at_startup=False)
+        register_job("refresh_dashboard_metrics", DASHBOARD_METRICS_REFRESH_INTERVAL_SECONDS, refresh_dashboard_metrics)
+        register_job("dispatch_transcriptions", TRANSCRIPTION_POLL_SECONDS, transcription_worker.dispatch)
+        await start_jobs()
     except Exception as e:
         print(f"✗ Database connection failed: {e}")
         raise
 
+@app.on_event("shutdown")
+async def shutdown_event():
+    """Stop background jobs and close pooled database connections"""
+    await stop_jobs()
+    await transcription_worker.shutdown()
+    close_pool()
+    await close_async_pool()
+    shutdown_password_hasher()
+
 @app.get("/")
 def root():
     """Root endpoint"""
@@ -70,18 +103,30 @@ def root():
 def health_check():
     """Health check endpoint"""
     try:
-        conn = get_connection()
-        cur = conn.cursor()
-        cur.execute("SELECT 1")
-        cur.close()
-        conn.close()
+        with connection() as conn:
+            cur = conn.cursor()
+            cur.execute("SELECT 1")
+            cur.close()
         db_status = "healthy"
     except Exception as e:
         db_status = f"unhealthy: {str(e)}"
     
     return {
         "status": "ok" if db_status == "healthy" else "degraded",
-        "database": db_status
+        "database": db_status,
+        "db_pool": get_pool().stats(),
+        "password_hasher": password_hasher_stats(),
+        "caches": {
+            "principal": principal_cache.stats(),
+            "tokens": token_cache_stats(),
+            "hospital_metrics": hospital_metrics_cache.stats(),
+            "doctor_metrics": doctor_metrics_cache.stats(),
+            "month_availability": month_availability_cache.stats()
+        },
+        "or_board": board_broker.stats(),
+        "transcription": transcription_worker.stats(),
+        "live_transcription": live_sessions.stats(),
+        "jobs": job_stats()
     }
 
 if __name__ == "__main__":
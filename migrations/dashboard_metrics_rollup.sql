@@ -0,0 +1,4 @@
+-- Migration: dashboard_metrics rollup bookkeeping
+
+-- When the rollup job last recomputed the row; a day is final once refreshed after it ended
+ALTER TABLE dashboard_metrics ADD COLUMN IF NOT EXISTS updated_at TIMESTAMP;
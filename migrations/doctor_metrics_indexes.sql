@@ -0,0 +1,4 @@
+-- Migration: Composite index for per-doctor note metrics
+
+-- Doctor metrics scan one doctor's notes over a created_at range
+CREATE INDEX IF NOT EXISTS idx_notes_doctor_created ON notes(doctor_id, created_at);
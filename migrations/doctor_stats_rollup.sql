@@ -0,0 +1,220 @@
+-- Migration: doctor_stats rollup maintained by triggers
+
+-- One row per doctor with the counters the doctor details/stats endpoints show
+CREATE TABLE IF NOT EXISTS doctor_stats (
+    doctor_id UUID PRIMARY KEY REFERENCES doctors(id) ON DELETE CASCADE,
+    surgeries_total INTEGER NOT NULL DEFAULT 0,
+    surgeries_by_status JSONB NOT NULL DEFAULT '{}',
+    notes_total INTEGER NOT NULL DEFAULT 0,
+    patients_total INTEGER NOT NULL DEFAULT 0,
+    recordings_total INTEGER NOT NULL DEFAULT 0,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+-- Notes per (doctor, patient); a doctor's distinct patient count changes when a pair appears or disappears.
+-- No foreign key to patients: deleting a patient cascades to their notes, and the
+-- notes trigger must still find these rows to decrement the counts.
+CREATE TABLE IF NOT EXISTS doctor_patients (
+    doctor_id UUID NOT NULL REFERENCES doctors(id) ON DELETE CASCADE,
+    patient_id UUID NOT NULL,
+    note_count INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (doctor_id, patient_id)
+);
+
+-- Upcoming surgeries depend on today's date, so they stay a live (indexed) count
+CREATE INDEX IF NOT EXISTS idx_surgeries_doctor_status_date ON surgeries(doctor_id, status, scheduled_date);
+
+-- ============================================
+-- COUNTER HELPERS
+-- ============================================
+
+CREATE OR REPLACE FUNCTION doctor_stats_add_surgery(p_doctor_id UUID, p_status TEXT, p_delta INTEGER) RETURNS void AS $$
+DECLARE
+    v_status TEXT := COALESCE(p_status, 'unknown');
+BEGIN
+    IF p_doctor_id IS NULL THEN
+        RETURN;
+    END IF;
+    INSERT INTO doctor_stats (doctor_id, surgeries_total, surgeries_by_status)
+    VALUES (p_doctor_id, p_delta, jsonb_build_object(v_status, p_delta))
+    ON CONFLICT (doctor_id) DO UPDATE SET
+        surgeries_total = doctor_stats.surgeries_total + p_delta,
+        surgeries_by_status = doctor_stats.surgeries_by_status || jsonb_build_object(
+            v_status, COALESCE((doctor_stats.surgeries_by_status ->> v_status)::INTEGER, 0) + p_delta
+        ),
+        updated_at = CURRENT_TIMESTAMP;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION doctor_stats_add_note(p_doctor_id UUID, p_patient_id UUID, p_delta INTEGER) RETURNS void AS $$
+DECLARE
+    v_note_count INTEGER;
+    v_patient_delta INTEGER := 0;
+BEGIN
+    IF p_doctor_id IS NULL THEN
+        RETURN;
+    END IF;
+    IF p_patient_id IS NOT NULL THEN
+        IF p_delta > 0 THEN
+            INSERT INTO doctor_patients (doctor_id, patient_id, note_count)
+            VALUES (p_doctor_id, p_patient_id, p_delta)
+            ON CONFLICT (doctor_id, patient_id) DO UPDATE SET note_count = doctor_patients.note_count + p_delta
+            RETURNING note_count INTO v_note_count;
+            IF v_note_count = p_delta THEN
+                v_patient_delta := 1;
+            END IF;
+        ELSE
+            UPDATE doctor_patients SET note_count = note_count + p_delta
+            WHERE doctor_id = p_doctor_id AND patient_id = p_patient_id
+            RETURNING note_count INTO v_note_count;
+            IF v_note_count IS NOT NULL AND v_note_count <= 0 THEN
+                DELETE FROM doctor_patients WHERE doctor_id = p_doctor_id AND patient_id = p_patient_id;
+                v_patient_delta := -1;
+            END IF;
+        END IF;
+    END IF;
+    INSERT INTO doctor_stats (doctor_id, notes_total, patients_total)
+    VALUES (p_doctor_id, p_delta, v_patient_delta)
+    ON CONFLICT (doctor_id) DO UPDATE SET
+        notes_total = doctor_stats.notes_total + p_delta,
+        patients_total = doctor_stats.patients_total + v_patient_delta,
+        updated_at = CURRENT_TIMESTAMP;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION doctor_stats_add_recording(p_doctor_id UUID, p_delta INTEGER) RETURNS void AS $$
+BEGIN
+    IF p_doctor_id IS NULL THEN
+        RETURN;
+    END IF;
+    INSERT INTO doctor_stats (doctor_id, recordings_total)
+    VALUES (p_doctor_id, p_delta)
+    ON CONFLICT (doctor_id) DO UPDATE SET
+        recordings_total = doctor_stats.recordings_total + p_delta,
+        updated_at = CURRENT_TIMESTAMP;
+END;
+$$ LANGUAGE plpgsql;
+
+-- ============================================
+-- TRIGGERS
+-- ============================================
+
+CREATE OR REPLACE FUNCTION doctor_stats_surgeries_trigger() RETURNS trigger AS $$
+BEGIN
+    IF TG_OP IN ('UPDATE', 'DELETE') THEN
+        PERFORM doctor_stats_add_surgery(OLD.doctor_id, OLD.status, -1);
+    END IF;
+    IF TG_OP IN ('INSERT', 'UPDATE') THEN
+        PERFORM doctor_stats_add_surgery(NEW.doctor_id, NEW.status, 1);
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION doctor_stats_notes_trigger() RETURNS trigger AS $$
+BEGIN
+    IF TG_OP IN ('UPDATE', 'DELETE') THEN
+        PERFORM doctor_stats_add_note(OLD.doctor_id, OLD.patient_id, -1);
+    END IF;
+    IF TG_OP IN ('INSERT', 'UPDATE') THEN
+        PERFORM doctor_stats_add_note(NEW.doctor_id, NEW.patient_id, 1);
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION doctor_stats_transcriptions_trigger() RETURNS trigger AS $$
+BEGIN
+    IF TG_OP IN ('UPDATE', 'DELETE') THEN
+        PERFORM doctor_stats_add_recording(OLD.doctor_id, -1);
+    END IF;
+    IF TG_OP IN ('INSERT', 'UPDATE') THEN
+        PERFORM doctor_stats_add_recording(NEW.doctor_id, 1);
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Updates only fire when a counted column actually changes
+DROP TRIGGER IF EXISTS trg_doctor_stats_surgeries ON surgeries;
+CREATE TRIGGER trg_doctor_stats_surgeries
+    AFTER INSERT OR DELETE ON surgeries
+    FOR EACH ROW EXECUTE FUNCTION doctor_stats_surgeries_trigger();
+DROP TRIGGER IF EXISTS trg_doctor_stats_surgeries_update ON surgeries;
+CREATE TRIGGER trg_doctor_stats_surgeries_update
+    AFTER UPDATE OF doctor_id, status ON surgeries
+    FOR EACH ROW
+    WHEN (OLD.doctor_id IS DISTINCT FROM NEW.doctor_id OR OLD.status IS DISTINCT FROM NEW.status)
+    EXECUTE FUNCTION doctor_stats_surgeries_trigger();
+
+DROP TRIGGER IF EXISTS trg_doctor_stats_notes ON notes;
+CREATE TRIGGER trg_doctor_stats_notes
+    AFTER INSERT OR DELETE ON notes
+    FOR EACH ROW EXECUTE FUNCTION doctor_stats_notes_trigger();
+DROP TRIGGER IF EXISTS trg_doctor_stats_notes_update ON notes;
+CREATE TRIGGER trg_doctor_stats_notes_update
+    AFTER UPDATE OF doctor_id, patient_id ON notes
+    FOR EACH ROW
+    WHEN (OLD.doctor_id IS DISTINCT FROM NEW.doctor_id OR OLD.patient_id IS DISTINCT FROM NEW.patient_id)
+    EXECUTE FUNCTION doctor_stats_notes_trigger();
+
+DROP TRIGGER IF EXISTS trg_doctor_stats_transcriptions ON transcriptions;
+CREATE TRIGGER trg_doctor_stats_transcriptions
+    AFTER INSERT OR DELETE ON transcriptions
+    FOR EACH ROW EXECUTE FUNCTION doctor_stats_transcriptions_trigger();
+DROP TRIGGER IF EXISTS trg_doctor_stats_transcriptions_update ON transcriptions;
+CREATE TRIGGER trg_doctor_stats_transcriptions_update
+    AFTER UPDATE OF doctor_id ON transcriptions
+    FOR EACH ROW
+    WHEN (OLD.doctor_id IS DISTINCT FROM NEW.doctor_id)
+    EXECUTE FUNCTION doctor_stats_transcriptions_trigger();
+
+-- ============================================
+-- RECONCILIATION
+-- ============================================
+
+-- Rebuild both tables from the source rows. The EXCLUSIVE lock makes concurrent
+-- trigger writes wait until the rebuild commits, so no increment is lost or
+-- double counted; readers are not blocked. Returns false (and does nothing) if
+-- another session is already rebuilding.
+CREATE OR REPLACE FUNCTION rebuild_doctor_stats() RETURNS boolean AS $$
+BEGIN
+    IF NOT pg_try_advisory_xact_lock(hashtext('rebuild_doctor_stats')) THEN
+        RETURN false;
+    END IF;
+    LOCK TABLE doctor_stats, doctor_patients IN EXCLUSIVE MODE;
+
+    DELETE FROM doctor_patients;
+    INSERT INTO doctor_patients (doctor_id, patient_id, note_count)
+    SELECT doctor_id, patient_id, COUNT(*)
+    FROM notes
+    WHERE doctor_id IS NOT NULL AND patient_id IS NOT NULL
+    GROUP BY doctor_id, patient_id;
+
+    DELETE FROM doctor_stats;
+    INSERT INTO doctor_stats (doctor_id, surgeries_total, surgeries_by_status, notes_total, patients_total, recordings_total)
+    SELECT d.id,
+           COALESCE(s.total, 0),
+           COALESCE(s.by_status, '{}'),
+           COALESCE(n.total, 0),
+           COALESCE(p.total, 0),
+           COALESCE(t.total, 0)
+    FROM doctors d
+    LEFT JOIN (
+        SELECT doctor_id, SUM(cnt)::INTEGER AS total, jsonb_object_agg(status, cnt) AS by_status
+        FROM (
+            SELECT doctor_id, COALESCE(status, 'unknown') AS status, COUNT(*) AS cnt
+            FROM surgeries GROUP BY 1, 2
+        ) per_status
+        GROUP BY doctor_id
+    ) s ON s.doctor_id = d.id
+    LEFT JOIN (SELECT doctor_id, COUNT(*) AS total FROM notes GROUP BY doctor_id) n ON n.doctor_id = d.id
+    LEFT JOIN (SELECT doctor_id, COUNT(*) AS total FROM doctor_patients GROUP BY doctor_id) p ON p.doctor_id = d.id
+    LEFT JOIN (SELECT doctor_id, COUNT(*) AS total FROM transcriptions GROUP BY doctor_id) t ON t.doctor_id = d.id;
+
+    RETURN true;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Backfill
+SELECT rebuild_doctor_stats();
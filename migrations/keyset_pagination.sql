@@ -0,0 +1,8 @@
+-- Migration: Composite indexes for keyset (cursor) pagination
+
+-- GET /patients: ORDER BY created_at DESC, id DESC, optionally filtered by status
+CREATE INDEX IF NOT EXISTS idx_patients_created_id ON patients(created_at DESC, id DESC);
+CREATE INDEX IF NOT EXISTS idx_patients_status_created_id ON patients(status, created_at DESC, id DESC);
+
+-- GET /notes/patient/{id}/book: one patient's notes, newest first
+CREATE INDEX IF NOT EXISTS idx_notes_patient_created_id ON notes(patient_id, created_at DESC, id DESC);
@@ -0,0 +1,9 @@
+-- Migration: Covering index for OR utilization analytics
+
+-- /dashboard/or-utilization reads surgeries with recorded actual times by
+-- actual_start_time range; every column it needs is in the index, so a year
+-- of cases is an index-only scan
+CREATE INDEX IF NOT EXISTS idx_surgeries_actual_start
+    ON surgeries(actual_start_time)
+    INCLUDE (operating_room_id, actual_end_time, scheduled_date, scheduled_time, duration_minutes)
+    WHERE actual_end_time IS NOT NULL;
@@ -0,0 +1,54 @@
+-- Migration: Interval-based OR conflict detection
+
+CREATE EXTENSION IF NOT EXISTS btree_gist;
+
+-- Cleaning/setup time a room needs after each surgery before the next can start.
+-- Defaults to 0 so existing back-to-back bookings stay valid; set per room.
+ALTER TABLE operating_rooms ADD COLUMN IF NOT EXISTS turnover_minutes INTEGER NOT NULL DEFAULT 0
+    CHECK (turnover_minutes >= 0);
+
+-- Time the surgery holds its room: [start, start + duration + room turnover).
+-- Surgeries without a duration hold the room for 60 minutes (DEFAULT_SURGERY_MINUTES).
+ALTER TABLE surgeries ADD COLUMN IF NOT EXISTS or_slot TSRANGE;
+
+CREATE OR REPLACE FUNCTION surgeries_set_or_slot() RETURNS trigger AS $$
+DECLARE
+    v_turnover INTEGER := 0;
+    v_start TIMESTAMP := NEW.scheduled_date + NEW.scheduled_time;
+BEGIN
+    IF NEW.operating_room_id IS NOT NULL THEN
+        SELECT turnover_minutes INTO v_turnover FROM operating_rooms WHERE id = NEW.operating_room_id;
+    END IF;
+    NEW.or_slot := tsrange(
+        v_start,
+        v_start + (COALESCE(NEW.duration_minutes, 60) + COALESCE(v_turnover, 0)) * INTERVAL '1 minute',
+        '[)'
+    );
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+-- The turnover is taken when the slot is (re)computed; changing a room's
+-- turnover_minutes applies to surgeries booked or moved after the change.
+DROP TRIGGER IF EXISTS trg_surgeries_or_slot ON surgeries;
+CREATE TRIGGER trg_surgeries_or_slot
+    BEFORE INSERT OR UPDATE OF scheduled_date, scheduled_time, duration_minutes, operating_room_id ON surgeries
+    FOR EACH ROW EXECUTE FUNCTION surgeries_set_or_slot();
+
+-- Backfill (fires the trigger)
+UPDATE surgeries SET scheduled_time = scheduled_time WHERE or_slot IS NULL;
+
+-- No two live surgeries may hold the same room at overlapping times. Cancelled
+-- and completed surgeries no longer hold their room. Concurrent bookings of
+-- overlapping slots serialize on the index: the second waits for the first to
+-- commit and then fails with exclusion_violation. Adding the constraint fails
+-- if existing rows already overlap; resolve those first.
+DO $$
+BEGIN
+    IF NOT EXISTS (SELECT 1 FROM pg_constraint WHERE conname = 'surgeries_no_or_overlap') THEN
+        ALTER TABLE surgeries ADD CONSTRAINT surgeries_no_or_overlap
+            EXCLUDE USING gist (operating_room_id WITH =, or_slot WITH &&)
+            WHERE (status NOT IN ('cancelled', 'completed'));
+    END IF;
+END;
+$$;
@@ -0,0 +1,21 @@
+-- Migration: Trigram indexes for patient search
+
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+
+-- Substring (ILIKE '%x%') and ranked (word similarity) search on the full name.
+-- The expression must match the one used in app/routes/patients.py exactly.
+CREATE INDEX IF NOT EXISTS idx_patients_full_name_trgm
+    ON patients USING gin ((first_name || ' ' || last_name) gin_trgm_ops);
+CREATE INDEX IF NOT EXISTS idx_patients_patient_code_trgm
+    ON patients USING gin (patient_code gin_trgm_ops);
+
+-- Prefix matching (LIKE 'x%'), used for patient codes and for search terms too
+-- short to produce selective trigrams
+CREATE INDEX IF NOT EXISTS idx_patients_patient_code_prefix
+    ON patients (upper(patient_code) text_pattern_ops);
+CREATE INDEX IF NOT EXISTS idx_patients_first_name_prefix
+    ON patients (lower(first_name) text_pattern_ops);
+CREATE INDEX IF NOT EXISTS idx_patients_last_name_prefix
+    ON patients (lower(last_name) text_pattern_ops);
+
+ANALYZE patients;
@@ -0,0 +1,33 @@
+-- Migration: Store refresh tokens as fixed-width digests
+
+-- sha256 of the token replaces the full JWT text; lookups hit a 32-byte unique index
+ALTER TABLE refresh_tokens ADD COLUMN IF NOT EXISTS token_hash BYTEA;
+
+-- Backfill existing rows, then drop the wide text column and its index
+DO $$
+BEGIN
+    IF EXISTS (
+        SELECT 1 FROM information_schema.columns
+        WHERE table_name = 'refresh_tokens' AND column_name = 'token'
+    ) THEN
+        DELETE FROM refresh_tokens WHERE expires_at <= NOW();
+        UPDATE refresh_tokens SET token_hash = sha256(convert_to(token, 'UTF8')) WHERE token_hash IS NULL;
+        -- Duplicate tokens (same doctor logging in twice within a second) collapse to one row
+        DELETE FROM refresh_tokens a USING refresh_tokens b
+        WHERE a.token_hash = b.token_hash AND a.ctid < b.ctid;
+        DROP INDEX IF EXISTS idx_refresh_tokens_token;
+        ALTER TABLE refresh_tokens DROP COLUMN token;
+    END IF;
+END $$;
+
+ALTER TABLE refresh_tokens ALTER COLUMN token_hash SET NOT NULL;
+
+CREATE UNIQUE INDEX IF NOT EXISTS idx_refresh_tokens_token_hash ON refresh_tokens(token_hash);
+
+-- Per-doctor cap trims the oldest tokens; the purge job scans by expiry
+DROP INDEX IF EXISTS idx_refresh_tokens_doctor_id;
+CREATE INDEX IF NOT EXISTS idx_refresh_tokens_doctor_created ON refresh_tokens(doctor_id, created_at DESC);
+CREATE INDEX IF NOT EXISTS idx_refresh_tokens_expires_at ON refresh_tokens(expires_at);
+
+-- Comments
+COMMENT ON COLUMN refresh_tokens.token_hash IS 'sha256 digest of the refresh token JWT; the token itself is never stored';
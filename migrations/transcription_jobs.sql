@@ -0,0 +1,18 @@
+-- Migration: transcriptions double as the transcription job queue
+
+-- A transcription with status 'processing' is a queued or running job. Workers
+-- claim due jobs with FOR UPDATE SKIP LOCKED and hold them until claimed_until;
+-- a worker that dies lets its lease expire and another worker retries the job.
+ALTER TABLE transcriptions ADD COLUMN IF NOT EXISTS attempts INTEGER NOT NULL DEFAULT 0;
+ALTER TABLE transcriptions ADD COLUMN IF NOT EXISTS next_attempt_at TIMESTAMP;
+ALTER TABLE transcriptions ADD COLUMN IF NOT EXISTS claimed_until TIMESTAMP;
+ALTER TABLE transcriptions ADD COLUMN IF NOT EXISTS started_at TIMESTAMP;
+ALTER TABLE transcriptions ADD COLUMN IF NOT EXISTS last_error TEXT;
+
+-- Rows left in 'processing' before the queue existed become due now
+UPDATE transcriptions SET next_attempt_at = created_at
+WHERE transcription_status = 'processing' AND next_attempt_at IS NULL;
+
+-- Only queued/running jobs are indexed, so the claim and queue-depth reads stay small
+CREATE INDEX IF NOT EXISTS idx_transcriptions_queue ON transcriptions(next_attempt_at)
+    WHERE transcription_status = 'processing';
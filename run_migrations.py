@@ -36,7 +36,16 @@ if __name__ == "__main__":
     # Run migrations in order
     migrations = [
         'migrations/add_auth.sql',
-        'migrations/fix_columns.sql'
+        'migrations/fix_columns.sql',
+        'migrations/refresh_token_digests.sql',
+        'migrations/patient_search_trgm.sql',
+        'migrations/keyset_pagination.sql',
+        'migrations/doctor_stats_rollup.sql',
+        'migrations/dashboard_metrics_rollup.sql',
+        'migrations/doctor_metrics_indexes.sql',
+        'migrations/or_booking_exclusion.sql',
+        'migrations/or_analytics_indexes.sql',
+        'migrations/transcription_jobs.sql'
     ]
     
     for migration in migrations:
@@ -0,0 +1,160 @@
+"""
+Shared fixtures: in-memory stand-ins for the sync and async databases and an
+app client that skips the startup hooks (no pool, no background jobs).
+"""
+import contextlib
+
+import pytest
+from fastapi.testclient import TestClient
+
+import main
+from app import dependencies
+from app.auth import create_access_token
+
+DOCTOR_ID = "8a3c1f0e-5b7d-4e2a-9c61-0d4f2b7e9a10"
+PRINCIPAL_ROW = (DOCTOR_ID, "Ada", "Lovelace", "ada@example.com", "surgery", "active")
+
+
+def _respond(db, query, params):
+    db.executed.append((" ".join(query.split()), params))
+    if "FROM doctors" in query:
+        return [PRINCIPAL_ROW]
+    result = db.handler(query, params)
+    if isinstance(result, BaseException):
+        raise result
+    return list(result or [])
+
+
+class FakeCursor:
+    def __init__(self, db):
+        self.db = db
+        self.rows = []
+        self.rowcount = 0
+
+    def execute(self, query, params=None):
+        self.rows = _respond(self.db, query, params)
+        self.rowcount = len(self.rows)
+
+    def fetchone(self):
+        return self.rows[0] if self.rows else None
+
+    def fetchall(self):
+        return self.rows
+
+    def close(self):
+        pass
+
+
+class FakeConnection:
+    def __init__(self, db):
+        self.db = db
+
+    def cursor(self):
+        return FakeCursor(self.db)
+
+    def commit(self):
+        self.db.commits += 1
+
+    def rollback(self):
+        self.db.rollbacks += 1
+
+
+class FakeDB:
+    """
+    Answers every query with handler(query, params): rows, or an exception to
+    raise. The principal lookup is built in.
+    """
+
+    def __init__(self):
+        self.executed = []
+        self.handler = lambda query, params: []
+        self.commits = self.rollbacks = 0
+
+    def queries(self, fragment):
+        return [(query, params) for query, params in self.executed if fragment in query]
+
+    def get_db(self):
+        yield FakeConnection(self)
+
+
+class FakeAsyncCursor:
+    def __init__(self, db):
+        self.db = db
+        self.rows = []
+        self.rowcount = 0
+
+    async def execute(self, query, params=None):
+        self.rows = _respond(self.db, query, params)
+        self.rowcount = len(self.rows)
+
+    async def fetchone(self):
+        return self.rows[0] if self.rows else None
+
+    async def fetchall(self):
+        return self.rows
+
+    async def close(self):
+        pass
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        pass
+
+
+class FakeAsyncConnection:
+    def __init__(self, db):
+        self.db = db
+
+    def cursor(self):
+        return FakeAsyncCursor(self.db)
+
+    async def commit(self):
+        pass
+
+    async def rollback(self):
+        pass
+
+
+class FakeAsyncDB(FakeDB):
+    @contextlib.asynccontextmanager
+    async def connection(self):
+        yield FakeAsyncConnection(self)
+
+
+@pytest.fixture
+def fake_db():
+    """Serve get_db from a FakeDB"""
+    db = FakeDB()
+    main.app.dependency_overrides[dependencies.get_db] = db.get_db
+    dependencies.principal_cache.clear()
+    yield db
+    main.app.dependency_overrides.pop(dependencies.get_db, None)
+    dependencies.principal_cache.clear()
+
+
+@pytest.fixture
+def fake_async_db(monkeypatch):
+    """Patch async_connection wherever it was imported"""
+    db = FakeAsyncDB()
+    import app.live_transcription
+    import app.routes.recording
+    for module in (dependencies, app.routes.recording, app.live_transcription):
+        monkeypatch.setattr(module, "async_connection", db.connection)
+    dependencies.principal_cache.clear()
+    yield db
+    dependencies.principal_cache.clear()
+
+
+@pytest.fixture
+def client(monkeypatch):
+    monkeypatch.setattr(main.app.router, "on_startup", [])
+    monkeypatch.setattr(main.app.router, "on_shutdown", [])
+    with TestClient(main.app) as test_client:
+        yield test_client
+
+
+@pytest.fixture
+def token():
+    return create_access_token({"sub": DOCTOR_ID})
@@ -0,0 +1,83 @@
+import hashlib
+import os
+import uuid
+
+import pytest
+from psycopg import OperationalError
+
+from app import uploads
+
+AUDIO = b"RIFF" + os.urandom(4096)
+
+
+@pytest.fixture
+def upload(fake_async_db, tmp_path, monkeypatch):
+    """A transcription without audio, chunks written under tmp_path"""
+    monkeypatch.setattr(uploads, "RECORDINGS_DIR", str(tmp_path))
+    transcription_id = str(uuid.uuid4())
+    fake_async_db.attach = lambda query, params: [(transcription_id,)]
+
+    def handler(query, params):
+        if "SELECT transcription_status" in query:
+            return [("recording", None)]
+        if "SET audio_file_url" in query:
+            return fake_async_db.attach(query, params)
+        return []
+
+    fake_async_db.handler = handler
+    return transcription_id
+
+
+def _send(client, token, transcription_id):
+    response = client.patch(
+        f"/api/v1/transcriptions/{transcription_id}/audio", content=AUDIO,
+        headers={"Authorization": f"Bearer {token}", "Upload-Offset": "0"}
+    )
+    assert response.status_code == 200, response.text
+
+
+def _complete(client, token, transcription_id):
+    return client.post(
+        f"/api/v1/transcriptions/{transcription_id}/audio/complete",
+        json={"sha256": hashlib.sha256(AUDIO).hexdigest(), "duration_seconds": 42},
+        headers={"Authorization": f"Bearer {token}"}
+    )
+
+
+def test_complete_records_path_and_duration(client, token, fake_async_db, upload):
+    _send(client, token, upload)
+
+    response = _complete(client, token, upload)
+
+    assert response.status_code == 200, response.text
+    path = uploads.audio_path(upload, "wav")
+    assert response.json()["audio_file_url"] == path
+    assert open(path, "rb").read() == AUDIO and not os.path.exists(uploads.part_path(upload))
+    (query, params), = fake_async_db.queries("SET audio_file_url")
+    assert "recording_duration_seconds = COALESCE(%s, recording_duration_seconds)" in query
+    assert params[:2] == (path, 42)
+
+
+def test_missing_row_puts_the_upload_back(client, token, fake_async_db, upload):
+    _send(client, token, upload)
+    fake_async_db.attach = lambda query, params: []
+
+    assert _complete(client, token, upload).status_code == 404
+    assert not os.path.exists(uploads.audio_path(upload, "wav"))
+    assert uploads.upload_offset(upload) == len(AUDIO)
+
+
+def test_failed_update_puts_the_upload_back(client, token, fake_async_db, upload):
+    _send(client, token, upload)
+
+    def attach(query, params):
+        raise OperationalError("server closed the connection unexpectedly")
+    fake_async_db.attach = attach
+
+    with pytest.raises(OperationalError):
+        _complete(client, token, upload)
+    assert not os.path.exists(uploads.audio_path(upload, "wav"))
+    assert uploads.upload_offset(upload) == len(AUDIO)
+
+    fake_async_db.attach = lambda query, params: [(upload,)]
+    assert _complete(client, token, upload).status_code == 200
@@ -0,0 +1,76 @@
+"""Token revocation: individual tokens and everything issued before a logout"""
+import time
+
+import pytest
+from jose import jwt
+
+from app import auth
+from app.auth import ALGORITHM, SECRET_KEY, create_access_token, revoke_subject_tokens, revoke_token, verify_token
+from app.cache import ExpiringMap
+
+SUBJECT = "6f1c2b3a-4d5e-4f60-8a9b-0c1d2e3f4a50"
+
+
+@pytest.fixture(autouse=True)
+def fresh_revocations(monkeypatch):
+    monkeypatch.setattr(auth, "_revoked_tokens", ExpiringMap())
+    monkeypatch.setattr(auth, "_subject_not_before", ExpiringMap())
+    auth._token_cache.clear()
+    yield
+    auth._token_cache.clear()
+
+
+def _token(issued_ago: int, sub: str = SUBJECT) -> str:
+    now = int(time.time())
+    return jwt.encode({"sub": sub, "iat": now - issued_ago, "exp": now + 3600}, SECRET_KEY, algorithm=ALGORITHM)
+
+
+def test_revocations_are_not_evicted(monkeypatch):
+    monkeypatch.setattr(auth._token_cache, "maxsize", 10)
+    tokens = [create_access_token({"sub": SUBJECT, "n": n}) for n in range(50)]
+    for token in tokens:
+        assert verify_token(token) is not None
+        revoke_token(token)
+    assert all(verify_token(token) is None for token in tokens)
+
+
+def test_logout_rejects_every_earlier_token():
+    cached, uncached, other = _token(10), _token(20), _token(10, sub="someone-else")
+    assert verify_token(cached) is not None
+
+    revoke_subject_tokens(SUBJECT)
+
+    assert verify_token(cached) is None and verify_token(uncached) is None
+    assert verify_token(other) is not None
+    assert verify_token(create_access_token({"sub": SUBJECT})) is not None
+
+
+def test_expired_revocations_are_purged():
+    revocations = ExpiringMap()
+    revocations.set("old", True, expires_at=time.time() + 0.05)
+    revocations.set("live", True, expires_at=time.time() + 60)
+    time.sleep(0.1)
+    assert revocations.get("old") is None
+
+    revocations.set("new", True, expires_at=time.time() + 60)
+
+    assert len(revocations) == 2 and revocations.stats()["purged"] == 1
+    assert revocations.get("live") and revocations.get("new")
+
+
+def test_rotated_refresh_token_is_revoked(client, fake_async_db):
+    def handler(query, params):
+        if "RETURNING id" in query:
+            return [(1,)]  # answers as if the digest were still stored
+        if "SELECT email" in query:
+            return [("ada@example.com",)]
+        return []
+    fake_async_db.handler = handler
+    refresh_token = auth.create_refresh_token({"sub": SUBJECT})
+
+    response = client.post("/api/v1/auth/refresh", json={"refresh_token": refresh_token})
+
+    assert response.status_code == 200, response.text
+    assert verify_token(refresh_token) is None
+    assert verify_token(response.json()["refresh_token"]) is not None
+    assert client.post("/api/v1/auth/refresh", json={"refresh_token": refresh_token}).status_code == 401
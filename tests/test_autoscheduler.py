@@ -0,0 +1,93 @@
+"""AutoScheduler: solutions never double-book a room or surgeon"""
+import random
+from collections import defaultdict
+from datetime import date, datetime, time, timedelta
+
+import pytest
+
+from app.autoscheduler import AutoScheduler
+
+DAY_START, DAY_END = time(7), time(20)
+DAYS = [date(2030, 3, 4), date(2030, 3, 5)]
+
+
+def make_backlog(seed, cases=120, rooms=4, surgeons=6):
+    rng = random.Random(seed)
+    room_ids = [f"room-{i}" for i in range(rooms)]
+    turnover = {room: rng.choice((0, 10, 15, 30)) for room in room_ids}
+    backlog = [{
+        "duration_minutes": rng.choice((30, 45, 60, 90, 120, 180, 240)),
+        "urgency_level": rng.choice(("routine", "routine", "urgent", "emergency")),
+        "doctor_id": f"surgeon-{rng.randrange(surgeons)}",
+        "room_ids": [rng.choice(room_ids)] if rng.random() < 0.25 else None
+    } for _ in range(cases)]
+    room_busy, surgeon_busy = defaultdict(list), defaultdict(list)
+    for day in DAYS:
+        for room in room_ids:
+            start = datetime.combine(day, time(rng.randrange(7, 18), rng.choice((0, 20, 40))))
+            room_busy[room].append((start, start + timedelta(minutes=rng.choice((45, 90, 150)))))
+        for surgeon in range(surgeons):
+            start = datetime.combine(day, time(rng.randrange(7, 18), rng.choice((5, 35))))
+            surgeon_busy[f"surgeon-{surgeon}"].append((start, start + timedelta(minutes=60)))
+    return backlog, turnover, dict(room_busy), dict(surgeon_busy)
+
+
+def assert_no_conflicts(scheduler, turnover, room_busy, surgeon_busy, not_before=None):
+    by_room = {room: list(busy) for room, busy in room_busy.items()}
+    by_surgeon = {surgeon: list(busy) for surgeon, busy in surgeon_busy.items()}
+    for index, (room, start) in scheduler.placement.items():
+        case = scheduler.cases[index]
+        end = start + timedelta(minutes=case["duration_minutes"])
+        assert start.date() in DAYS and start.time() >= DAY_START
+        assert end <= datetime.combine(start.date(), DAY_END)
+        assert not_before is None or start >= not_before
+        assert not case["room_ids"] or room in case["room_ids"]
+        by_room.setdefault(room, []).append((start, end + timedelta(minutes=turnover[room])))
+        by_surgeon.setdefault(case["doctor_id"], []).append((start, end))
+    for intervals in list(by_room.values()) + list(by_surgeon.values()):
+        intervals.sort()
+        for previous, following in zip(intervals, intervals[1:]):
+            assert previous[1] <= following[0], (previous, following)
+
+
+@pytest.mark.parametrize("seed", range(6))
+@pytest.mark.parametrize("time_limit", [0.0, 0.2])
+def test_solutions_never_overlap(seed, time_limit):
+    backlog, turnover, room_busy, surgeon_busy = make_backlog(seed)
+    scheduler = AutoScheduler(backlog, turnover, room_busy, surgeon_busy, DAYS, DAY_START, DAY_END, 15)
+
+    summary = scheduler.solve(time_limit)
+
+    assert summary["placed"] == len(scheduler.placement) > 0
+    assert_no_conflicts(scheduler, turnover, room_busy, surgeon_busy)
+
+
+def test_not_before_is_respected():
+    backlog, turnover, room_busy, surgeon_busy = make_backlog(7, cases=40)
+    not_before = datetime.combine(DAYS[0], time(13, 7))
+    scheduler = AutoScheduler(backlog, turnover, room_busy, surgeon_busy, DAYS, DAY_START, DAY_END, 15, not_before)
+
+    scheduler.solve(0.2)
+
+    assert_no_conflicts(scheduler, turnover, room_busy, surgeon_busy, not_before)
+
+
+def test_local_search_never_loses_to_greedy():
+    backlog, turnover, room_busy, surgeon_busy = make_backlog(3, cases=200)
+    greedy = AutoScheduler(backlog, turnover, room_busy, surgeon_busy, DAYS, DAY_START, DAY_END, 15).solve(0.0)
+    searched = AutoScheduler(backlog, turnover, room_busy, surgeon_busy, DAYS, DAY_START, DAY_END, 15).solve(0.5)
+
+    assert searched["placed"] >= greedy["placed"]
+
+
+def test_urgent_case_wins_the_last_gap():
+    day = [DAYS[0]]
+    cases = [
+        {"duration_minutes": 780, "urgency_level": "routine", "doctor_id": "a", "room_ids": None},
+        {"duration_minutes": 600, "urgency_level": "emergency", "doctor_id": "b", "room_ids": None}
+    ]
+    scheduler = AutoScheduler(cases, {"room": 0}, {}, {}, day, DAY_START, DAY_END, 15)
+
+    summary = scheduler.solve(0.2)
+
+    assert summary["placed"] == 1 and list(scheduler.placement) == [1]
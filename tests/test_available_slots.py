@@ -0,0 +1,39 @@
+"""Next-available OR slots honour the surgeon's other surgeries"""
+import uuid
+from datetime import datetime
+
+ROOM_ID = uuid.UUID("5d2e8a1c-3f47-4b6a-9c0d-7e1f2a3b4c50")
+SURGEON_ID = uuid.UUID("2b7c9e1d-4a5f-4c3b-8e6d-0f1a2b3c4d5e")
+
+
+def test_uppercase_surgeon_id_still_sees_their_surgeries(client, token, fake_async_db):
+    def handler(query, params):
+        if "FROM operating_rooms" in query:
+            return [(ROOM_ID, "01", 0)]
+        if "WHERE doctor_id = ANY" in query:
+            # psycopg hands uuid columns back as UUID objects, whatever case the filter used
+            return [(SURGEON_ID, datetime(2099, 1, 5, 7), datetime(2099, 1, 5, 12))]
+        return []
+    fake_async_db.handler = handler
+
+    response = client.get(
+        "/api/v1/or-schedule/available-slots",
+        params={"duration_minutes": 60, "start": "2099-01-05", "end": "2099-01-06",
+                "surgeon_id": str(SURGEON_ID).upper(), "limit": 1},
+        headers={"Authorization": f"Bearer {token}"}
+    )
+
+    assert response.status_code == 200, response.text
+    assert response.json()["slots"][0]["scheduled_time"] == "12:00"
+    (_, params), = fake_async_db.queries("WHERE doctor_id = ANY")
+    assert params[1] == [str(SURGEON_ID)]
+
+
+def test_invalid_surgeon_id_is_rejected(client, token, fake_async_db):
+    response = client.get(
+        "/api/v1/or-schedule/available-slots",
+        params={"duration_minutes": 60, "surgeon_id": "not-a-uuid"},
+        headers={"Authorization": f"Bearer {token}"}
+    )
+
+    assert response.status_code == 422
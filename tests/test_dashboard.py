@@ -0,0 +1,59 @@
+"""Doctor metrics: a cache hit answers without a pooled connection"""
+import contextlib
+
+import pytest
+
+from app import dependencies
+from app.routes import dashboard
+
+import main
+
+METRICS_ROW = (3, 12, 2, 1, 40)
+
+
+@pytest.fixture
+def pooled(fake_async_db, monkeypatch):
+    """Count sync checkouts; get_db must not be used at all"""
+    checkouts = []
+
+    @contextlib.contextmanager
+    def connection():
+        checkouts.append(1)
+
+        class Cursor:
+            def execute(self, query, params=None):
+                pass
+
+            def fetchone(self):
+                return METRICS_ROW
+
+            def close(self):
+                pass
+
+        class Conn:
+            def cursor(self):
+                return Cursor()
+        yield Conn()
+
+    def no_get_db():
+        raise AssertionError("get_db used")
+        yield
+
+    monkeypatch.setattr(dashboard, "connection", connection)
+    main.app.dependency_overrides[dependencies.get_db] = no_get_db
+    dashboard.doctor_metrics_cache.clear()
+    yield checkouts
+    main.app.dependency_overrides.pop(dependencies.get_db, None)
+    dashboard.doctor_metrics_cache.clear()
+
+
+def test_cache_hit_takes_no_connection(client, token, pooled):
+    headers = {"Authorization": f"Bearer {token}"}
+
+    first = client.get("/api/v1/dashboard/doctor-metrics", headers=headers)
+    second = client.get("/api/v1/dashboard/doctor-metrics", headers=headers)
+
+    assert first.status_code == second.status_code == 200, first.text
+    assert first.headers["X-Cache"] == "MISS" and second.headers["X-Cache"] == "HIT"
+    assert second.json()["notes_taken_this_week"] == 12
+    assert len(pooled) == 1
@@ -0,0 +1,87 @@
+"""Duration-aware slot placement for the OR day grid"""
+from datetime import time
+
+import pytest
+
+from app.scheduling import DEFAULT_SURGERY_MINUTES, build_day_columns, build_day_grid, place_surgeries, slot_times
+
+ROOMS = ["01", "02"]
+
+
+def surgery(room, start, minutes, name):
+    return {"room_number": room, "start": start, "duration_minutes": minutes, "payload": {"procedure": name}}
+
+
+def occupied(row):
+    return [cell["procedure"] if cell else None for cell in row]
+
+
+def test_surgery_fills_every_slot_it_overlaps():
+    # 08:15-09:45 touches the 08:00, 08:30, 09:00 and 09:30 half-hour slots
+    cells = place_surgeries(ROOMS, [surgery("01", time(8, 15), 90, "hip")], 30, time(7), time(11))
+
+    assert occupied(cells["01"]) == [None, None, "hip", "hip", "hip", "hip", None, None]
+    assert occupied(cells["02"]) == [None] * 8
+
+
+def test_surgery_ending_on_a_boundary_leaves_the_next_slot_free():
+    cells = place_surgeries(ROOMS, [surgery("01", time(8), 60, "knee")], 30, time(7), time(10))
+
+    assert occupied(cells["01"]) == [None, None, "knee", "knee", None, None]
+
+
+def test_surgeries_are_clipped_to_the_day_window():
+    cells = place_surgeries(ROOMS, [
+        surgery("01", time(6), 120, "early"),     # starts before day_start
+        surgery("02", time(9, 30), 120, "late")   # runs past day_end
+    ], 60, time(7), time(10))
+
+    assert occupied(cells["01"]) == ["early", None, None]
+    assert occupied(cells["02"]) == [None, None, "late"]
+
+
+def test_missing_duration_uses_the_default():
+    cells = place_surgeries(ROOMS, [surgery("01", time(7), None, "unknown")], 15, time(7), time(9))
+
+    assert occupied(cells["01"]).count("unknown") == DEFAULT_SURGERY_MINUTES // 15
+
+
+def test_earlier_listed_surgery_keeps_overlapping_cells():
+    cells = place_surgeries(ROOMS, [
+        surgery("01", time(8), 60, "first"),
+        surgery("01", time(8, 30), 60, "second")
+    ], 30, time(8), time(10))
+
+    assert occupied(cells["01"]) == ["first", "first", "second", None]
+
+
+def test_unknown_rooms_are_ignored():
+    cells = place_surgeries(ROOMS, [surgery("99", time(8), 60, "elsewhere")], 60, time(7), time(10))
+
+    assert set(cells) == set(ROOMS) and all(cell is None for row in cells.values() for cell in row)
+
+
+def test_partial_last_slot():
+    assert slot_times(60, time(7), time(9, 30)) == ["07:00", "08:00", "09:00"]
+    grid = build_day_grid(ROOMS, [surgery("02", time(9), 30, "short")], 60, time(7), time(9, 30))
+
+    assert [slot["end_time"] for slot in grid] == ["08:00", "09:00", "09:30"]
+    assert grid[2]["or_rooms"]["or_02"]["procedure"] == "short"
+    assert grid[2]["or_rooms"]["or_01"]["status"] == "available"
+
+
+@pytest.mark.parametrize("slot_minutes, day_start, day_end", [(20, time(7), time(9)), (30, time(9), time(9))])
+def test_invalid_grid_bounds(slot_minutes, day_start, day_end):
+    with pytest.raises(ValueError):
+        place_surgeries(ROOMS, [], slot_minutes, day_start, day_end)
+
+
+def test_columns_share_payloads_across_days():
+    index, table = {}, []
+    hip = surgery("01", time(7), 60, "hip")
+    monday = build_day_columns(ROOMS, [hip], index, table, 60, time(7), time(9))
+    tuesday = build_day_columns(ROOMS, [hip, surgery("02", time(8), 60, "knee")], index, table, 60, time(7), time(9))
+
+    assert monday == [[0, -1], [-1, -1]]
+    assert tuesday == [[0, -1], [-1, 1]]
+    assert [payload["procedure"] for payload in table] == ["hip", "knee"]
@@ -0,0 +1,69 @@
+"""ConnectionPool checkouts are returned however the caller is done with them"""
+import gc
+
+import pytest
+from psycopg2.extensions import TRANSACTION_STATUS_IDLE, TRANSACTION_STATUS_INTRANS
+
+from app.db import ConnectionPool
+
+
+class RawConnection:
+    def __init__(self):
+        self.closed = 0
+        self.status = TRANSACTION_STATUS_IDLE
+        self.commits = self.rollbacks = 0
+
+    def get_transaction_status(self):
+        return self.status
+
+    def begin(self):
+        self.status = TRANSACTION_STATUS_INTRANS
+
+    def commit(self):
+        self.commits += 1
+        self.status = TRANSACTION_STATUS_IDLE
+
+    def rollback(self):
+        self.rollbacks += 1
+        self.status = TRANSACTION_STATUS_IDLE
+
+    def close(self):
+        self.closed = 1
+
+
+@pytest.fixture
+def pool():
+    return ConnectionPool(min_size=0, max_size=1, timeout=0.1, connect=RawConnection)
+
+
+def test_with_block_commits_and_returns(pool):
+    with pool.get_connection() as conn:
+        conn.begin()
+    assert pool.stats()["idle"] == 1
+    raw = pool.acquire()
+    assert raw.commits == 1 and raw.rollbacks == 0
+
+
+def test_with_block_rolls_back_on_error(pool):
+    with pytest.raises(ValueError):
+        with pool.get_connection() as conn:
+            conn.begin()
+            raise ValueError("boom")
+    raw = pool.acquire()
+    assert raw.rollbacks == 1 and raw.commits == 0
+
+
+def test_dropped_checkout_is_returned(pool):
+    conn = pool.get_connection()
+    conn.begin()
+    del conn
+    gc.collect()
+    assert pool.stats() == {"size": 1, "idle": 1, "in_use": 0, "min_size": 0, "max_size": 1}
+    assert pool.acquire().rollbacks == 1
+
+
+def test_close_twice_returns_once(pool):
+    conn = pool.get_connection()
+    conn.close()
+    conn.close()
+    assert pool.stats()["idle"] == 1
@@ -0,0 +1,79 @@
+"""BoardBroker: boards whose first load does not complete are not left behind"""
+import asyncio
+
+import pytest
+
+from app.events import BoardBroker
+
+KEY = ("2030-03-04", 30, "07:00", "20:00")
+GRID = [{"time": "07:00", "or_rooms": {"OR-01": None}}]
+
+
+def test_cancelled_initial_load_releases_the_board():
+    broker = BoardBroker()
+
+    async def scenario():
+        started, never = asyncio.Event(), asyncio.Event()
+
+        async def hanging_loader():
+            started.set()
+            await never.wait()
+
+        async def loader():
+            return GRID
+
+        first = asyncio.create_task(broker.subscribe(KEY, hanging_loader))
+        await started.wait()
+        waiter = asyncio.create_task(broker.subscribe(KEY, loader))
+        await asyncio.sleep(0)
+        first.cancel()
+
+        with pytest.raises(asyncio.CancelledError):
+            await first
+        with pytest.raises(RuntimeError):
+            await asyncio.wait_for(waiter, 1)
+        assert broker.stats()["boards"] == 0
+
+        board, queue = await broker.subscribe(KEY, loader)
+        assert queue.get_nowait()[0] == "snapshot" and board.grid == GRID
+        broker.unsubscribe(board, queue)
+        assert broker.stats()["boards"] == 0
+
+    asyncio.run(scenario())
+
+
+def test_waiter_does_not_join_a_board_closed_while_it_waited():
+    broker = BoardBroker()
+
+    async def scenario():
+        release = asyncio.Event()
+        loads = []
+
+        async def loader():
+            loads.append(1)
+            if len(loads) == 1:
+                await release.wait()
+            return GRID
+
+        async def visit_and_leave():
+            # Leaves in the same step the load completes, before the waiter resumes
+            board, queue = await broker.subscribe(KEY, loader)
+            broker.unsubscribe(board, queue)
+            return board
+
+        first = asyncio.create_task(visit_and_leave())
+        await asyncio.sleep(0)
+        waiter = asyncio.create_task(broker.subscribe(KEY, loader))
+        await asyncio.sleep(0)
+        release.set()
+
+        closed = await first
+        board, queue = await asyncio.wait_for(waiter, 1)
+
+        assert board is not closed and broker._boards[KEY] is board
+        assert not board.resync_task.cancelled() and len(loads) == 2
+        assert queue.get_nowait()[0] == "snapshot"
+        broker.unsubscribe(board, queue)
+        assert broker.stats()["boards"] == 0
+
+    asyncio.run(scenario())
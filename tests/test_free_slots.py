@@ -0,0 +1,156 @@
+"""IntervalIndex and the next-available OR slot search"""
+from datetime import date, datetime, time, timedelta
+
+import pytest
+
+from app.scheduling import IntervalIndex, room_free_slots
+
+DAY = date(2030, 3, 4)
+NEXT_DAY = DAY + timedelta(days=1)
+
+
+def at(hour, minute=0, day=DAY):
+    return datetime.combine(day, time(hour, minute))
+
+
+def slots(room, surgeon=(), duration=60, turnover=0, days=(DAY,), step=15, not_before=None):
+    return list(room_free_slots(
+        IntervalIndex(room), IntervalIndex(surgeon), list(days), duration, turnover,
+        time(7), time(20), step, not_before
+    ))
+
+
+# ---- IntervalIndex ----
+
+def test_overlapping_intervals_merge():
+    index = IntervalIndex([(at(9), at(10)), (at(8), at(9, 30)), (at(9, 45), at(11)), (at(12), at(12))])
+
+    assert (index.starts, index.ends) == ([at(8)], [at(11)])  # the empty interval is dropped
+
+
+def test_adjacent_intervals_stay_apart():
+    index = IntervalIndex([(at(8), at(9)), (at(9), at(10))])
+
+    assert len(index) == 2
+    index.remove(at(8), at(9))
+    assert (index.starts, index.ends) == ([at(9)], [at(10)])
+
+
+def test_next_free():
+    index = IntervalIndex([(at(8), at(9)), (at(9, 30), at(10)), (at(10), at(11))])
+    hour = timedelta(hours=1)
+
+    assert index.next_free(at(7), hour) == at(7)            # ends exactly when the first run starts
+    assert index.next_free(at(7, 1), hour) == at(11)        # 09:00-09:30 is too short as well
+    assert index.next_free(at(9), timedelta(minutes=30)) == at(9)
+    assert index.next_free(at(9), hour) == at(11)           # the 30-minute gap is too short
+    assert index.next_free(at(11), hour) == at(11)
+
+
+def test_next_busy():
+    index = IntervalIndex([(at(8), at(9))])
+
+    assert index.next_busy(at(7)) == at(8)
+    assert index.next_busy(at(8, 30)) == at(8)
+    assert index.next_busy(at(9)) is None
+
+
+def test_add_rejects_overlaps_but_not_touching():
+    index = IntervalIndex([(at(8), at(9))])
+    index.add(at(9), at(10))
+    index.add(at(7), at(8))
+
+    for start, end in [(at(8, 30), at(9, 30)), (at(6), at(7, 1)), (at(7), at(11))]:
+        with pytest.raises(ValueError):
+            index.add(start, end)
+    with pytest.raises(ValueError):
+        index.remove(at(8), at(9, 30))
+
+
+def test_busy_minutes_is_clipped_to_the_window():
+    index = IntervalIndex([(at(6), at(8)), (at(10), at(11, 30, NEXT_DAY))])
+
+    assert index.busy_minutes([DAY], time(7), time(20)) == 60 + 600
+    assert index.busy_minutes([DAY, NEXT_DAY], time(7), time(20)) == 60 + 600 + 270
+
+
+# ---- room_free_slots ----
+
+def test_empty_room_offers_the_day_start():
+    assert slots([]) == [(at(7), at(20))]
+
+
+def test_one_slot_per_gap_with_its_end():
+    room = [(at(8), at(10)), (at(12), at(13))]
+
+    assert slots(room) == [(at(7), at(8)), (at(10), at(12)), (at(13), at(20))]
+
+
+def test_gap_exactly_as_long_as_needed():
+    room = [(at(7), at(9)), (at(10), at(20))]
+
+    assert slots(room, duration=60) == [(at(9), at(10))]
+    assert slots(room, duration=61) == []
+
+
+def test_turnover_must_fit_before_the_next_booking():
+    room = [(at(7), at(9)), (at(10), at(20))]
+
+    assert slots(room, duration=45, turnover=15) == [(at(9), at(10))]
+    assert slots(room, duration=50, turnover=15) == []
+
+
+def test_turnover_may_run_past_day_end_but_the_surgery_may_not():
+    room = [(at(7), at(19))]
+
+    assert slots(room, duration=60, turnover=30) == [(at(19), at(20))]
+    assert slots(room, duration=61) == []
+
+
+def test_surgeon_busy_pushes_the_start():
+    surgeon = [(at(7), at(8, 10))]  # in another room
+
+    assert slots([], surgeon)[0] == (at(8, 15), at(20))  # aligned to the 15-minute step
+
+
+def test_surgeon_only_needs_the_duration_not_the_turnover():
+    surgeon = [(at(8), at(12))]
+
+    assert slots([], surgeon, duration=60, turnover=30)[0] == (at(7), at(20))
+
+
+def test_starts_are_aligned_to_the_step():
+    room = [(at(7), at(8, 5))]
+
+    assert slots(room, step=15)[0][0] == at(8, 15)
+    assert slots(room, step=5)[0][0] == at(8, 5)
+
+
+def test_not_before():
+    assert slots([], not_before=at(13, 2))[0] == (at(13, 15), at(20))
+    assert slots([], not_before=at(19, 30)) == []
+
+
+def test_full_day_moves_to_the_next_day():
+    room = [(at(7), at(20))]
+
+    assert slots(room, days=(DAY, NEXT_DAY)) == [(at(7, day=NEXT_DAY), at(20, day=NEXT_DAY))]
+
+
+def test_fully_booked_days_yield_nothing():
+    room = [(at(6), at(21)), (at(6, day=NEXT_DAY), at(21, day=NEXT_DAY))]
+
+    assert slots(room, days=(DAY, NEXT_DAY)) == []
+
+
+def test_offered_slots_never_overlap_bookings():
+    room = [(at(7, 20), at(8, 5)), (at(9), at(9, 40)), (at(11, 10), at(12)), (at(15), at(16, 30))]
+    surgeon = [(at(12), at(13, 20))]
+    index = IntervalIndex(room)
+    for duration, turnover in [(30, 0), (45, 15), (90, 30), (120, 10)]:
+        for start, free_until in slots(room, surgeon, duration, turnover, step=5):
+            end = start + timedelta(minutes=duration + turnover)
+            assert index.next_free(start, end - start) == start
+            assert start + timedelta(minutes=duration) <= free_until <= at(20)
+            assert all(start >= busy_end or start + timedelta(minutes=duration) <= busy_start
+                       for busy_start, busy_end in surgeon)
@@ -0,0 +1,35 @@
+"""Keyset cursors for rows with and without created_at"""
+from datetime import datetime
+
+import pytest
+
+from app.routes.patients import build_patient_search_query
+from app.utils import decode_cursor, encode_cursor
+
+ROW_ID = "9d8c7b6a-5f4e-4d3c-8b2a-1f0e9d8c7b6a"
+
+
+@pytest.mark.parametrize("created_at", [datetime(2030, 3, 4, 9, 30, 15, 120000), None])
+def test_cursor_round_trip(created_at):
+    assert decode_cursor(encode_cursor(created_at, ROW_ID)) == (created_at, ROW_ID)
+
+
+def test_invalid_cursor():
+    with pytest.raises(ValueError):
+        decode_cursor("not-a-cursor")
+
+
+def test_after_dated_row_uses_row_comparison():
+    created_at = datetime(2030, 3, 4, 9, 30)
+    query, params = build_patient_search_query("", False, None, 50, 0, (created_at, ROW_ID))
+
+    assert "(created_at, id) < (%s::timestamp, %s::uuid)" in query
+    assert params == [created_at, ROW_ID, 50]
+
+
+def test_after_undated_row_continues_into_dated_rows():
+    query, params = build_patient_search_query("", False, "active", 50, 0, (None, ROW_ID))
+
+    assert "((created_at IS NULL AND id < %s::uuid) OR created_at IS NOT NULL)" in query
+    assert query.index("IS NULL") < query.index("ORDER BY created_at DESC, id DESC")
+    assert params == ["active", ROW_ID, 50]
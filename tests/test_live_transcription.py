@@ -0,0 +1,111 @@
+import json
+import time
+import uuid
+
+import pytest
+
+from app import live_transcription
+from app.live_transcription import STUB_WORDS_PER_SECOND
+
+SAMPLE_RATE = 16000
+HALF_SECOND = b"\0" * SAMPLE_RATE  # 16-bit mono: 0.5 s
+
+
+@pytest.fixture
+def recording(fake_async_db):
+    """A transcription in 'recording' whose appended segments are kept in order"""
+    transcription_id = str(uuid.uuid4())
+    saved = []
+
+    def handler(query, params):
+        if "SELECT transcription_status" in query:
+            return [("recording", None)]
+        if "CONCAT_WS" in query:
+            saved.append(params[0])
+            return [(transcription_id,)]
+        return []
+
+    fake_async_db.handler = handler
+    return transcription_id, saved
+
+
+def _live_url(transcription_id, token):
+    return f"/api/v1/transcriptions/{transcription_id}/live?access_token={token}&sample_rate={SAMPLE_RATE}"
+
+
+def test_partial_final_and_done_events(client, token, recording):
+    transcription_id, saved = recording
+    with client.websocket_connect(_live_url(transcription_id, token)) as ws:
+        for _ in range(8):  # 4 s of audio: 10 words, the first sentence has 9
+            ws.send_bytes(HALF_SECOND)
+        ws.send_text(json.dumps({"type": "stop"}))
+        events = []
+        while not events or events[-1]["type"] != "done":
+            events.append(ws.receive_json())
+
+    partials = [event for event in events if event["type"] == "partial"]
+    finals = [event for event in events if event["type"] == "final"]
+    assert partials and partials[0]["text"] == "Patient"
+    assert all(len(a["text"]) < len(b["text"]) for a, b in zip(partials, partials[1:4]))
+    assert [final["index"] for final in finals] == [0, 1]
+    assert finals[0]["text"] == "Patient presents with cardiac related issue and possible concerns."
+    assert finals[1]["text"] == "Patient"  # flushed by stop
+    assert finals[1]["end"] == 10 / STUB_WORDS_PER_SECOND
+    assert events[-1] == {"type": "done", "segments": 2, "duration_seconds": 4}
+    # Finals are stored as they are produced, in order
+    assert saved == [final["text"] for final in finals]
+
+
+def test_disconnect_flushes_words_heard(client, token, recording):
+    transcription_id, saved = recording
+    with client.websocket_connect(_live_url(transcription_id, token)) as ws:
+        ws.send_bytes(HALF_SECOND * 3)  # 1.5 s: three words, no sentence end yet
+        assert ws.receive_json() == {"type": "partial", "text": "Patient presents with", "start": 0.0, "end": 1.2}
+        assert saved == []
+        ws.close(1001)
+        deadline = time.monotonic() + 2
+        while not saved and time.monotonic() < deadline:
+            time.sleep(0.01)
+    assert saved == ["Patient presents with"]
+
+
+def test_oversized_frame_closes_with_1009(client, token, recording, monkeypatch):
+    transcription_id, _ = recording
+    monkeypatch.setattr(live_transcription, "LIVE_MAX_FRAME_BYTES", 1024)
+    with client.websocket_connect(_live_url(transcription_id, token)) as ws:
+        ws.send_bytes(b"\0" * 2048)
+        message = ws.receive()
+    assert message["type"] == "websocket.close" and message["code"] == 1009
+
+
+def test_refuses_bad_token_and_finished_transcriptions(client, token, recording, fake_async_db):
+    from starlette.websockets import WebSocketDisconnect
+
+    transcription_id, _ = recording
+    with pytest.raises(WebSocketDisconnect) as refused:
+        with client.websocket_connect(_live_url(transcription_id, "not-a-token")):
+            pass
+    assert refused.value.code == 1008
+
+    fake_async_db.handler = lambda query, params: [("completed", None)] if "SELECT transcription_status" in query else []
+    with pytest.raises(WebSocketDisconnect) as refused:
+        with client.websocket_connect(_live_url(transcription_id, token)):
+            pass
+    assert refused.value.code == 1008
+
+
+def test_one_session_however_the_id_is_spelled(client, token, recording):
+    from starlette.websockets import WebSocketDisconnect
+
+    transcription_id, _ = recording
+    with client.websocket_connect(_live_url(transcription_id, token)) as ws:
+        ws.send_bytes(HALF_SECOND)
+        ws.receive_json()  # the first session is streaming
+        with pytest.raises(WebSocketDisconnect) as refused:
+            with client.websocket_connect(_live_url(transcription_id.upper(), token)):
+                pass
+        assert refused.value.code == 1013
+        ws.send_text(json.dumps({"type": "stop"}))
+        while ws.receive_json()["type"] != "done":
+            pass
+    assert live_transcription.live_sessions.stats()["active"] == 0
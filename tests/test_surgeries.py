@@ -0,0 +1,97 @@
+"""Surgery create/update against the real surgeries columns"""
+from datetime import date, datetime
+
+from psycopg2 import errors
+
+from tests.conftest import DOCTOR_ID
+
+PATIENT_ID = "0b6f3c2e-7a41-4d1c-8e5f-2c9a7d4b1e30"
+ROOM_ID = "5d2e8a1c-3f47-4b6a-9c0d-7e1f2a3b4c50"
+SURGERY_ID = "c4a1e7d2-9b3f-4e5a-8d6c-1f0b2a3e4d60"
+
+NEW_SURGERY = {
+    "patient_id": PATIENT_ID, "doctor_id": DOCTOR_ID, "operating_room_id": ROOM_ID,
+    "surgery_type": "orthopedic", "procedure_name": "Knee arthroscopy",
+    "scheduled_date": "2030-03-04", "scheduled_time": "09:30:00", "duration_minutes": 90,
+    "urgency_level": "routine", "participants": ["scrub nurse"], "pre_op_notes": "NPO after midnight"
+}
+
+
+def surgery_row(**overrides):
+    row = {
+        "id": SURGERY_ID, "patient_id": PATIENT_ID, "doctor_id": DOCTOR_ID, "operating_room_id": ROOM_ID,
+        "procedure_name": "Knee arthroscopy", "scheduled_date": date(2030, 3, 4), "scheduled_time": "09:30:00",
+        "duration_minutes": 90, "actual_start_time": None, "actual_end_time": None, "status": "scheduled",
+        "urgency_level": "routine", "pre_op_notes": "NPO after midnight", "participants": ["scrub nurse"],
+        "created_at": datetime(2030, 3, 1), "updated_at": datetime(2030, 3, 1),
+        "surgery_type": "orthopedic", "post_op_notes": None, "complications": None
+    }
+    row.update(overrides)
+    return tuple(row.values())
+
+
+def auth(token):
+    return {"Authorization": f"Bearer {token}"}
+
+
+def test_create_writes_duration_minutes(client, fake_db, token):
+    fake_db.handler = lambda query, params: [surgery_row()] if "INSERT INTO surgeries" in query else []
+
+    response = client.post("/api/v1/surgeries/", json=NEW_SURGERY, headers=auth(token))
+
+    assert response.status_code == 201, response.text
+    body = response.json()
+    assert body["duration_minutes"] == 90 and body["pre_op_notes"] == "NPO after midnight"
+    (query, params), = fake_db.queries("INSERT INTO surgeries")
+    assert "duration_minutes" in query and "estimated_duration_minutes" not in query
+    assert 90 in params and "orthopedic" in params
+
+
+def test_create_overlapping_booking_is_409(client, fake_db, token):
+    def handler(query, params):
+        if "INSERT INTO surgeries" in query:
+            return errors.ExclusionViolation("conflicting key value violates exclusion constraint")
+        return []
+    fake_db.handler = handler
+
+    response = client.post("/api/v1/surgeries/", json=NEW_SURGERY, headers=auth(token))
+
+    assert response.status_code == 409
+    assert fake_db.rollbacks
+
+
+def test_update_duration_sets_the_column(client, fake_db, token):
+    fake_db.handler = lambda query, params: [surgery_row(duration_minutes=120)] if "UPDATE surgeries" in query else []
+
+    response = client.put(f"/api/v1/surgeries/{SURGERY_ID}", json={"duration_minutes": 120}, headers=auth(token))
+
+    assert response.status_code == 200, response.text
+    assert response.json()["duration_minutes"] == 120
+    (query, params), = fake_db.queries("UPDATE surgeries")
+    assert "SET duration_minutes = %s" in query and params == [120, SURGERY_ID]
+
+
+def test_update_overlapping_booking_is_409(client, fake_db, token):
+    def handler(query, params):
+        if "UPDATE surgeries" in query:
+            return errors.ExclusionViolation("conflicting key value violates exclusion constraint")
+        return []
+    fake_db.handler = handler
+
+    response = client.put(f"/api/v1/surgeries/{SURGERY_ID}", json={"duration_minutes": 600}, headers=auth(token))
+
+    assert response.status_code == 409
+
+
+def test_reinstating_into_a_taken_slot_is_409(client, fake_db, token):
+    def handler(query, params):
+        if "UPDATE surgeries SET status" in query:
+            return errors.ExclusionViolation("conflicting key value violates exclusion constraint")
+        return []
+    fake_db.handler = handler
+
+    response = client.patch(f"/api/v1/surgeries/{SURGERY_ID}/status", json={"status": "scheduled"}, headers=auth(token))
+
+    assert response.status_code == 409
+    assert response.json()["detail"] == "Operating room not available at this time"
+    assert fake_db.rollbacks
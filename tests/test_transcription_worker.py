@@ -0,0 +1,82 @@
+"""TranscriptionWorker slot accounting around timeouts and a broken process pool"""
+import asyncio
+import os
+import time
+
+import pytest
+
+from app import transcription
+from app.transcription import TranscriptionWorker
+
+JOB_ID = "3e9b1d7a-2c4f-4a8e-b6d0-5f1a2c3e4b70"
+
+
+def slow_engine(audio_path):
+    time.sleep(1.0)
+    return {"text": "late", "confidence": 90, "duration_seconds": 1}
+
+
+def crashing_engine(audio_path):
+    os._exit(1)
+
+
+@pytest.fixture
+def worker_db(fake_async_db, monkeypatch):
+    monkeypatch.setattr(transcription, "async_connection", fake_async_db.connection)
+    monkeypatch.setattr(transcription, "TRANSCRIPTION_JOB_TIMEOUT_SECONDS", 0.2)
+    return fake_async_db
+
+
+def test_timed_out_job_keeps_its_slot_until_the_process_returns(worker_db):
+    worker = TranscriptionWorker(workers=1, engine=f"{__name__}:slow_engine")
+
+    async def scenario():
+        await worker._run(JOB_ID, None, 1)
+        assert worker.stats()["overrunning"] == 1 and worker.retried == 1
+        assert await worker.dispatch() == 0  # the only process is still busy
+        assert not worker_db.queries("FOR UPDATE SKIP LOCKED")
+        for _ in range(50):
+            if not worker.stats()["overrunning"]:
+                break
+            await asyncio.sleep(0.05)
+        assert worker.stats()["overrunning"] == 0
+        await worker.dispatch()
+        assert worker_db.queries("FOR UPDATE SKIP LOCKED")
+        await worker.shutdown()
+
+    asyncio.run(scenario())
+
+
+def test_broken_pool_is_shut_down_and_replaced(worker_db):
+    worker = TranscriptionWorker(workers=1, engine=f"{__name__}:crashing_engine")
+
+    async def scenario():
+        broken = worker._get_executor()
+        await worker._run(JOB_ID, None, 1)
+        assert worker._executor is None and broken._shutdown_thread
+        assert worker._get_executor() is not broken
+        await worker.shutdown()
+
+    asyncio.run(scenario())
+
+
+def test_notified_dispatch_is_held_and_its_failure_logged(worker_db, caplog):
+    worker = TranscriptionWorker(workers=1)
+
+    def handler(query, params):
+        if "FOR UPDATE SKIP LOCKED" in query:
+            raise RuntimeError("database went away")
+        return []
+    worker_db.handler = handler
+
+    async def scenario():
+        worker._loop = asyncio.get_running_loop()
+        worker.notify()
+        await asyncio.sleep(0)  # the loop runs the scheduled callback
+        task, = worker._dispatches
+        await asyncio.gather(task, return_exceptions=True)
+        await asyncio.sleep(0)  # done callbacks
+        assert not worker._dispatches
+
+    asyncio.run(scenario())
+    assert "Dispatching transcription jobs failed" in caplog.text